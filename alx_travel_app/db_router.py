@@ -0,0 +1,183 @@
+"""
+Read-replica routing for the ALX Travel App.
+
+Reads issued while serving safe (GET/HEAD/OPTIONS) requests go to one of the
+replicas configured through ``DATABASE_REPLICA_URLS``; everything else —
+writes, unsafe requests, Celery tasks, management commands — uses ``default``.
+
+After a client performs a write its requests are pinned to the primary for
+``DATABASE_PRIMARY_PIN_SECONDS``, so a booking created or a payment verified
+is immediately visible to the same client even if the replicas lag behind.
+Browsers are tracked with a signed cookie. Bearer-token clients usually
+don't keep cookies, so the writing user is also pinned in the default cache,
+and their reads move to the primary once the token is authenticated. That
+pin is only seen by other processes when ``CACHE_URL`` points at a shared
+cache.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.utils import DatabaseError
+
+PRIMARY_DB = 'default'
+PIN_COOKIE_NAME = 'db_pin_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Whether reads in the current context may be served by a replica.
+_use_replicas = ContextVar('use_replicas', default=False)
+
+
+def replica_aliases():
+    """Return the database aliases configured as read replicas."""
+    return [alias for alias in connections if alias != PRIMARY_DB]
+
+
+class ReplicaHealth:
+    """
+    Track which replicas are currently usable.
+
+    Each replica is probed with ``SELECT 1`` at most every
+    ``DATABASE_REPLICA_CHECK_SECONDS``. A replica whose probe fails is
+    ejected and retried once ``DATABASE_REPLICA_EJECT_SECONDS`` have
+    elapsed. Failed queries don't eject a replica by themselves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._down_until = {}
+        self._checked_at = {}
+
+    def _probe(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except DatabaseError:
+            return False
+
+    def mark_down(self, alias):
+        with self._lock:
+            self._down_until[alias] = time.monotonic() + settings.DATABASE_REPLICA_EJECT_SECONDS
+
+    def mark_up(self, alias):
+        with self._lock:
+            self._down_until.pop(alias, None)
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            if self._down_until.get(alias, 0) > now:
+                return False
+            needs_probe = now - self._checked_at.get(alias, 0) >= settings.DATABASE_REPLICA_CHECK_SECONDS
+            if needs_probe:
+                self._checked_at[alias] = now
+        if needs_probe and not self._probe(alias):
+            self.mark_down(alias)
+            return False
+        return True
+
+    def healthy_replicas(self):
+        return [alias for alias in replica_aliases() if self.is_healthy(alias)]
+
+
+health = ReplicaHealth()
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    """Allow (or forbid) replica reads for the duration of the block."""
+    token = _use_replicas.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replicas.reset(token)
+
+
+def pin_to_primary():
+    """Send the remaining reads of the current request to the primary."""
+    _use_replicas.set(False)
+
+
+def _user_pin_key(user_id):
+    return f'db:pin:user:{user_id}'
+
+
+def pin_user(user_id):
+    """Pin `user_id`'s requests to the primary for DATABASE_PRIMARY_PIN_SECONDS, whatever client they use."""
+    cache.set(_user_pin_key(user_id), True, timeout=settings.DATABASE_PRIMARY_PIN_SECONDS)
+
+
+def pin_if_user_pinned(user_id):
+    """
+    Call once a request's user is known, e.g. from a DRF authentication
+    class, which runs after ReplicaRoutingMiddleware has decided.
+    """
+    if _use_replicas.get() and cache.get(_user_pin_key(user_id)):
+        pin_to_primary()
+
+
+class PrimaryReplicaRouter:
+    """Route reads to healthy replicas when allowed, writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if not _use_replicas.get():
+            return PRIMARY_DB
+        replicas = health.healthy_replicas()
+        if not replicas:
+            return PRIMARY_DB
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_DB
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Enable replica reads for safe requests and pin clients to the primary
+    for a short window after they write.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _is_pinned(self, request):
+        pinned_until = request.get_signed_cookie(PIN_COOKIE_NAME, default=None)
+        try:
+            return pinned_until is not None and float(pinned_until) > time.time()
+        except ValueError:
+            return False
+
+    def __call__(self, request):
+        read_only = request.method in SAFE_METHODS and not self._is_pinned(request)
+        with use_replicas(read_only):
+            response = self.get_response(request)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            # DRF sets request.user on the Django request once it has
+            # authenticated, bearer tokens included.
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_user(user.pk)
+            window = settings.DATABASE_PRIMARY_PIN_SECONDS
+            response.set_signed_cookie(
+                PIN_COOKIE_NAME,
+                str(time.time() + window),
+                max_age=window,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,123 @@
+"""
+API documentation views.
+
+The OpenAPI document is prebuilt at deploy time with
+``python manage.py build_openapi_schema`` and served from memory as a
+cacheable asset at ``/openapi.json``. The Swagger UI and ReDoc pages load
+that document instead of introspecting every ViewSet per request. drf_yasg
+is still an installed app, so its app module loads at startup; its schema
+generator and views are only imported the first time they are needed.
+"""
+
+import gzip
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_safe
+
+logger = logging.getLogger(__name__)
+
+API_TITLE = "ALX Travel API"
+API_VERSION = 'v1'
+API_DESCRIPTION = "API documentation for ALX Travel App"
+SPEC_FORMATS = ('openapi', 'json')
+
+_lock = threading.Lock()
+_schema = None
+_schema_view = None
+
+
+def api_info():
+    from drf_yasg import openapi
+    return openapi.Info(title=API_TITLE, default_version=API_VERSION, description=API_DESCRIPTION)
+
+
+def generate_schema_json():
+    """Introspect the API and return the OpenAPI document as JSON bytes."""
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+    schema = OpenAPISchemaGenerator(api_info()).get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+class PrebuiltSchema:
+    """An immutable OpenAPI document with its ETag and gzip variant."""
+
+    def __init__(self, content):
+        self.content = content
+        self.gzipped = gzip.compress(content)
+        self.etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+
+
+def get_schema():
+    """
+    Return the prebuilt schema, loading it from OPENAPI_SCHEMA_FILE on first
+    use. If the file hasn't been built, the schema is generated once and
+    kept in memory for the life of the process.
+    """
+    global _schema
+    if _schema is None:
+        with _lock:
+            if _schema is None:
+                path = Path(settings.OPENAPI_SCHEMA_FILE)
+                if path.exists():
+                    content = path.read_bytes()
+                else:
+                    logger.warning("%s not found; generating the OpenAPI schema in-process", path)
+                    content = generate_schema_json()
+                _schema = PrebuiltSchema(content)
+    return _schema
+
+
+@require_safe
+def openapi_json(request):
+    schema = get_schema()
+    if request.META.get('HTTP_IF_NONE_MATCH') == schema.etag:
+        response = HttpResponseNotModified()
+    elif 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = HttpResponse(schema.gzipped, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(schema.content, content_type='application/json')
+    response['ETag'] = schema.etag
+    response['Cache-Control'] = f'public, max-age={settings.OPENAPI_SCHEMA_MAX_AGE}'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def _get_schema_view():
+    global _schema_view
+    if _schema_view is None:
+        with _lock:
+            if _schema_view is None:
+                from rest_framework import permissions
+                from drf_yasg.views import get_schema_view
+                _schema_view = get_schema_view(
+                    api_info(),
+                    public=True,
+                    permission_classes=[permissions.AllowAny],
+                )
+    return _schema_view
+
+
+def _ui_view(renderer):
+    view = None
+
+    def ui(request, *args, **kwargs):
+        nonlocal view
+        # Spec requests get the prebuilt document instead of a fresh introspection.
+        if request.GET.get('format') in SPEC_FORMATS:
+            return openapi_json(request)
+        if view is None:
+            view = _get_schema_view().with_ui(renderer, cache_timeout=0)
+        return view(request, *args, **kwargs)
+    ui.__name__ = f'{renderer}_ui'
+    return ui
+
+
+swagger_ui = _ui_view('swagger')
+redoc_ui = _ui_view('redoc')
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 import environ
+from celery.schedules import crontab
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -56,6 +57,7 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     "django.middleware.security.SecurityMiddleware",
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'listings.middleware.APICompressionMiddleware',
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -98,6 +100,44 @@ DATABASES = {
     )
 }
 
+# SQLite ignores select_for_update. Start write transactions IMMEDIATE so
+# concurrent writers queue on the database lock (up to its busy timeout)
+# instead of failing with "database is locked" when they upgrade to a write.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).setdefault('transaction_mode', 'IMMEDIATE')
+
+# Read replicas (optional): comma-separated database URLs. Reads made while
+# serving safe requests are spread across them by the router below; a client
+# that writes is pinned to the primary for DATABASE_PRIMARY_PIN_SECONDS.
+# Locally, two SQLite files work, e.g.
+#   DATABASE_REPLICA_URLS=sqlite:////tmp/replica.sqlite3
+for index, replica_url in enumerate(env.list('DATABASE_REPLICA_URLS', default=[])):
+    DATABASES[f'replica_{index}'] = dj_database_url.parse(
+        replica_url,
+        conn_max_age=600,
+        conn_health_checks=True,
+    )
+    DATABASES[f'replica_{index}']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_PRIMARY_PIN_SECONDS = env.int('DATABASE_PRIMARY_PIN_SECONDS', default=5)
+DATABASE_REPLICA_CHECK_SECONDS = env.int('DATABASE_REPLICA_CHECK_SECONDS', default=30)
+DATABASE_REPLICA_EJECT_SECONDS = env.int('DATABASE_REPLICA_EJECT_SECONDS', default=60)
+
+if len(DATABASES) > 1:
+    DATABASE_ROUTERS = ['alx_travel_app.db_router.PrimaryReplicaRouter']
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.contrib.sessions.middleware.SessionMiddleware"),
+        'alx_travel_app.db_router.ReplicaRoutingMiddleware',
+    )
+
+
+# Cache
+# Use a shared cache in production (e.g. CACHE_URL=redis://localhost:6379/1) so
+# throttling buckets are enforced atomically across processes.
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -146,6 +186,51 @@ MEDIA_ROOT = env('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Django REST Framework
+REST_FRAMEWORK = {
+    # Signed bearer tokens first: they authenticate without touching the database.
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'listings.authentication.SignedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'listings.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'listings.throttling.TokenBucketThrottle',
+    ],
+    # Token-bucket rates per '<basename>.<action>', '<basename>' or 'default'
+    'DEFAULT_THROTTLE_RATES': {
+        'default': env('THROTTLE_RATE_DEFAULT', default='300/min'),
+        'listing.list': env('THROTTLE_RATE_LISTING_LIST', default='120/min'),
+        'booking.initiate_payment': env('THROTTLE_RATE_INITIATE_PAYMENT', default='5/min'),
+        'payment.verify_payment': env('THROTTLE_RATE_VERIFY_PAYMENT', default='30/min'),
+        'auth-token.create': env('THROTTLE_RATE_AUTH_TOKEN', default='10/min'),
+    },
+}
+
+# Bearer tokens (see listings.authentication): lifetime, how long a user's
+# revocation state is cached (the most a revocation can take to reach other
+# processes without a shared cache), and size/TTL of the per-process LRU of
+# authenticated users.
+AUTH_TOKEN_TTL_SECONDS = env.int('AUTH_TOKEN_TTL_SECONDS', default=900)
+AUTH_REVOCATION_CACHE_SECONDS = env.int('AUTH_REVOCATION_CACHE_SECONDS', default=30)
+AUTH_PRINCIPAL_CACHE_SIZE = env.int('AUTH_PRINCIPAL_CACHE_SIZE', default=1024)
+AUTH_PRINCIPAL_CACHE_TTL = env.int('AUTH_PRINCIPAL_CACHE_TTL', default=60)
+
+# API documentation: the OpenAPI document is prebuilt at deploy time with
+# `python manage.py build_openapi_schema` and served from /openapi.json.
+OPENAPI_SCHEMA_FILE = env('OPENAPI_SCHEMA_FILE', default=os.path.join(BASE_DIR, 'openapi.json'))
+OPENAPI_SCHEMA_MAX_AGE = env.int('OPENAPI_SCHEMA_MAX_AGE', default=3600)
+SWAGGER_SETTINGS = {
+    'SPEC_URL': 'openapi-json',
+}
+REDOC_SETTINGS = {
+    'SPEC_URL': 'openapi-json',
+}
+
 # CORS
 CORS_ALLOW_ALL_ORIGINS = env('DEBUG', default=False, cast=bool)
 if not DEBUG:
@@ -156,16 +241,108 @@ if not DEBUG:
 
 # Celery Configuration
 CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='amqp://localhost')
-CELERY_RESULT_BACKEND = env('CELERY_RESULT_BACKEND', default='rpc://')
+# Notification tasks are fire-and-forget (ignore_result=True), so no result
+# backend is configured by default; set one only for tasks whose results are read.
+CELERY_RESULT_BACKEND = env('CELERY_RESULT_BACKEND', default=None)
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Worker memory and prefetch controls. Children are recycled after a number of
+# tasks or once their RSS exceeds the limit (in KiB) so long-lived prefork
+# processes can't keep growing. A prefetch multiplier of 1 with late acks
+# keeps tasks in the broker until a child is free and re-delivers them if a
+# child dies mid-task; the send_*_email tasks are short, so little
+# throughput is lost. Measure changes with `python manage.py soak_celery_tasks`.
+CELERY_WORKER_MAX_TASKS_PER_CHILD = env.int('CELERY_WORKER_MAX_TASKS_PER_CHILD', default=1000)
+CELERY_WORKER_MAX_MEMORY_PER_CHILD = env.int('CELERY_WORKER_MAX_MEMORY_PER_CHILD', default=200000)
+CELERY_WORKER_PREFETCH_MULTIPLIER = env.int('CELERY_WORKER_PREFETCH_MULTIPLIER', default=1)
+CELERY_TASK_ACKS_LATE = env.bool('CELERY_TASK_ACKS_LATE', default=True)
+CELERY_TASK_REJECT_ON_WORKER_LOST = CELERY_TASK_ACKS_LATE
+
+# Unpaid bookings hold their nights for a limited time: BOOKING_HOLD_MINUTES
+# after creation, then BOOKING_PAYMENT_HOLD_MINUTES once payment starts.
+# Retrying payment restarts the hold, but never past BOOKING_HOLD_MAX_MINUTES
+# after the booking was made.
+# Expiry times are rounded up to BOOKING_HOLD_BUCKET_SECONDS slots, which
+# the expire_booking_holds task sweeps on the same interval.
+BOOKING_HOLD_MINUTES = env.int('BOOKING_HOLD_MINUTES', default=30)
+BOOKING_PAYMENT_HOLD_MINUTES = env.int('BOOKING_PAYMENT_HOLD_MINUTES', default=60)
+BOOKING_HOLD_MAX_MINUTES = env.int('BOOKING_HOLD_MAX_MINUTES', default=120)
+BOOKING_HOLD_BUCKET_SECONDS = env.int('BOOKING_HOLD_BUCKET_SECONDS', default=60)
+
+# Periodic tasks (run with `celery beat`)
+CELERY_BEAT_SCHEDULE = {
+    'refresh-listing-calendars': {
+        'task': 'listings.tasks.refresh_listing_calendars',
+        'schedule': crontab(hour=0, minute=5),
+    },
+    'expire-booking-holds': {
+        'task': 'listings.tasks.expire_booking_holds',
+        'schedule': BOOKING_HOLD_BUCKET_SECONDS,
+    },
+    'compact-change-log': {
+        'task': 'listings.tasks.compact_change_log',
+        'schedule': crontab(hour=1, minute=15),
+    },
+    'rebuild-similar-listings': {
+        'task': 'listings.tasks.rebuild_similar_listings',
+        'schedule': crontab(hour=2, minute=30),
+    },
+}
+
+# Delta sync (/api/sync/): entries per page, how long new entries are held
+# back so late-committing transactions aren't skipped (a heuristic: see
+# listings.changelog), and how long the change log is kept (older cursors
+# must re-fetch in full).
+SYNC_PAGE_SIZE = env.int('SYNC_PAGE_SIZE', default=500)
+SYNC_SETTLE_SECONDS = env.int('SYNC_SETTLE_SECONDS', default=2)
+SYNC_RETENTION_DAYS = env.int('SYNC_RETENTION_DAYS', default=30)
+
+# Server-sent status events (/api/payments/<id>/events/, /api/bookings/<id>/events/).
+# EVENTS_BACKEND is the dotted path of a listings.events backend class; empty
+# picks Redis pub/sub when the cache is Redis, else in-process delivery.
+EVENTS_BACKEND = env('EVENTS_BACKEND', default='')
+SSE_KEEPALIVE_SECONDS = env.int('SSE_KEEPALIVE_SECONDS', default=15)
+SSE_MAX_SECONDS = env.int('SSE_MAX_SECONDS', default=300)
+SSE_RETRY_MILLISECONDS = env.int('SSE_RETRY_MILLISECONDS', default=3000)
+# Status streams served per process under WSGI, where each holds a worker
+# thread; more get 503. Leaves the other gthread threads for requests; use 0
+# with GUNICORN_PROFILE=sync. ASGI streams are not limited.
+SSE_MAX_SYNC_STREAMS = env.int('SSE_MAX_SYNC_STREAMS', default=1)
+
+# How booking creation keeps two bookings off the same nights: 'lock' takes a
+# row lock on the listing before checking; 'check' only checks, leaving races
+# to the PostgreSQL exclusion constraint. Compare them with `stress_bookings`.
+BOOKING_OVERLAP_CONTROL = env('BOOKING_OVERLAP_CONTROL', default='lock')
+
+# Bookings whose stay ended more than this many days ago are moved to the
+# archive tables by `python manage.py archive_bookings`.
+BOOKING_ARCHIVE_AFTER_DAYS = env.int('BOOKING_ARCHIVE_AFTER_DAYS', default=365)
+
+# Nights covered by each listing's occupancy bitmap, from the day it was last
+# rebuilt; searches beyond it fall back to querying bookings.
+LISTING_CALENDAR_DAYS = env.int('LISTING_CALENDAR_DAYS', default=365)
+
+# Seconds an owner's /api/owners/me/dashboard/ response is cached.
+OWNER_DASHBOARD_CACHE_SECONDS = env.int('OWNER_DASHBOARD_CACHE_SECONDS', default=30)
+
+# Similar listings (listings.recommendations): neighbours kept per listing,
+# and listings per block when comparing every listing with every other.
+SIMILAR_LISTINGS_COUNT = env.int('SIMILAR_LISTINGS_COUNT', default=10)
+SIMILAR_LISTINGS_BLOCK_SIZE = env.int('SIMILAR_LISTINGS_BLOCK_SIZE', default=2048)
+
 # Chapa Payment Gateway Configuration (Optional)
 CHAPA_SECRET_KEY = env('CHAPA_SECRET_KEY', default='')
 CHAPA_PUBLIC_KEY = env('CHAPA_PUBLIC_KEY', default='')
 CHAPA_BASE_URL = env('CHAPA_BASE_URL', default='https://api.chapa.co/v1')
+# Seconds to wait for the gateway before giving up on a request
+CHAPA_TIMEOUT = env.float('CHAPA_TIMEOUT', default=10)
+# Staff bulk verification (/api/payments/verify_bulk/): references per
+# request, and how many are checked with the gateway at a time.
+PAYMENT_BULK_VERIFY_MAX = env.int('PAYMENT_BULK_VERIFY_MAX', default=500)
+PAYMENT_BULK_VERIFY_CONCURRENCY = env.int('PAYMENT_BULK_VERIFY_CONCURRENCY', default=8)
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
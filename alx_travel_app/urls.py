@@ -17,24 +17,12 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="ALX Travel API",
-        default_version='v1',
-        description="API documentation for ALX Travel App",
-    ),
-    public=True,
-    permission_classes=[permissions.AllowAny],
-)
+from . import docs
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('listings.urls')),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('openapi.json', docs.openapi_json, name='openapi-json'),
+    path('swagger/', docs.swagger_ui, name='schema-swagger-ui'),
+    path('redoc/', docs.redoc_ui, name='schema-redoc'),
 ]
-
@@ -0,0 +1,66 @@
+"""
+Warm-up for freshly started web processes.
+
+Called from gunicorn's ``when_ready`` hook with ``preload_app`` enabled, so
+the work happens once in the master and every forked worker inherits the
+populated caches instead of paying for them on its first requests.
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def warm_url_resolver():
+    from django.urls import get_resolver
+    resolver = get_resolver()
+    # Accessing reverse_dict populates the resolver's lookup tables.
+    resolver.reverse_dict
+    return len(resolver.url_patterns)
+
+
+def warm_serializers():
+    from listings.fast_serializers import ValuesSerializer
+    from listings.serializers import ListingSerializer, BookingSerializer, ReviewSerializer, PaymentSerializer
+    serializer_classes = [ListingSerializer, BookingSerializer, ReviewSerializer, PaymentSerializer]
+    for serializer_class in serializer_classes:
+        # Compiles and caches the fast list path. DRF rebuilds a serializer's
+        # fields for every instance, so there is nothing to warm there.
+        ValuesSerializer.for_serializer(serializer_class)
+    return len(serializer_classes)
+
+
+def warm_schema():
+    from alx_travel_app.docs import get_schema
+    # Loads the prebuilt OpenAPI document (or generates it once if missing).
+    return len(get_schema().content)
+
+
+WARMERS = [
+    ('url resolver', warm_url_resolver),
+    ('serializers', warm_serializers),
+    ('openapi schema', warm_schema),
+]
+
+
+def warm_up():
+    """
+    Run every warmer, logging how long each took. Failures are logged and
+    skipped: a cold cache is never a reason to refuse to start.
+    Returns a dict of warmer name -> seconds.
+    """
+    from django.db import connections
+    timings = {}
+    for name, warmer in WARMERS:
+        start = time.perf_counter()
+        try:
+            warmer()
+        except Exception:
+            logger.exception("Warm-up step '%s' failed", name)
+            continue
+        timings[name] = time.perf_counter() - start
+        logger.info("Warmed %s in %.1f ms", name, timings[name] * 1000)
+    # Never share database connections opened during warm-up across forks.
+    connections.close_all()
+    return timings
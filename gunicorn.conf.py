@@ -0,0 +1,83 @@
+"""
+Gunicorn configuration for the ALX Travel App.
+
+Select a worker profile with GUNICORN_PROFILE:
+
+    sync     one request per process (gunicorn's default model)
+    gthread  threaded workers; best for the I/O-bound Chapa and DB calls
+    uvicorn  ASGI workers (requires uvicorn), used for streaming endpoints
+
+Any value can be overridden with the GUNICORN_* variables below. The app is
+preloaded and warmed up in the master before workers are forked, so a
+deploy doesn't make the first requests on every worker pay for imports,
+URL resolution and loading the OpenAPI document.
+"""
+
+import multiprocessing
+import os
+
+PROFILES = {
+    'sync': {
+        'worker_class': 'sync',
+        'workers': multiprocessing.cpu_count() * 2 + 1,
+        'threads': 1,
+        'app': 'alx_travel_app.wsgi:application',
+    },
+    'gthread': {
+        'worker_class': 'gthread',
+        'workers': multiprocessing.cpu_count() + 1,
+        'threads': 4,
+        'app': 'alx_travel_app.wsgi:application',
+    },
+    'uvicorn': {
+        'worker_class': 'uvicorn.workers.UvicornWorker',
+        'workers': multiprocessing.cpu_count() + 1,
+        'threads': 1,
+        'app': 'alx_travel_app.asgi:application',
+    },
+}
+
+profile_name = os.environ.get('GUNICORN_PROFILE', 'gthread')
+if profile_name not in PROFILES:
+    raise RuntimeError(f"Unknown GUNICORN_PROFILE '{profile_name}', expected one of {sorted(PROFILES)}")
+profile = PROFILES[profile_name]
+
+wsgi_app = profile['app']
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = profile['worker_class']
+workers = int(os.environ.get('GUNICORN_WORKERS', profile['workers']))
+threads = int(os.environ.get('GUNICORN_THREADS', profile['threads']))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically to cap slow memory growth; jitter avoids all
+# workers restarting at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+def when_ready(server):
+    """Warm caches in the master (after preload, before forking workers)."""
+    if not preload_app:
+        return
+    from alx_travel_app.warmup import warm_up
+    timings = warm_up()
+    server.log.info(
+        "Profile '%s': warmed up in %.1f ms (%s)",
+        profile_name,
+        sum(timings.values()) * 1000,
+        ', '.join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in timings.items()),
+    )
+
+
+def post_fork(server, worker):
+    """Make sure no worker reuses a database connection opened in the master."""
+    if not preload_app:
+        return
+    from django.db import connections
+    connections.close_all()
@@ -1,3 +1,96 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import Listing, Booking, Review, Payment
+from .state_machine import cancel_bookings
 
-# Register your models here.
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for large tables: an unfiltered PostgreSQL changelist takes
+    its row count from the planner's estimate (pg_class.reltuples) instead
+    of a COUNT(*) over the whole table. Small tables, filtered lists and
+    other databases are counted exactly.
+    """
+    estimate_above = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)',
+                    [connection.ops.quote_name(queryset.model._meta.db_table)],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > self.estimate_above:
+                return row[0]
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist defaults for tables too big to count or join naively:
+    estimated counts, no "N total" query, newest rows first by primary key,
+    and raw id inputs instead of <select>s listing every related row.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-pk',)
+    list_per_page = 50
+
+
+@admin.register(Listing)
+class ListingAdmin(LargeTableAdmin):
+    list_display = ('id', 'title', 'location', 'price_per_night', 'owner', 'created_at')
+    list_select_related = ('owner',)
+    raw_id_fields = ('owner',)
+    search_fields = ('=id', 'title')
+
+
+@admin.register(Booking)
+class BookingAdmin(LargeTableAdmin):
+    list_display = ('id', 'listing', 'user', 'check_in', 'check_out', 'guests', 'status', 'expires_at')
+    list_select_related = ('listing', 'user')
+    list_filter = ('status',)
+    raw_id_fields = ('listing', 'user')
+    search_fields = ('=id',)
+    readonly_fields = ('status', 'expires_at', 'created_at')
+    actions = ('cancel_selected',)
+
+    @admin.action(description="Cancel selected bookings and their pending payments")
+    def cancel_selected(self, request, queryset):
+        with transaction.atomic():
+            cancelled = cancel_bookings(queryset)
+        self.message_user(request, f"Cancelled {cancelled} bookings.", messages.SUCCESS)
+
+
+@admin.register(Payment)
+class PaymentAdmin(LargeTableAdmin):
+    list_display = (
+        'id', 'transaction_id', 'booking_id', 'amount', 'currency', 'status', 'reconciled_at', 'updated_at',
+    )
+    list_filter = ('status',)
+    raw_id_fields = ('booking',)
+    search_fields = ('=transaction_id', '=chapa_reference')
+    readonly_fields = ('status', 'reconciled_at', 'created_at', 'updated_at')
+    actions = ('mark_reconciled',)
+
+    @admin.action(description="Mark selected completed payments as reconciled")
+    def mark_reconciled(self, request, queryset):
+        reconciled = queryset.filter(status='completed', reconciled_at__isnull=True).update(
+            reconciled_at=timezone.now()
+        )
+        self.message_user(request, f"Marked {reconciled} payments as reconciled.", messages.SUCCESS)
+
+
+@admin.register(Review)
+class ReviewAdmin(LargeTableAdmin):
+    list_display = ('id', 'listing', 'user', 'rating', 'created_at')
+    list_select_related = ('listing', 'user')
+    raw_id_fields = ('listing', 'user')
+    search_fields = ('=id',)
@@ -0,0 +1,75 @@
+"""
+Archival of past bookings and their payments.
+
+Bookings whose stay ended more than BOOKING_ARCHIVE_AFTER_DAYS ago are
+copied to ``ArchivedBooking``/``ArchivedPayment`` (keeping their ids) and
+deleted from the live tables, so the live tables and their indexes stay
+sized to current activity. Each batch is copied and deleted in one
+transaction: an interrupted run leaves every row in exactly one place and
+the next run carries on where it stopped. Bookings whose payment still
+owes the guest a refund stay live until it is settled.
+
+Rows leave the live tables without delete signals, which would log each
+one as deleted for sync clients and look up its owner one query at a
+time. Instead every batch appends ``archive`` change-log entries in bulk.
+"""
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+from . import changelog
+from .models import ArchivedBooking, ArchivedPayment, Booking, ChangeLogEntry, Payment
+
+# Holds expire long before a stay ends, but never archive a live one.
+ARCHIVABLE_STATUSES = ('confirmed', 'cancelled')
+
+
+def archive_cutoff(days=None):
+    """Bookings checking out before this date are archived."""
+    days = settings.BOOKING_ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.localdate() - timezone.timedelta(days=days)
+
+
+def archivable_bookings(cutoff):
+    return Booking.objects.filter(check_out__lt=cutoff, status__in=ARCHIVABLE_STATUSES).exclude(
+        payment__status='refund_due'
+    )
+
+
+def _copy_fields(model):
+    return [field.attname for field in model._meta.concrete_fields if field.name != 'archived_at']
+
+
+def archive_batch(cutoff, batch_size=1000):
+    """
+    Archive up to `batch_size` bookings that checked out before `cutoff`,
+    oldest first, with their payments. Returns (bookings, payments) archived.
+    """
+    with transaction.atomic():
+        booking_ids = list(
+            archivable_bookings(cutoff).select_for_update()
+            .order_by('check_out', 'pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not booking_ids:
+            return 0, 0
+        now = timezone.now()
+        bookings = list(Booking.objects.filter(pk__in=booking_ids).values(*_copy_fields(ArchivedBooking)))
+        payments = list(Payment.objects.filter(booking_id__in=booking_ids).values(*_copy_fields(ArchivedPayment)))
+        # A row already in the archive is an IntegrityError that rolls the
+        # batch back, rather than a skipped copy whose live row is deleted.
+        archived_bookings = ArchivedBooking.objects.bulk_create(
+            [ArchivedBooking(archived_at=now, **row) for row in bookings]
+        )
+        archived_payments = ArchivedPayment.objects.bulk_create(
+            [ArchivedPayment(archived_at=now, **row) for row in payments]
+        )
+        owners = {row['id']: row['user_id'] for row in bookings}
+        changelog.record_many(Booking, owners.items(), ChangeLogEntry.ARCHIVE)
+        changelog.record_many(
+            Payment, [(row['id'], owners[row['booking_id']]) for row in payments], ChangeLogEntry.ARCHIVE
+        )
+        # Payments first: a raw delete doesn't cascade.
+        using = router.db_for_write(Booking)
+        Payment.objects.filter(booking_id__in=booking_ids)._raw_delete(using)
+        Booking.objects.filter(pk__in=booking_ids)._raw_delete(using)
+    return len(archived_bookings), len(archived_payments)
@@ -0,0 +1,195 @@
+"""
+Signed, short-lived bearer tokens.
+
+A token is a ``django.core.signing`` timestamped, HMAC-signed payload of
+the user id, a random token id and the issue time. Revocations (of one
+token, or of every token a user was issued up to a point in time) are
+stored in the database (``TokenRevocation``). Checking a token reads the
+user's revocation state from the default cache. That state is whether the
+user is active, their latest revoke-all watermark and their revoked token
+ids. It is rebuilt from the database (replicas included) when missing,
+kept for AUTH_REVOCATION_CACHE_SECONDS, and rewritten by whoever revokes,
+deactivates or deletes the user. With a shared cache (``CACHE_URL``) every
+process sees a revocation at once. With a per-process cache, other
+processes see it within AUTH_REVOCATION_CACHE_SECONDS, and
+``manage.py check --deploy`` warns about that. The user instance itself
+comes from a small in-process LRU of principals, so changes to other user
+fields (e.g. is_staff) take up to AUTH_PRINCIPAL_CACHE_TTL seconds to apply.
+
+Send ``Authorization: Bearer <token>``; obtain tokens from
+``POST /api/auth/token/``.
+"""
+
+import copy
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from alx_travel_app.db_router import pin_if_user_pinned
+from .models import TokenRevocation
+
+TOKEN_SALT = 'listings.authentication.token'
+KEYWORD = b'bearer'
+
+
+def issue_token(user):
+    """Return (token, expires_in_seconds) for `user`."""
+    payload = {'u': user.pk, 'j': secrets.token_urlsafe(9), 'i': time.time()}
+    return signing.dumps(payload, salt=TOKEN_SALT, compress=False), settings.AUTH_TOKEN_TTL_SECONDS
+
+
+def read_token(token):
+    """
+    Verify `token`'s signature and age and return its payload: user id
+    'u', token id 'j' and issue time 'i'. Raises AuthenticationFailed.
+    """
+    try:
+        return signing.loads(token, salt=TOKEN_SALT, max_age=settings.AUTH_TOKEN_TTL_SECONDS)
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed('Token has expired.')
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed('Invalid token.')
+
+
+def _revocations_key(user_id):
+    return f'auth:revocations:{user_id}'
+
+
+def _load_revocations(user_id):
+    """The revocation state of `user_id` as the database has it."""
+    now = timezone.now()
+    active = get_user_model().objects.filter(pk=user_id, is_active=True).exists()
+    before, tokens = None, []
+    for token_id, revoked_at in TokenRevocation.objects.filter(user_id=user_id, expires_at__gt=now).values_list(
+        'token_id', 'revoked_at'
+    ):
+        if token_id:
+            tokens.append(token_id)
+        else:
+            before = max(before or 0, revoked_at.timestamp())
+    return {'active': active, 'before': before, 'tokens': tokens}
+
+
+def refresh_revocations(user_id):
+    """Rebuild the cached revocation state of `user_id`; call after changing it."""
+    state = _load_revocations(user_id)
+    cache.set(_revocations_key(user_id), state, timeout=settings.AUTH_REVOCATION_CACHE_SECONDS)
+    return state
+
+
+def revocations(user_id):
+    state = cache.get(_revocations_key(user_id))
+    return state if state is not None else refresh_revocations(user_id)
+
+
+def _revoke(user_id, token_id, expires_at):
+    now = timezone.now()
+    # Revocations of tokens that have since expired are no longer needed.
+    TokenRevocation.objects.filter(expires_at__lte=now).delete()
+    TokenRevocation.objects.create(user_id=user_id, token_id=token_id, revoked_at=now, expires_at=expires_at)
+    refresh_revocations(user_id)
+
+
+def revoke_token(payload):
+    """Revoke one token (by its payload) until it would have expired anyway."""
+    remaining = settings.AUTH_TOKEN_TTL_SECONDS - (time.time() - payload['i'])
+    if remaining > 0:
+        _revoke(payload['u'], payload['j'], timezone.now() + timedelta(seconds=remaining))
+
+
+def revoke_user_tokens(user):
+    """Revoke every token issued to `user` so far, e.g. on password change or deactivation."""
+    _revoke(user.pk, '', timezone.now() + timedelta(seconds=settings.AUTH_TOKEN_TTL_SECONDS))
+    principals.discard(user.pk)
+
+
+def is_valid(payload):
+    """True if the token's user exists and is active and the token has not been revoked."""
+    state = revocations(payload['u'])
+    if not state['active'] or payload['j'] in state['tokens']:
+        return False
+    return state['before'] is None or payload['i'] > state['before']
+
+
+class PrincipalCache:
+    """
+    Thread-safe LRU of user instances by id, each kept for at most
+    `ttl` seconds so changes to a user (e.g. is_staff) are picked up.
+    Callers get a copy, never the shared instance.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, load):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return copy.copy(entry[1])
+            self.misses += 1
+        user = load(user_id)
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return copy.copy(user)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principals = PrincipalCache(settings.AUTH_PRINCIPAL_CACHE_SIZE, settings.AUTH_PRINCIPAL_CACHE_TTL)
+
+
+def _load_user(user_id):
+    try:
+        return get_user_model().objects.get(pk=user_id)
+    except get_user_model().DoesNotExist:
+        raise exceptions.AuthenticationFailed('User not found.')
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """DRF authentication for `Authorization: Bearer <signed token>`."""
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != KEYWORD:
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        payload = read_token(token)
+        if not is_valid(payload):
+            raise exceptions.AuthenticationFailed('Token revoked, or user inactive or deleted.')
+        user = principals.get(payload['u'], _load_user)
+        pin_if_user_pinned(user.pk)
+        return user, payload
+
+    def authenticate_header(self, request):
+        return 'Bearer'
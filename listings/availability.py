@@ -0,0 +1,122 @@
+"""
+Per-listing occupancy bitmaps for availability search.
+
+Each ``ListingCalendar`` stores one bit per night for
+``LISTING_CALENDAR_DAYS`` nights from its ``origin`` (the day it was last
+rebuilt), so checking whether a listing is free for a stay is a shift and
+a mask on a Python int instead of a query against its bookings. Calendars
+are refreshed after every committed booking change and rebuilt nightly by
+the ``refresh_listing_calendars`` task to roll the horizon forward.
+
+Listings without a calendar, and stays the calendar doesn't cover, fall
+back to a single overlap query on bookings, so search results never
+depend on the bitmaps being present.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Booking, Listing, ListingCalendar
+
+
+def horizon_days():
+    # Whole bytes, so a stored bitmap covers exactly len(nights) * 8 nights.
+    return -(-settings.LISTING_CALENDAR_DAYS // 8) * 8
+
+
+def occupancy_bits(origin, days, stays):
+    """Return an int with a bit set for every night in `stays` within `days` nights of `origin`."""
+    bits = 0
+    for check_in, check_out in stays:
+        start = max((check_in - origin).days, 0)
+        end = min((check_out - origin).days, days)
+        if start < end:
+            bits |= ((1 << (end - start)) - 1) << start
+    return bits
+
+
+def _active_stays(listing_ids, origin, until):
+    """(listing_id, check_in, check_out) for bookings holding nights in [origin, until)."""
+    return (
+        Booking.objects.filter(listing_id__in=listing_ids, check_in__lt=until, check_out__gt=origin)
+        .exclude(status='cancelled')
+        .values_list('listing_id', 'check_in', 'check_out')
+    )
+
+
+def rebuild_calendars(listing_ids, origin=None):
+    """
+    Rebuild the calendars of `listing_ids` from their bookings.
+
+    The listing rows are locked first, so concurrent rebuilds of the same
+    listing run one after another and the last one always reads every
+    committed booking.
+    """
+    origin = origin or timezone.localdate()
+    days = horizon_days()
+    until = origin + timezone.timedelta(days=days)
+    with transaction.atomic():
+        listing_ids = list(Listing.objects.select_for_update().filter(pk__in=listing_ids).values_list('pk', flat=True))
+        stays = {listing_id: [] for listing_id in listing_ids}
+        for listing_id, check_in, check_out in _active_stays(listing_ids, origin, until):
+            stays[listing_id].append((check_in, check_out))
+        now = timezone.now()
+        ListingCalendar.objects.bulk_create(
+            [
+                ListingCalendar(
+                    listing_id=listing_id,
+                    origin=origin,
+                    nights=occupancy_bits(origin, days, listing_stays).to_bytes(days // 8, 'little'),
+                    updated_at=now,
+                )
+                for listing_id, listing_stays in stays.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['listing'],
+            update_fields=['origin', 'nights', 'updated_at'],
+        )
+    return len(listing_ids)
+
+
+def refresh_calendar_on_commit(listing_id):
+    """Rebuild a listing's calendar once the current transaction commits."""
+    transaction.on_commit(lambda: rebuild_calendars([listing_id]))
+
+
+def is_free(origin, nights, check_in, check_out):
+    """
+    True/False if the bitmap shows the stay free/taken, or None when the
+    stay falls outside the nights it covers.
+    """
+    offset = (check_in - origin).days
+    length = (check_out - check_in).days
+    if offset < 0 or offset + length > len(nights) * 8:
+        return None
+    return (int.from_bytes(nights, 'little') >> offset) & ((1 << length) - 1) == 0
+
+
+def stay_taken(listing_id, check_in, check_out):
+    """
+    True if a booking that isn't cancelled holds any night of the stay. Reads
+    the bookings themselves: a calendar can be a commit behind.
+    """
+    return _active_stays([listing_id], check_in, check_out).exists()
+
+
+def filter_available(queryset, check_in, check_out):
+    """
+    Narrow a Listing queryset to listings with no active booking overlapping
+    [check_in, check_out).
+    """
+    taken, unknown = [], []
+    rows = queryset.order_by().values_list('pk', 'calendar__origin', 'calendar__nights')
+    for listing_id, origin, nights in rows.iterator(chunk_size=2000):
+        result = None if origin is None else is_free(origin, nights, check_in, check_out)
+        if result is None:
+            unknown.append(listing_id)
+        elif not result:
+            taken.append(listing_id)
+    if unknown:
+        taken.extend(_active_stays(unknown, check_in, check_out).values_list('listing_id', flat=True).distinct())
+    # Usually far fewer listings are taken than free.
+    return queryset.exclude(pk__in=taken)
@@ -0,0 +1,143 @@
+"""
+Per-user change log behind ``/api/sync/``.
+
+Every create, update and delete of a Booking, Payment or Review appends a
+``ChangeLogEntry`` for the user who owns the record, in the same
+transaction as the change. Signals cover ``save()``/``delete()``; the
+conditional ``UPDATE`` transitions in ``state_machine`` record their
+changes explicitly, and ``archive`` records the rows it moves out of the
+live tables as archived.
+
+Clients keep an opaque cursor, ``"<sequence>.<issued unix time>"``, and ask
+for everything after it. ``compact`` drops superseded entries and anything
+older than SYNC_RETENTION_DAYS; cursors older than that get ``reset`` and
+must re-fetch in full.
+
+Limitation: sequence numbers are taken at INSERT, not at COMMIT, so on
+PostgreSQL an entry can become visible after entries with higher
+sequences. Entries younger than SYNC_SETTLE_SECONDS are held back to cover
+that, which is only a heuristic: a transaction that commits its entries
+more than SYNC_SETTLE_SECONDS after writing them can be skipped by a
+client that synced in between, and that client misses the change until
+the record changes again. Every transaction that writes the log must stay
+short. Long batches (hold expiry, archiving) commit per batch for that
+reason. Late commits are logged as warnings; if they show up, raise
+SYNC_SETTLE_SECONDS. SQLite runs one write transaction at a time and is
+not affected.
+"""
+
+import logging
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, Min, OuterRef
+from django.utils import timezone
+from .models import Booking, ChangeLogEntry, Payment, Review
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAMES = {Booking: 'booking', Payment: 'payment', Review: 'review'}
+
+
+def owner_id(instance):
+    """The id of the user whose feed a change to `instance` belongs to."""
+    if isinstance(instance, Payment):
+        if Payment._meta.get_field('booking').is_cached(instance):
+            return instance.booking.user_id
+        return Booking.objects.filter(pk=instance.booking_id).values_list('user_id', flat=True).first()
+    return instance.user_id
+
+
+def _warn_if_committed_late(written_at):
+    def check():
+        delay = time.monotonic() - written_at
+        if delay > settings.SYNC_SETTLE_SECONDS:
+            logger.warning(
+                "Change log entries committed %.1fs after they were written, more than SYNC_SETTLE_SECONDS=%s; "
+                "sync clients may have skipped them", delay, settings.SYNC_SETTLE_SECONDS
+            )
+    transaction.on_commit(check)
+
+
+def record(instance, action=ChangeLogEntry.UPSERT):
+    user_id = owner_id(instance)
+    if user_id is not None:
+        ChangeLogEntry.objects.create(
+            user_id=user_id, model=MODEL_NAMES[type(instance)], object_id=instance.pk, action=action
+        )
+        _warn_if_committed_late(time.monotonic())
+
+
+def record_many(model, rows, action=ChangeLogEntry.UPSERT):
+    """Append entries for (object_id, user_id) pairs of `model` in one query."""
+    entries = ChangeLogEntry.objects.bulk_create(
+        ChangeLogEntry(user_id=user_id, model=MODEL_NAMES[model], object_id=object_id, action=action)
+        for object_id, user_id in rows
+    )
+    if entries:
+        _warn_if_committed_late(time.monotonic())
+
+
+def make_cursor(sequence):
+    return f'{sequence}.{int(time.time())}'
+
+
+def parse_cursor(cursor):
+    """Return (sequence, issued_at) for a cursor, or (0, None) for none. Raises ValueError."""
+    if not cursor:
+        return 0, None
+    sequence, issued_at = cursor.split('.')
+    return int(sequence), int(issued_at)
+
+
+def cursor_expired(issued_at):
+    return issued_at is not None and issued_at < time.time() - settings.SYNC_RETENTION_DAYS * 86400
+
+
+def _settled(user):
+    settled = timezone.now() - timezone.timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    return ChangeLogEntry.objects.filter(user=user, created_at__lte=settled)
+
+
+def changes_since(user, sequence, limit):
+    """
+    Settled entries after `sequence` for `user`, oldest first, at most
+    `limit`. Returns (entries, has_more).
+    """
+    entries = list(
+        _settled(user).filter(pk__gt=sequence)
+        .order_by('pk').values_list('pk', 'model', 'object_id', 'action')[:limit + 1]
+    )
+    return entries[:limit], len(entries) > limit
+
+
+def latest_sequence(user):
+    """The sequence a client that has just fetched everything should continue from."""
+    return _settled(user).order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def compact(batch_size=5000):
+    """
+    Keep the log bounded: delete entries older than the retention window
+    (oldest first), then entries superseded by a newer entry for the same
+    record, `batch_size` entries (or sequence numbers) per statement.
+    Returns the number of entries deleted.
+    """
+    cutoff = timezone.now() - timezone.timedelta(days=settings.SYNC_RETENTION_DAYS)
+    deleted = 0
+    while True:
+        expired = list(
+            ChangeLogEntry.objects.filter(created_at__lt=cutoff).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not expired:
+            break
+        deleted += ChangeLogEntry.objects.filter(pk__in=expired).delete()[0]
+    newer = ChangeLogEntry.objects.filter(model=OuterRef('model'), object_id=OuterRef('object_id'), pk__gt=OuterRef('pk'))
+    bounds = ChangeLogEntry.objects.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return deleted
+    for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+        deleted += ChangeLogEntry.objects.filter(
+            pk__gte=start, pk__lt=start + batch_size
+        ).filter(Exists(newer)).delete()[0]
+    return deleted
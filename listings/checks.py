@@ -0,0 +1,40 @@
+"""Deployment checks for settings the listings app relies on (``manage.py check --deploy``)."""
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register
+
+from .throttling import _redis_client
+
+
+@register(deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if _redis_client(caches['default']) is not None:
+        return []
+    return [
+        Warning(
+            "The default cache is not Redis, so throttle buckets are kept per process.",
+            hint=(
+                "Each worker grants the full throttle rates, so clients get them times the number "
+                "of workers. Set CACHE_URL to a Redis cache."
+            ),
+            id='listings.W001',
+        )
+    ]
+
+
+@register(deploy=True)
+def check_shared_revocations(app_configs, **kwargs):
+    if not isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return []
+    return [
+        Warning(
+            "The default cache is per process, so token revocations reach other processes late.",
+            hint=(
+                "A revoked bearer token stays valid in other workers for up to "
+                "AUTH_REVOCATION_CACHE_SECONDS. Set CACHE_URL to a shared cache such as Redis."
+            ),
+            id='listings.W002',
+        )
+    ]
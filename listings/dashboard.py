@@ -0,0 +1,99 @@
+"""
+Owner dashboard behind ``/api/owners/me/dashboard/``.
+
+Everything a host needs about their listings comes from two queries,
+however many listings they own: one row per listing with its upcoming
+booking count, revenue and rating aggregates (each a correlated subquery,
+so the aggregates can't multiply each other's rows as joins would), and
+the next few upcoming bookings of every listing, ranked with a window
+function. The result is cached per owner for OWNER_DASHBOARD_CACHE_SECONDS.
+"""
+
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, DecimalField, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
+from .models import ArchivedPayment, Booking, Listing, Payment, Review
+
+UPCOMING_PER_LISTING = 5
+CENTS = Decimal('0.01')
+
+
+def _per_listing(queryset, listing_field, aggregate, output_field, default=None):
+    """
+    Correlated subquery computing `aggregate` over the rows of `queryset`
+    whose `listing_field` is the outer listing.
+    """
+    subquery = Subquery(
+        queryset.filter(**{listing_field: OuterRef('pk')}).order_by()
+        .values(listing_field).annotate(value=aggregate).values('value'),
+        output_field=output_field,
+    )
+    return subquery if default is None else Coalesce(subquery, default, output_field=output_field)
+
+
+def _active_bookings(today):
+    """Bookings not cancelled whose stay hasn't ended: upcoming or in progress."""
+    return Booking.objects.filter(check_out__gt=today).exclude(status='cancelled')
+
+
+def owner_dashboard(owner_id, today=None):
+    """The dashboard of the user `owner_id`: per-listing rows and totals, in two queries."""
+    today = today or timezone.localdate()
+    money = DecimalField(max_digits=12, decimal_places=2)
+    listings = (
+        Listing.objects.filter(owner_id=owner_id).order_by('pk')
+        .annotate(
+            upcoming_count=_per_listing(_active_bookings(today), 'listing_id', Count('pk'), IntegerField(), 0),
+            revenue=_per_listing(
+                Payment.objects.filter(status='completed'), 'booking__listing_id', Sum('amount'), money, Decimal('0'),
+            ),
+            archived_revenue=_per_listing(
+                ArchivedPayment.objects.filter(status='completed'), 'booking__listing_id', Sum('amount'), money, Decimal('0'),
+            ),
+            review_count=_per_listing(Review.objects.all(), 'listing_id', Count('pk'), IntegerField(), 0),
+            average_rating=_per_listing(Review.objects.all(), 'listing_id', Avg('rating'), FloatField()),
+        )
+        .values(
+            'id', 'title', 'location', 'upcoming_count', 'revenue', 'archived_revenue', 'review_count', 'average_rating',
+        )
+    )
+    upcoming = (
+        _active_bookings(today).filter(listing__owner_id=owner_id)
+        .annotate(position=Window(RowNumber(), partition_by=F('listing_id'), order_by=[F('check_in'), F('pk')]))
+        .filter(position__lte=UPCOMING_PER_LISTING)
+        .order_by('listing_id', 'check_in', 'pk')
+        .values('id', 'listing_id', 'user_id', 'check_in', 'check_out', 'guests', 'status')
+    )
+    bookings = {}
+    for booking in upcoming:
+        bookings.setdefault(booking.pop('listing_id'), []).append(booking)
+
+    rows = []
+    totals = {'listings': 0, 'upcoming_bookings': 0, 'revenue': Decimal('0'), 'reviews': 0}
+    for listing in listings:
+        revenue = listing.pop('revenue') + listing.pop('archived_revenue')
+        average = listing['average_rating']
+        rows.append({
+            **listing,
+            'revenue': str(revenue.quantize(CENTS)),
+            'average_rating': round(average, 2) if average is not None else None,
+            'upcoming_bookings': bookings.get(listing['id'], []),
+        })
+        totals['listings'] += 1
+        totals['upcoming_bookings'] += listing['upcoming_count']
+        totals['revenue'] += revenue
+        totals['reviews'] += listing['review_count']
+    totals['revenue'] = str(totals['revenue'].quantize(CENTS))
+    return {'totals': totals, 'listings': rows}
+
+
+def cached_owner_dashboard(owner_id):
+    key = f'dashboard:owner:{owner_id}'
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = owner_dashboard(owner_id)
+        cache.set(key, dashboard, timeout=settings.OWNER_DASHBOARD_CACHE_SECONDS)
+    return dashboard
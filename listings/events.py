@@ -0,0 +1,295 @@
+"""
+Status events for payments and bookings, streamed to clients over SSE.
+
+``state_machine`` publishes an event on the topic ``payment:<id>`` or
+``booking:<id>`` whenever a transition commits. Events fan out to
+subscribers through an in-process ``EventHub``; the backend decides how
+they get there:
+
+    LocalBackend   delivers within this process only (default without Redis)
+    RedisBackend   publishes through Redis pub/sub, and a listener thread
+                   in every process feeds its hub (default when the cache
+                   is Redis)
+
+Set EVENTS_BACKEND to the dotted path of another backend class (taking the
+hub as its only argument) to plug in something else.
+
+Under ASGI an open stream waits on the event loop. Under WSGI (the sync
+and gthread Gunicorn profiles) it occupies a worker thread for up to
+SSE_MAX_SECONDS, so each process serves at most SSE_MAX_SYNC_STREAMS
+synchronous streams at a time and refuses more with ``TooManyStreams``.
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+from .throttling import _redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    Events for one topic, buffered for one reader. Created with an event
+    loop for async readers (`aget`), without one for sync readers (`get`).
+    """
+
+    def __init__(self, hub, topic, loop=None):
+        self.hub = hub
+        self.topic = topic
+        self.loop = loop
+        self._queue = asyncio.Queue() if loop else queue.Queue()
+
+    def put(self, event):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._queue.put_nowait, event)
+        else:
+            self._queue.put_nowait(event)
+
+    def get(self, timeout):
+        """Next event, or None after `timeout` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout):
+        """Next event, or None after `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """In-process fan-out of events to subscriptions by topic."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic, loop=None):
+        subscription = Subscription(self, topic, loop)
+        with self._lock:
+            self._subscriptions[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.topic)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.topic]
+
+    def dispatch(self, topic, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(topic, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+
+class LocalBackend:
+    """Delivers events to subscribers in this process only."""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def start(self):
+        pass
+
+    def publish(self, topic, event):
+        self.hub.dispatch(topic, event)
+
+
+class RedisBackend:
+    """
+    Publishes events through Redis pub/sub. A daemon thread, started on the
+    first subscription in each process, relays every event to its hub.
+    """
+    prefix = 'events:'
+
+    def __init__(self, hub, client=None):
+        self.hub = hub
+        self.client = client or _redis_client(cache)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen, name='events-listener', daemon=True)
+                self._thread.start()
+
+    def publish(self, topic, event):
+        self.client.publish(self.prefix + topic, json.dumps(event))
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.prefix + '*')
+                for message in pubsub.listen():
+                    channel = message['channel']
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    self.hub.dispatch(channel[len(self.prefix):], json.loads(message['data']))
+            except Exception:
+                logger.exception("Event listener lost its Redis connection; reconnecting")
+                time.sleep(1)
+
+
+hub = EventHub()
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.EVENTS_BACKEND:
+                    _backend = import_string(settings.EVENTS_BACKEND)(hub)
+                else:
+                    client = None
+                    try:
+                        client = _redis_client(cache)
+                    except Exception:
+                        logger.warning("Could not get a Redis client for events; delivering in-process only")
+                    _backend = RedisBackend(hub, client) if client is not None else LocalBackend(hub)
+    return _backend
+
+
+def publish(topic, event):
+    """Publish `event` (a JSON-serializable dict) on `topic`. Never raises."""
+    try:
+        get_backend().publish(topic, event)
+    except Exception:
+        logger.exception("Could not publish event on %s", topic)
+
+
+def publish_on_commit(topic, event):
+    """Publish once the current transaction commits, so subscribers see committed state."""
+    transaction.on_commit(lambda: publish(topic, event))
+
+
+def subscribe(topic, loop=None):
+    backend = get_backend()
+    backend.start()
+    return hub.subscribe(topic, loop)
+
+
+class TooManyStreams(Exception):
+    """This process already serves SSE_MAX_SYNC_STREAMS synchronous streams."""
+
+
+class StreamSlots:
+    """Count of the synchronous streams open in this process, capped by SSE_MAX_SYNC_STREAMS."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+
+    def acquire(self):
+        with self._lock:
+            if self.open >= settings.SSE_MAX_SYNC_STREAMS:
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+
+sync_streams = StreamSlots()
+
+
+class _SlotStream:
+    """
+    Iterates `stream` and frees its slot when the response is closed, which
+    happens even if the stream was never started.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._stream)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._stream.close()
+            sync_streams.release()
+
+
+def format_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def event_stream(topic, snapshot, is_final, asynchronous):
+    """
+    SSE body for `topic`: the current state from `snapshot()` first (read
+    after subscribing, so no transition can fall in between), then every
+    published event until `is_final(event)` or SSE_MAX_SECONDS. Comments
+    are sent every SSE_KEEPALIVE_SECONDS to keep proxies from timing out.
+    Returns an async iterator for ASGI servers, a sync one for WSGI; the
+    sync one holds a stream slot until closed, and raises TooManyStreams if
+    none is free.
+    """
+    keepalive = settings.SSE_KEEPALIVE_SECONDS
+    retry = f"retry: {settings.SSE_RETRY_MILLISECONDS}\n\n"
+
+    def remaining(deadline):
+        return min(keepalive, deadline - time.monotonic())
+
+    if not asynchronous:
+        def stream():
+            subscription = subscribe(topic)
+            try:
+                yield retry
+                event = snapshot()
+                yield format_event('status', event)
+                deadline = time.monotonic() + settings.SSE_MAX_SECONDS
+                while not is_final(event) and remaining(deadline) > 0:
+                    event = subscription.get(remaining(deadline))
+                    yield ": keepalive\n\n" if event is None else format_event('status', event)
+                    event = event or {}
+            finally:
+                subscription.close()
+        if not sync_streams.acquire():
+            raise TooManyStreams()
+        return _SlotStream(stream())
+
+    async def astream():
+        from asgiref.sync import sync_to_async
+        subscription = subscribe(topic, asyncio.get_running_loop())
+        try:
+            yield retry
+            event = await sync_to_async(snapshot)()
+            yield format_event('status', event)
+            deadline = time.monotonic() + settings.SSE_MAX_SECONDS
+            while not is_final(event) and remaining(deadline) > 0:
+                event = await subscription.aget(remaining(deadline))
+                yield ": keepalive\n\n" if event is None else format_event('status', event)
+                event = event or {}
+        finally:
+            subscription.close()
+    return astream()
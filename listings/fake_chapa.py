@@ -0,0 +1,146 @@
+"""
+A local stand-in for the Chapa API, used by ``load_test_payments``.
+
+Serves the two endpoints the payment views call, ``POST
+/transaction/initialize`` and ``GET /transaction/verify/<tx_ref>``, from a
+threaded HTTP server on localhost. Latency, gateway errors and declined
+payments can be injected so the payment path can be load-tested without
+real keys or network access.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INITIALIZE_PATH = '/transaction/initialize'
+VERIFY_PREFIX = '/transaction/verify/'
+
+
+class FakeChapaServer:
+    """
+    Fake Chapa gateway. Every response is delayed by ``latency`` seconds plus
+    or minus up to ``jitter``; ``error_rate`` of requests get a 500 and
+    ``decline_rate`` of verified transactions report a failed payment.
+
+    ``counts`` holds the number of responses per endpoint, and
+    ``max_in_flight`` the most requests that were being served at once.
+
+    Use as a context manager, or call start() and stop().
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, decline_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.decline_rate = decline_rate
+        self.counts = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.transactions = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _handler_for(self))
+        server.daemon_threads = True
+        self._server = server
+        self._thread = threading.Thread(target=server.serve_forever, name='fake-chapa', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _roll(self, rate):
+        with self._lock:
+            return self._random.random() < rate
+
+    def _delay(self):
+        with self._lock:
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def initialize(self, payload):
+        tx_ref = payload.get('tx_ref')
+        if not tx_ref:
+            return 400, {'status': 'failed', 'message': 'tx_ref is required', 'data': None}
+        with self._lock:
+            self.transactions[tx_ref] = 'failed' if self._random.random() < self.decline_rate else 'success'
+        return 200, {
+            'status': 'success',
+            'message': 'Hosted Link',
+            'data': {'checkout_url': f'{self.base_url}/checkout/{tx_ref}'},
+        }
+
+    def verify(self, tx_ref):
+        with self._lock:
+            outcome = self.transactions.get(tx_ref)
+        if outcome is None:
+            return 404, {'status': 'failed', 'message': 'Invalid transaction or Transaction not found', 'data': None}
+        return 200, {
+            'status': 'success',
+            'message': 'Payment details',
+            'data': {'tx_ref': tx_ref, 'status': outcome, 'reference': f'fake-{tx_ref}'},
+        }
+
+
+def _handler_for(gateway):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length)
+            if self.path != INITIALIZE_PATH:
+                return self.respond('not_found', 404, {'message': 'Not found'})
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                return self.respond('initialize', 400, {'status': 'failed', 'message': 'Invalid JSON'})
+            self.respond('initialize', *gateway.initialize(payload))
+
+        def do_GET(self):
+            if not self.path.startswith(VERIFY_PREFIX):
+                return self.respond('not_found', 404, {'message': 'Not found'})
+            self.respond('verify', *gateway.verify(self.path[len(VERIFY_PREFIX):]))
+
+        def respond(self, endpoint, status, payload):
+            with gateway._lock:
+                gateway.in_flight += 1
+                gateway.max_in_flight = max(gateway.max_in_flight, gateway.in_flight)
+            gateway._delay()
+            if endpoint != 'not_found' and gateway._roll(gateway.error_rate):
+                endpoint, status, payload = f'{endpoint}_error', 500, {'status': 'failed', 'message': 'Injected failure'}
+            with gateway._lock:
+                gateway.counts[endpoint] += 1
+                gateway.in_flight -= 1
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
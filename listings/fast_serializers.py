@@ -0,0 +1,138 @@
+"""
+Fast read-only serialization for list endpoints.
+
+`ValuesSerializer` compiles a plain ``ModelSerializer`` into a list of
+(column, converter) pairs once, then serializes querysets straight from
+``values_list()`` without instantiating models or running per-field
+serializer machinery. The output is identical to ``ModelSerializer(...,
+many=True).data`` for the field types listed in ``_CONVERTER_FACTORIES``;
+serializers using anything else are not compiled and callers fall back to
+the regular serializer.
+"""
+
+import decimal
+from rest_framework import fields, relations, serializers
+from rest_framework.settings import api_settings
+
+
+def _identity_converter(field):
+    return None
+
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if field.localize or field.normalize_output or not coerce_to_string or field.decimal_places is None:
+        return field.to_representation
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != fields.ISO_8601:
+        return field.to_representation
+    enforce_timezone = field.enforce_timezone
+
+    def convert(value):
+        value = enforce_timezone(value).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _date_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format is None or output_format.lower() != fields.ISO_8601:
+        return field.to_representation
+    return lambda value: value.isoformat()
+
+
+# Exact serializer field classes the fast path knows how to reproduce. A
+# factory returning None means the raw database value is already the output.
+_CONVERTER_FACTORIES = {
+    fields.IntegerField: _identity_converter,
+    fields.CharField: _identity_converter,
+    fields.BooleanField: _identity_converter,
+    fields.ChoiceField: _identity_converter,
+    fields.DecimalField: _decimal_converter,
+    fields.DateTimeField: _datetime_converter,
+    fields.DateField: _date_converter,
+    relations.PrimaryKeyRelatedField: _identity_converter,
+}
+
+
+class ValuesSerializer:
+    """Compiled, read-only equivalent of a flat ModelSerializer."""
+
+    _compiled = {}
+
+    def __init__(self, serializer_class, field_names, columns, converters):
+        self.serializer_class = serializer_class
+        self.field_names = field_names
+        self.columns = columns
+        self.converters = converters
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        """
+        Return the compiled serializer for `serializer_class`, or None if it
+        uses fields the fast path cannot reproduce exactly.
+        """
+        if serializer_class not in cls._compiled:
+            cls._compiled[serializer_class] = cls._compile(serializer_class)
+        return cls._compiled[serializer_class]
+
+    @classmethod
+    def _compile(cls, serializer_class):
+        if not issubclass(serializer_class, serializers.ModelSerializer):
+            return None
+        model = serializer_class.Meta.model
+        field_names, columns, converters = [], [], []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            factory = _CONVERTER_FACTORIES.get(type(field))
+            if factory is None or field.source == '*' or '.' in field.source:
+                return None
+            if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is not None:
+                return None
+            try:
+                model_field = model._meta.get_field(field.source)
+            except Exception:
+                return None
+            if model_field.is_relation and not model_field.many_to_one and not model_field.one_to_one:
+                return None
+            field_names.append(name)
+            columns.append(model_field.attname)
+            converters.append(factory(field))
+        return cls(serializer_class, tuple(field_names), tuple(columns), tuple(converters))
+
+    def serialize(self, queryset):
+        """Serialize `queryset` (or a list of model instances) to a list of dicts."""
+        field_names = self.field_names
+        converted = [
+            (index, converter) for index, converter in enumerate(self.converters)
+            if converter is not None
+        ]
+        if isinstance(queryset, (list, tuple)):
+            rows = [[getattr(obj, column) for column in self.columns] for obj in queryset]
+        else:
+            rows = queryset.values_list(*self.columns)
+
+        data = []
+        for row in rows:
+            row = list(row)
+            for index, converter in converted:
+                value = row[index]
+                if value is not None:
+                    row[index] = converter(value)
+            data.append(dict(zip(field_names, row)))
+        return data
@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+from listings.archive import archivable_bookings, archive_batch, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Move bookings whose stay ended more than BOOKING_ARCHIVE_AFTER_DAYS ago, and their "
+        "payments, into the archive tables in batches. Each batch commits on its own, so the "
+        "command can be stopped at any point and rerun to resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Archive stays that ended more than N days ago.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Bookings per transaction.")
+        parser.add_argument('--max-batches', type=int, default=None, help="Stop after N batches.")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between batches.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be archived.")
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        if options['dry_run']:
+            count = archivable_bookings(cutoff).count()
+            self.stdout.write(f"{count} bookings checked out before {cutoff} would be archived")
+            return
+
+        batches = bookings = payments = 0
+        start = time.perf_counter()
+        while options['max_batches'] is None or batches < options['max_batches']:
+            archived_bookings, archived_payments = archive_batch(cutoff, options['batch_size'])
+            if not archived_bookings:
+                break
+            batches += 1
+            bookings += archived_bookings
+            payments += archived_payments
+            self.stdout.write(f"  batch {batches}: {archived_bookings} bookings, {archived_payments} payments")
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {bookings} bookings and {payments} payments checked out before {cutoff} "
+            f"in {batches} batches ({time.perf_counter() - start:.1f}s)"
+        ))
@@ -0,0 +1,75 @@
+import time
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from listings.authentication import issue_token, principals
+from listings.models import Listing, Booking
+from listings.views import BookingViewSet
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare session authentication with signed bearer tokens on GET /api/bookings/: "
+        "time and database queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per authentication mode.")
+        parser.add_argument('--host', default='localhost')
+
+    def handle(self, *args, **options):
+        throttle_classes = BookingViewSet.throttle_classes
+        # The per-user rate limit would otherwise end the run early.
+        BookingViewSet.throttle_classes = []
+        try:
+            with transaction.atomic():
+                user = self._create_rows()
+                session = Client(HTTP_HOST=options['host'])
+                session.force_login(user)
+                token, _ = issue_token(user)
+                bearer = Client(HTTP_HOST=options['host'], HTTP_AUTHORIZATION=f'Bearer {token}')
+                principals.clear()
+                for label, client in (('session', session), ('bearer token', bearer)):
+                    self._measure(label, client, options['requests'])
+                self.stdout.write(
+                    f"principal cache: {principals.hits} hits, {principals.misses} misses"
+                )
+                # Leave the database untouched.
+                transaction.set_rollback(True)
+        finally:
+            BookingViewSet.throttle_classes = throttle_classes
+
+    def _create_rows(self):
+        user = User.objects.create_user(username=f'bench_{time.time_ns()}')
+        listing = Listing.objects.create(
+            title='Bench listing', description='', location='Paris', price_per_night=100, owner=user
+        )
+        today = timezone.now().date()
+        Booking.objects.bulk_create(
+            Booking(
+                listing=listing, user=user, guests=1,
+                check_in=today + timezone.timedelta(days=3 * i),
+                check_out=today + timezone.timedelta(days=3 * i + 2),
+            )
+            for i in range(5)
+        )
+        return user
+
+    def _measure(self, label, client, requests):
+        # Warm up once so both modes start from the same caches.
+        client.get('/api/bookings/', HTTP_ACCEPT='application/json')
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(requests):
+                response = client.get('/api/bookings/', HTTP_ACCEPT='application/json')
+            elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.status_code
+        self.stdout.write(
+            f"{label:14} {elapsed / requests * 1000:7.3f} ms/request  "
+            f"{len(queries) / requests:4.1f} queries/request"
+        )
@@ -0,0 +1,75 @@
+import gzip
+import time
+from django.core.management.base import BaseCommand
+from django.test import Client
+from listings.fast_serializers import ValuesSerializer
+from listings.middleware import brotli, APICompressionMiddleware
+from listings.models import Listing, Booking, Review, Payment
+from listings.renderers import msgpack, ORJSONRenderer, MessagePackRenderer
+from listings.serializers import ListingSerializer, BookingSerializer, ReviewSerializer, PaymentSerializer
+
+DATASETS = [
+    ('listings', ListingSerializer, Listing),
+    ('bookings', BookingSerializer, Booking),
+    ('payments', PaymentSerializer, Payment),
+    ('reviews', ReviewSerializer, Review),
+]
+
+
+class Command(BaseCommand):
+    help = "Measure bytes on the wire and encode time per response format for the listings API."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Best-of-N timing runs per format.")
+        parser.add_argument('--host', default='localhost', help="HTTP Host header for the negotiation check.")
+
+    def handle(self, *args, **options):
+        formats = self._formats()
+        for name, serializer_class, model in DATASETS:
+            data = ValuesSerializer.for_serializer(serializer_class).serialize(model.objects.all())
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({len(data)} rows)"))
+            baseline = None
+            for label, encode in formats:
+                best, body = None, None
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    body = encode(data)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                baseline = baseline or len(body) or 1
+                self.stdout.write(
+                    f"  {label:14} {len(body):10d} bytes ({len(body) / baseline:7.1%})  {best * 1000:8.3f} ms"
+                )
+        self._check_negotiation(options['host'])
+
+    def _formats(self):
+        json_renderer = ORJSONRenderer()
+        level = APICompressionMiddleware.brotli_quality
+        formats = [
+            ('json', json_renderer.render),
+            ('json+gzip', lambda data: gzip.compress(json_renderer.render(data))),
+        ]
+        if brotli is not None:
+            formats.append(('json+br', lambda data: brotli.compress(json_renderer.render(data), quality=level)))
+        if msgpack is not None:
+            msgpack_renderer = MessagePackRenderer()
+            formats.append(('msgpack', msgpack_renderer.render))
+            formats.append(('msgpack+gzip', lambda data: gzip.compress(msgpack_renderer.render(data))))
+            if brotli is not None:
+                formats.append((
+                    'msgpack+br', lambda data: brotli.compress(msgpack_renderer.render(data), quality=level)
+                ))
+        return formats
+
+    def _check_negotiation(self, host):
+        """Show what the listings endpoint actually returns for each Accept/Accept-Encoding pair."""
+        client = Client(HTTP_HOST=host)
+        self.stdout.write(self.style.MIGRATE_HEADING("Negotiation on /api/listings/"))
+        for accept in ('application/json', 'application/msgpack'):
+            for encoding in ('identity', 'gzip', 'br'):
+                response = client.get('/api/listings/', HTTP_ACCEPT=accept, HTTP_ACCEPT_ENCODING=encoding)
+                self.stdout.write(
+                    f"  Accept: {accept:20} Accept-Encoding: {encoding:8} -> HTTP {response.status_code} "
+                    f"{response.get('Content-Type', '')}, {response.get('Content-Encoding', 'identity')}, "
+                    f"{len(response.content)} bytes"
+                )
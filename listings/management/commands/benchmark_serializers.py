@@ -0,0 +1,83 @@
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from listings.fast_serializers import ValuesSerializer
+from listings.models import Listing, Booking
+from listings.renderers import ORJSONRenderer
+from listings.serializers import ListingSerializer, BookingSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Compare rows/second of the ModelSerializer and ValuesSerializer list paths."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help="Number of temporary rows to create per model.")
+        parser.add_argument('--repeat', type=int, default=3, help="Best-of-N timing runs.")
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with transaction.atomic():
+            listing_qs, booking_qs = self._create_rows(rows)
+            for label, serializer_class, queryset in (
+                ('Listing', ListingSerializer, listing_qs),
+                ('Booking', BookingSerializer, booking_qs),
+            ):
+                self._compare(label, serializer_class, queryset, repeat)
+            # Leave the database untouched.
+            transaction.set_rollback(True)
+
+    def _create_rows(self, rows):
+        owner = User.objects.create_user(username=f'bench_{time.time_ns()}')
+        listings = Listing.objects.bulk_create(
+            Listing(
+                title=f'Bench listing {i}',
+                description='Benchmark row ' * 10,
+                location='Paris',
+                price_per_night=Decimal('120.50') + i,
+                owner=owner,
+            )
+            for i in range(rows)
+        )
+        today = timezone.now().date()
+        Booking.objects.bulk_create(
+            Booking(
+                listing=listing,
+                user=owner,
+                check_in=today,
+                check_out=today + timezone.timedelta(days=3),
+                guests=2,
+            )
+            for listing in listings
+        )
+        return Listing.objects.filter(owner=owner), Booking.objects.filter(user=owner)
+
+    def _best_of(self, repeat, func):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def _compare(self, label, serializer_class, queryset, repeat):
+        count = queryset.count()
+        fast = ValuesSerializer.for_serializer(serializer_class)
+
+        slow_time, slow_bytes = self._best_of(
+            repeat, lambda: JSONRenderer().render(serializer_class(queryset.all(), many=True).data)
+        )
+        fast_time, fast_bytes = self._best_of(
+            repeat, lambda: ORJSONRenderer().render(fast.serialize(queryset.all()))
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{label} ({count} rows)"))
+        self.stdout.write(f"  ModelSerializer + JSONRenderer:    {count / slow_time:12.0f} rows/s")
+        self.stdout.write(f"  ValuesSerializer + ORJSONRenderer: {count / fast_time:12.0f} rows/s")
+        self.stdout.write(f"  Speed-up: {slow_time / fast_time:.1f}x, identical output: {slow_bytes == fast_bytes}")
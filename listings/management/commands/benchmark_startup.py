@@ -0,0 +1,59 @@
+import json
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so imports and caches start cold.
+CHILD_SCRIPT = """
+import json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+loaded = time.perf_counter()
+warm_up = 0.0
+if sys.argv[1] == 'warm':
+    from alx_travel_app.warmup import warm_up as run_warm_up
+    run_warm_up()
+    warm_up = time.perf_counter() - loaded
+from django.test import Client
+client = Client(HTTP_HOST=sys.argv[2])
+latencies = []
+for path in sys.argv[3:]:
+    request_start = time.perf_counter()
+    client.get(path)
+    latencies.append(time.perf_counter() - request_start)
+print(json.dumps({'load': loaded - start, 'warm_up': warm_up, 'latencies': latencies}))
+"""
+
+PATHS = ['/api/listings/', '/api/listings/', '/swagger/?format=openapi']
+
+
+class Command(BaseCommand):
+    help = "Compare first-request latency of a cold process against one warmed up like a preloaded gunicorn master."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help="Number of fresh processes per mode.")
+        parser.add_argument('--host', default=(settings.ALLOWED_HOSTS or ['localhost'])[0])
+
+    def run_child(self, mode, host):
+        result = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT, mode, host, *PATHS],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Startup child failed:\n{result.stderr}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        for mode in ('cold', 'warm'):
+            runs = [self.run_child(mode, options['host']) for _ in range(options['runs'])]
+            best = min(runs, key=lambda run: run['load'] + run['warm_up'] + sum(run['latencies']))
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{mode} (best of {len(runs)})"))
+            self.stdout.write(f"  app load:           {best['load'] * 1000:8.1f} ms")
+            self.stdout.write(f"  warm-up (pre-fork): {best['warm_up'] * 1000:8.1f} ms")
+            for index, (path, latency) in enumerate(zip(PATHS, best['latencies'])):
+                self.stdout.write(f"  request {index + 1} {path:26} {latency * 1000:8.1f} ms")
@@ -0,0 +1,22 @@
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from alx_travel_app.docs import generate_schema_json
+
+
+class Command(BaseCommand):
+    help = "Prebuild the OpenAPI document served at /openapi.json (run at deploy time)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.OPENAPI_SCHEMA_FILE, help="Where to write the JSON document.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        content = generate_schema_json()
+        output = Path(options['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_bytes(content)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {output} ({len(content)} bytes) in {(time.perf_counter() - start) * 1000:.0f} ms"
+        ))
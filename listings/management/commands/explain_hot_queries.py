@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework.request import Request
+from listings.models import Listing, Booking, Payment
+from listings.views import ListingViewSet, BookingViewSet, ReviewViewSet, PaymentViewSet
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Print EXPLAIN plans for the queries issued by the listings ViewSets."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username to run the per-user queries as (defaults to the first non-staff user).")
+        parser.add_argument('--location', default='Paris', help="Location used for the listing filter query.")
+        parser.add_argument('--analyze', action='store_true', help="Execute the queries (EXPLAIN ANALYZE) where the backend supports it.")
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options['analyze'] = True
+
+        for label, queryset in self._hot_queries(user, options['location']):
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User '{username}' does not exist")
+        user = User.objects.filter(is_staff=False).first()
+        if user is None:
+            raise CommandError("No users found; run `manage.py seed` first or pass --user")
+        return user
+
+    def _viewset_queryset(self, viewset_class, user):
+        """Return the queryset a ViewSet would use for a list request by `user`."""
+        # Views read DRF's request API (query_params), so wrap it as DRF would.
+        request = Request(RequestFactory().get('/'))
+        request.user = user
+        viewset = viewset_class(request=request, format_kwarg=None, action='list')
+        return viewset.get_queryset()
+
+    def _hot_queries(self, user, location):
+        bookings = self._viewset_queryset(BookingViewSet, user)
+        payments = self._viewset_queryset(PaymentViewSet, user)
+        reviews = self._viewset_queryset(ReviewViewSet, user)
+        listings = self._viewset_queryset(ListingViewSet, user)
+        listing = Listing.objects.first()
+
+        yield "ListingViewSet.list", listings
+        yield "ListingViewSet.list (location + price filter)", listings.filter(
+            location=location, price_per_night__lte=200
+        ).order_by('price_per_night')
+        yield "BookingViewSet.list", bookings
+        yield "BookingViewSet.list (ordered by date)", bookings.order_by('-created_at')
+        yield "PaymentViewSet.list", payments
+        yield "PaymentViewSet pending payments", Payment.objects.filter(status='pending').order_by('created_at')
+        yield "ReviewViewSet.list", reviews
+        if listing is not None:
+            yield "ListingViewSet.bookings", listing.bookings.all()
+            yield "ListingViewSet.reviews", listing.reviews.order_by('-created_at')
+            check_in = timezone.now().date()
+            yield "Booking overlap check", Booking.objects.filter(
+                listing=listing,
+                check_in__lt=check_in + timedelta(days=7),
+                check_out__gt=check_in,
+            )
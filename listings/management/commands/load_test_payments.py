@@ -0,0 +1,235 @@
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+STEPS = ('create_booking', 'initiate_payment', 'verify_payment')
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the booking -> payment -> verification path in-process: a throwaway test "
+        "database, a local fake Chapa server with injected latency and failures, Celery in eager "
+        "or in-memory broker mode and the locmem email backend. Reports throughput and per-step latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flows', type=int, default=200, help="Booking flows to run.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Flows running at once.")
+        parser.add_argument('--listings', type=int, default=20, help="Listings the flows book.")
+        parser.add_argument(
+            '--celery', choices=['eager', 'memory'], default='eager',
+            help="Run tasks inline (eager) or on an in-process worker fed by the memory broker.",
+        )
+        parser.add_argument('--latency-ms', type=float, default=50, help="Fake gateway latency per request.")
+        parser.add_argument('--jitter-ms', type=float, default=10, help="Random +/- spread on the latency.")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of gateway requests that return 500.")
+        parser.add_argument('--decline-rate', type=float, default=0.1, help="Fraction of payments the gateway declines.")
+        parser.add_argument('--seed', type=int, default=None, help="Seed for failure injection.")
+
+    def handle(self, *args, **options):
+        from listings.fake_chapa import FakeChapaServer
+
+        setup_test_environment()
+        old_name = self.create_database()
+        gateway = FakeChapaServer(
+            latency=options['latency_ms'] / 1000,
+            jitter=options['jitter_ms'] / 1000,
+            error_rate=options['error_rate'],
+            decline_rate=options['decline_rate'],
+            seed=options['seed'],
+        )
+        try:
+            with gateway, override_settings(
+                CHAPA_BASE_URL=gateway.base_url,
+                CHAPA_SECRET_KEY='CHASECK_TEST-load-test',
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            ), self.celery(options['celery']) as tasks_done:
+                clients = self.create_fixtures(options)
+                connections.close_all()
+                # Injected gateway failures would otherwise log every 4xx response.
+                logging.getLogger('django.request').setLevel(logging.ERROR)
+                start = time.perf_counter()
+                report = self.run_flows(clients, options)
+                elapsed = time.perf_counter() - start
+                drained = tasks_done()
+                self.report(report, elapsed, drained, gateway, options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def create_database(self):
+        if connection.vendor == 'sqlite':
+            # A file rather than shared memory so concurrent writers wait on
+            # the busy timeout instead of failing with "table is locked".
+            path = os.path.join(tempfile.gettempdir(), f'load_test_payments_{os.getpid()}.sqlite3')
+            connection.settings_dict['TEST']['NAME'] = path
+            connection.settings_dict.setdefault('OPTIONS', {}).setdefault('transaction_mode', 'IMMEDIATE')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        return old_name
+
+    @contextmanager
+    def celery(self, mode):
+        """
+        Configure Celery for the run. Yields a callable that waits for every
+        published task to finish and returns how many ran.
+        """
+        from celery import signals
+        from celery.contrib.testing.worker import start_worker
+        from alx_travel_app.celery import app
+
+        counts = Counter()
+        lock = threading.Lock()
+
+        def counter(key):
+            def receiver(**kwargs):
+                with lock:
+                    counts[key] += 1
+            return receiver
+
+        signals.after_task_publish.connect(counter('published'), weak=False)
+        signals.task_postrun.connect(counter('finished'), weak=False)
+
+        if mode == 'eager':
+            app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+            yield lambda: counts['finished']
+            return
+
+        def drain(timeout=60):
+            deadline = time.monotonic() + timeout
+            while counts['finished'] < counts['published'] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            if counts['finished'] < counts['published']:
+                raise CommandError(f"Only {counts['finished']}/{counts['published']} tasks finished")
+            return counts['finished']
+
+        # The broker URL environment variable takes precedence over settings.
+        os.environ['CELERY_BROKER_URL'] = 'memory://'
+        # With a prefetch window of one the memory transport only settles late
+        # acks between ~1s drain cycles (see soak_celery_tasks), which would
+        # make the worker, not the payment path, the bottleneck.
+        app.conf.update(
+            CELERY_BROKER_URL='memory://',
+            CELERY_BROKER_TRANSPORT_OPTIONS={'polling_interval': 0.01},
+            CELERY_WORKER_PREFETCH_MULTIPLIER=16,
+        )
+        with start_worker(app, pool='threads', concurrency=4, perform_ping_check=False, loglevel='ERROR'):
+            yield drain
+
+    def create_fixtures(self, options):
+        from django.contrib.auth import get_user_model
+        from django.test import Client
+        from listings.models import Listing
+
+        User = get_user_model()
+        host = User.objects.create_user(username='load_host', email='host@example.com')
+        listings = Listing.objects.bulk_create(
+            Listing(
+                title=f'Load test listing {index}', description='', location='Addis Ababa',
+                price_per_night=50 + index, owner=host,
+            )
+            for index in range(options['listings'])
+        )
+        guests = User.objects.bulk_create(
+            User(username=f'load_guest_{index}', email=f'guest{index}@example.com')
+            for index in range(options['flows'])
+        )
+        clients = []
+        for guest in guests:
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(guest)
+            clients.append(client)
+        # Each listing gets consecutive non-overlapping two-night stays.
+        self.listing_ids = [listing.id for listing in listings]
+        return clients
+
+    def run_flows(self, clients, options):
+        timings = defaultdict(list)
+        outcomes = Counter()
+        lock = threading.Lock()
+        concurrency = max(1, options['concurrency'])
+
+        def run_share(offset):
+            try:
+                for index in range(offset, len(clients), concurrency):
+                    flow_timings, outcome = self.run_flow(index, clients[index])
+                    with lock:
+                        outcomes[outcome] += 1
+                        for step, seconds in flow_timings.items():
+                            timings[step].append(seconds)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(run_share, offset) for offset in range(concurrency)]:
+                future.result()
+        return {'timings': timings, 'outcomes': outcomes}
+
+    def run_flow(self, index, client):
+        from django.utils import timezone
+
+        timings = {}
+        listing_id = self.listing_ids[index % len(self.listing_ids)]
+        check_in = timezone.now().date() + timezone.timedelta(days=30 + 3 * (index // len(self.listing_ids)))
+
+        def step(name, path, data):
+            start = time.perf_counter()
+            response = client.post(path, data, content_type='application/json')
+            timings[name] = time.perf_counter() - start
+            return response
+
+        response = step('create_booking', '/api/bookings/', {
+            'listing': listing_id,
+            'check_in': check_in.isoformat(),
+            'check_out': (check_in + timezone.timedelta(days=2)).isoformat(),
+            'guests': 1,
+        })
+        if response.status_code != 201:
+            return timings, f'create_booking_{response.status_code}'
+
+        response = step('initiate_payment', f"/api/bookings/{response.json()['id']}/initiate_payment/", {})
+        if response.status_code != 201:
+            return timings, f'initiate_payment_{response.status_code}'
+
+        tx_ref = response.json()['transaction_reference']
+        response = step('verify_payment', '/api/payments/verify_payment/', {'tx_ref': tx_ref})
+        if response.status_code != 200:
+            return timings, f'verify_payment_{response.status_code}'
+        return timings, f"payment_{response.json()['payment_status']}"
+
+    def report(self, report, elapsed, tasks, gateway, options):
+        from django.core import mail
+
+        flows = sum(report['outcomes'].values())
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{flows} flows, concurrency {options['concurrency']}, Celery {options['celery']}, "
+            f"{connection.vendor} database"
+        ))
+        self.stdout.write(f"  wall time: {elapsed:.2f}s  throughput: {flows / elapsed:.1f} flows/s")
+        self.stdout.write("  latency (ms)          n      p50      p95      p99      max")
+        for name in STEPS:
+            samples = [seconds * 1000 for seconds in report['timings'].get(name, [])]
+            if not samples:
+                continue
+            self.stdout.write(
+                f"  {name:18} {len(samples):5d} {statistics.median(samples):8.1f} "
+                f"{percentile(samples, 0.95):8.1f} {percentile(samples, 0.99):8.1f} {max(samples):8.1f}"
+            )
+        self.stdout.write("  outcomes: " + ', '.join(f"{key}={value}" for key, value in sorted(report['outcomes'].items())))
+        self.stdout.write("  gateway requests: " + ', '.join(f"{key}={value}" for key, value in sorted(gateway.counts.items())))
+        self.stdout.write(f"  tasks run: {tasks}  emails sent: {len(getattr(mail, 'outbox', []))}")
@@ -0,0 +1,118 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from kombu.transport import memory
+
+MODES = {
+    # The previous setup: every task result is published to the rpc:// backend.
+    'rpc-results': {'result_backend': 'rpc://', 'ignore_result': False},
+    # Current setup: notification tasks store nothing.
+    'fire-and-forget': {'result_backend': '', 'ignore_result': True},
+}
+
+
+class CountingChannel(memory.Channel):
+    """Memory channel that counts every message put on a queue."""
+
+    counts = {}
+    lock = threading.Lock()
+
+    def _put(self, queue, message, **kwargs):
+        size = len(json.dumps(message))
+        kind = 'task' if queue == 'celery' else 'result'
+        with self.lock:
+            messages, total = self.counts.get(kind, (0, 0))
+            self.counts[kind] = (messages + 1, total + size)
+        super()._put(queue, message, **kwargs)
+
+
+class CountingTransport(memory.Transport):
+    Channel = CountingChannel
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure broker messages and bytes for the notification tasks with the old rpc:// result "
+        "backend versus fire-and-forget (ignore_result) mode, using the in-memory broker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=300, help="Tasks to send per mode.")
+        parser.add_argument('--child', choices=sorted(MODES), help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['child']:
+            self.stdout.write(json.dumps(self.measure(MODES[options['child']], options['tasks'])))
+            return
+
+        results = {mode: self.run_child(mode, options['tasks']) for mode in MODES}
+        for mode, counts in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(mode))
+            for kind in ('task', 'result'):
+                messages, size = counts.get(kind, (0, 0))
+                self.stdout.write(f"  {kind:7} messages: {messages:6d}  bytes: {size:9d}")
+        before = sum(size for _, size in results['rpc-results'].values())
+        after = sum(size for _, size in results['fire-and-forget'].values())
+        before_messages = sum(messages for messages, _ in results['rpc-results'].values())
+        after_messages = sum(messages for messages, _ in results['fire-and-forget'].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Broker traffic saved: {before_messages - after_messages} messages "
+            f"({1 - after_messages / before_messages:.0%}), {before - after} bytes ({1 - after / before:.0%})"
+        ))
+
+    def run_child(self, mode, tasks):
+        env = dict(
+            os.environ,
+            CELERY_BROKER_URL='memory://',
+            CELERY_RESULT_BACKEND=MODES[mode]['result_backend'],
+        )
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'measure_task_traffic', '--child', mode, '--tasks', str(tasks)],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Measurement '{mode}' failed:\n{result.stderr[-4000:]}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def measure(self, mode, tasks):
+        from celery import signals
+        from celery.contrib.testing.worker import start_worker
+        from django.test.utils import override_settings
+        from alx_travel_app.celery import app
+        from listings import tasks as notification_tasks
+
+        override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend').enable()
+        app.conf.update(
+            CELERY_BROKER_TRANSPORT=CountingTransport,
+            CELERY_BROKER_TRANSPORT_OPTIONS={'polling_interval': 0.01},
+        )
+        calls = [
+            notification_tasks.send_booking_confirmation_email,
+            notification_tasks.send_payment_confirmation_email,
+            notification_tasks.send_payment_failure_email,
+        ]
+        for task in calls:
+            task.ignore_result = mode['ignore_result']
+
+        completed = [0]
+        signals.task_postrun.connect(lambda **kwargs: completed.__setitem__(0, completed[0] + 1), weak=False)
+
+        with start_worker(app, pool='solo', perform_ping_check=False, loglevel='ERROR'):
+            # Ids that don't exist: the tasks run, log and finish without sending mail.
+            for index in range(tasks):
+                calls[index % len(calls)].delay(-index - 1)
+            deadline = time.monotonic() + 120
+            while completed[0] < tasks and time.monotonic() < deadline:
+                time.sleep(0.01)
+            if completed[0] < tasks:
+                raise CommandError(f"Only {completed[0]}/{tasks} tasks completed")
+        return CountingChannel.counts
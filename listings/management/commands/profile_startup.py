@@ -0,0 +1,126 @@
+import json
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Each child runs in a fresh interpreter under `-X importtime` and prints one
+# JSON line with its own timings; the import log goes to stderr.
+CHILD_PRELUDE = """
+import json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
+
+def rss_kb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+"""
+
+WEB_CHILD = CHILD_PRELUDE + """
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+booted = time.perf_counter()
+booted_rss = rss_kb()
+from django.test import Client
+response = Client(HTTP_HOST=sys.argv[1]).get('/api/listings/')
+first = time.perf_counter()
+print(json.dumps({'boot': booted - start, 'first_request': first - booted, 'status': response.status_code, 'rss_kb': booted_rss}))
+"""
+
+WORKER_CHILD = CHILD_PRELUDE + """
+from alx_travel_app.celery import app
+app.loader.import_default_modules()
+app.finalize()
+booted = time.perf_counter()
+booted_rss = rss_kb()
+# Executes in-process: no broker needed, and a missing booking is handled by the task.
+app.tasks['listings.tasks.send_booking_confirmation_email'].apply(args=[0])
+first = time.perf_counter()
+print(json.dumps({'boot': booted - start, 'first_request': first - booted, 'status': 'ok', 'rss_kb': booted_rss}))
+"""
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def parse_importtime(stderr):
+    """
+    Aggregate `-X importtime` output by top-level package.
+
+    Returns {package: cumulative_us} using the cumulative time of each
+    package's outermost import, so nested imports aren't double counted.
+    """
+    totals = defaultdict(int)
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, module = match.groups()
+        # Top-level entries are indented by exactly one space.
+        if len(indent) == 1:
+            totals[module.split('.')[0]] += int(cumulative)
+    return dict(totals)
+
+
+def top_packages(imports_us, count):
+    """The `count` slowest packages from parse_importtime(), slowest first."""
+    return sorted(imports_us.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+class Command(BaseCommand):
+    help = "Profile web and Celery worker startup: import times, boot and first-request time, RSS."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help="Number of top-level packages to show.")
+        parser.add_argument('--baseline', default=str(Path(settings.BASE_DIR) / 'startup_baseline.json'))
+        parser.add_argument('--save-baseline', action='store_true', help="Overwrite the baseline with this run.")
+        parser.add_argument('--host', default=(settings.ALLOWED_HOSTS or ['localhost'])[0])
+
+    def run_child(self, script, *args):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script, *args],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Startup child failed:\n{result.stderr[-4000:]}")
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        report['imports_us'] = parse_importtime(result.stderr)
+        return report
+
+    def handle(self, *args, **options):
+        profile = {
+            'web': self.run_child(WEB_CHILD, options['host']),
+            'worker': self.run_child(WORKER_CHILD),
+        }
+        baseline_path = Path(options['baseline'])
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+
+        for role, report in profile.items():
+            previous = baseline.get(role, {})
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{role} process"))
+            self._line("boot", report['boot'] * 1000, previous.get('boot', 0) * 1000, 'ms')
+            self._line("first request/task", report['first_request'] * 1000, previous.get('first_request', 0) * 1000, 'ms')
+            self._line("RSS after boot", report['rss_kb'] / 1024, previous.get('rss_kb', 0) / 1024, 'MiB')
+            self.stdout.write(f"  top {options['top']} packages by import time:")
+            previous_imports = previous.get('imports_us', {})
+            for package, micros in top_packages(report['imports_us'], options['top']):
+                self._line(f"  {package}", micros / 1000, previous_imports.get(package, 0) / 1000, 'ms')
+
+        if options['save_baseline']:
+            baseline_path.write_text(json.dumps(profile, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {baseline_path}"))
+
+    def _line(self, label, value, previous, unit):
+        delta = f"  ({value - previous:+.1f} {unit} vs baseline)" if previous else ''
+        self.stdout.write(f"  {label:28} {value:9.1f} {unit}{delta}")
@@ -0,0 +1,41 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every listing's similar listings now, as the nightly Celery job does. "
+        "With --synthetic N, only time the neighbour search over N random listings, without "
+        "touching the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=None, help="Neighbours per listing.")
+        parser.add_argument('--block-size', type=int, default=None, help="Listings per block.")
+        parser.add_argument('--synthetic', type=int, default=None, metavar='N',
+                            help="Benchmark the neighbour search over N random feature vectors.")
+
+    def handle(self, *args, **options):
+        from listings import recommendations
+
+        start = time.perf_counter()
+        if options['synthetic']:
+            import numpy as np
+            dims = (
+                recommendations.LOCATION_BUCKETS + recommendations.PRICE_BANDS
+                + recommendations.RATING_BANDS + recommendations.CO_BOOKING_DIMS
+            )
+            features = recommendations._unit_rows(
+                np.random.default_rng(0).random((options['synthetic'], dims), dtype=np.float32)
+            )
+            k = options['count'] or settings.SIMILAR_LISTINGS_COUNT
+            block_size = options['block_size'] or settings.SIMILAR_LISTINGS_BLOCK_SIZE
+            for _ in recommendations.nearest_neighbours(features, k, block_size):
+                pass
+            count = len(features)
+        else:
+            count = recommendations.rebuild(options['count'], options['block_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Computed similar listings for {count} listings in {time.perf_counter() - start:.1f}s"
+        ))
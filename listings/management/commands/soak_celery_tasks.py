@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+CELERY_DEFAULTS = {
+    'worker_max_tasks_per_child': None,
+    'worker_max_memory_per_child': None,
+    'worker_prefetch_multiplier': 4,
+    'task_acks_late': False,
+}
+
+CONFIGURATIONS = {
+    'celery-defaults': CELERY_DEFAULTS,
+    'settings': {
+        'worker_max_tasks_per_child': settings.CELERY_WORKER_MAX_TASKS_PER_CHILD,
+        'worker_max_memory_per_child': settings.CELERY_WORKER_MAX_MEMORY_PER_CHILD,
+        'worker_prefetch_multiplier': settings.CELERY_WORKER_PREFETCH_MULTIPLIER,
+        'task_acks_late': settings.CELERY_TASK_ACKS_LATE,
+    },
+    'recycle-50': dict(CELERY_DEFAULTS, worker_max_tasks_per_child=50, worker_prefetch_multiplier=1),
+    'prefetch-16': dict(CELERY_DEFAULTS, worker_prefetch_multiplier=16),
+}
+
+
+def quick_memory_transport():
+    """
+    The memory transport, but returning to the worker's consumer loop after
+    every empty poll. Celery's synchronous loop (used for the memory
+    transport) performs late acks between ``drain_events(timeout=2.0)``
+    calls, so with a full prefetch window it would otherwise wait ~2s for
+    each ack however short the polling interval.
+    """
+    from kombu.transport import memory
+
+    class QuickMemoryTransport(memory.Transport):
+        def drain_events(self, connection, timeout=None):
+            if timeout is not None:
+                timeout = min(timeout, self.polling_interval)
+            return super().drain_events(connection, timeout=timeout)
+
+    return QuickMemoryTransport
+
+
+def rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Soak-test the send_*_email tasks on a prefork worker fed by the in-memory broker, "
+        "reporting throughput and RSS growth for each worker configuration. Each configuration "
+        "runs in a fresh process; emails go to the locmem backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=600, help="Tasks to enqueue per configuration.")
+        parser.add_argument('--concurrency', type=int, default=2, help="Prefork pool size.")
+        parser.add_argument('--timeout', type=float, default=120, help="Give up on a configuration after N seconds.")
+        parser.add_argument(
+            '--config', action='append', choices=sorted(CONFIGURATIONS),
+            help="Configuration to run; repeat for several (default: all).",
+        )
+        # Internal: run one configuration in this (fresh) process.
+        parser.add_argument('--child', choices=sorted(CONFIGURATIONS), help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['child']:
+            result = self.soak(CONFIGURATIONS[options['child']], options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        for name in options['config'] or CONFIGURATIONS:
+            result = self.run_child(name, options)
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f"  config: {CONFIGURATIONS[name]}")
+            self.stdout.write(
+                f"  {result['completed']}/{options['tasks']} tasks in {result['elapsed']:.2f}s "
+                f"({result['completed'] / result['elapsed']:.0f} tasks/s)"
+            )
+            self.stdout.write(
+                f"  pool RSS: {result['pool_rss_start_kb'] / 1024:.1f} MiB at start, "
+                f"{result['pool_rss_peak_kb'] / 1024:.1f} MiB peak, {result['pool_rss_end_kb'] / 1024:.1f} MiB at end "
+                f"(largest child {result['child_rss_peak_kb'] / 1024:.1f} MiB)"
+            )
+            if result['completed'] < options['tasks']:
+                self.stdout.write(self.style.WARNING(f"  timed out after {options['timeout']:.0f}s"))
+            self.stdout.write(
+                f"  main process RSS growth: {(result['main_rss_end_kb'] - result['main_rss_start_kb']) / 1024:+.1f} MiB, "
+                f"pool processes started: {result['children_started']}"
+            )
+
+    def run_child(self, name, options):
+        env = dict(os.environ, CELERY_BROKER_URL='memory://', CELERY_RESULT_BACKEND='cache+memory://')
+        result = subprocess.run(
+            [
+                sys.executable, 'manage.py', 'soak_celery_tasks', '--child', name,
+                '--tasks', str(options['tasks']),
+                '--concurrency', str(options['concurrency']),
+                '--timeout', str(options['timeout']),
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Soak run '{name}' failed:\n{result.stderr[-4000:]}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def soak(self, config, options):
+        import multiprocessing
+        from celery import signals
+        from celery.contrib.testing.worker import start_worker
+        from django.db import connections
+        from django.test.utils import override_settings
+        from alx_travel_app.celery import app
+        from listings import tasks
+
+        if not app.conf.broker_url.startswith('memory://'):
+            raise CommandError("The soak test must run against the in-memory broker")
+
+        override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend').enable()
+        # Settings come from Django under the CELERY_ namespace, which takes
+        # precedence over plain keys, so override them the same way.
+        app.conf.update({f'CELERY_{key.upper()}': value for key, value in config.items()})
+        app.conf.update(
+            CELERY_BROKER_TRANSPORT=quick_memory_transport(),
+            CELERY_BROKER_TRANSPORT_OPTIONS={'polling_interval': 0.01},
+        )
+
+        completed = multiprocessing.Value('i', 0)
+
+        def on_task_done(**kwargs):
+            with completed.get_lock():
+                completed.value += 1
+        signals.task_postrun.connect(on_task_done, weak=False)
+
+        booking, payment, cleanup = self.create_fixtures()
+        # Pool processes must open their own database connections.
+        connections.close_all()
+        calls = [
+            (tasks.send_booking_confirmation_email, booking.id),
+            (tasks.send_payment_confirmation_email, payment.id),
+            (tasks.send_payment_failure_email, payment.id),
+        ]
+
+        samples, seen_pids, stop = [], set(), threading.Event()
+        try:
+            with start_worker(
+                app, pool='prefork', concurrency=options['concurrency'],
+                perform_ping_check=False, loglevel='ERROR',
+            ) as worker:
+                def sample():
+                    while not stop.is_set():
+                        pids = [process.pid for process in worker.pool._pool._pool]
+                        seen_pids.update(pids)
+                        sizes = [rss_kb(pid) for pid in pids]
+                        samples.append((sum(sizes), max(sizes, default=0)))
+                        stop.wait(0.1)
+
+                main_rss_start = rss_kb(os.getpid())
+                sampler = threading.Thread(target=sample, daemon=True)
+                sampler.start()
+                start = time.perf_counter()
+                for index in range(options['tasks']):
+                    task, arg = calls[index % len(calls)]
+                    task.delay(arg)
+                deadline = start + options['timeout']
+                while completed.value < options['tasks'] and time.perf_counter() < deadline:
+                    time.sleep(0.01)
+                elapsed = time.perf_counter() - start
+                stop.set()
+                sampler.join()
+                main_rss_end = rss_kb(os.getpid())
+        finally:
+            cleanup()
+
+        return {
+            'completed': completed.value,
+            'elapsed': elapsed,
+            'main_rss_start_kb': main_rss_start,
+            'main_rss_end_kb': main_rss_end,
+            'pool_rss_start_kb': samples[0][0] if samples else 0,
+            'pool_rss_peak_kb': max((total for total, _ in samples), default=0),
+            'pool_rss_end_kb': samples[-1][0] if samples else 0,
+            'child_rss_peak_kb': max((largest for _, largest in samples), default=0),
+            'children_started': len(seen_pids),
+        }
+
+    def create_fixtures(self):
+        from django.contrib.auth import get_user_model
+        from django.utils import timezone
+        from listings.models import Listing, Booking, Payment
+
+        user = get_user_model().objects.create_user(
+            username=f'soak_{time.time_ns()}', email='soak@example.com', password='soak-test'
+        )
+        listing = Listing.objects.create(
+            title='Soak test listing', description='', location='Paris', price_per_night=100, owner=user
+        )
+        today = timezone.now().date()
+        booking = Booking.objects.create(
+            listing=listing, user=user, check_in=today, check_out=today + timezone.timedelta(days=2), guests=1
+        )
+        payment = Payment.objects.create(booking=booking, amount=200)
+        # Deleting the user cascades to the listing, booking and payment.
+        return booking, payment, user.delete
@@ -0,0 +1,307 @@
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import CommandError
+from django.core.signals import got_request_exception
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from .load_test_payments import Command as LoadTestCommand, percentile
+
+STRATEGIES = ('lock', 'check')
+
+
+class Command(LoadTestCommand):
+    help = (
+        "Stress booking creation under contention: every round, all users try to book overlapping "
+        "stays of the same listing at the same instant, and each winner starts payment twice at "
+        "once. Runs against a throwaway test database of the configured backend (use a PostgreSQL "
+        "DATABASE_URL where available) once per BOOKING_OVERLAP_CONTROL strategy, and reports "
+        "throughput, latency, lock waits, deadlocks and double bookings. --report-file appends "
+        "each run as a JSON line for comparing strategies over time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=16, help="Concurrent users, one thread each.")
+        parser.add_argument('--rounds', type=int, default=20, help="Times every user books at once.")
+        parser.add_argument('--listings', type=int, default=1,
+                            help="Listings the rounds rotate over; 1 is the worst contention.")
+        parser.add_argument('--strategies', default=','.join(STRATEGIES),
+                            help=f"Comma-separated BOOKING_OVERLAP_CONTROL values to compare ({', '.join(STRATEGIES)}).")
+        parser.add_argument('--sqlite-mode', choices=['immediate', 'deferred'], default='immediate',
+                            help="SQLite transaction mode. Deferred transactions fail with 'database is locked' "
+                                 "instead of waiting when two writers race.")
+        parser.add_argument('--latency-ms', type=float, default=20, help="Fake gateway latency per request.")
+        parser.add_argument('--report-file', default=None, help="Append results to this JSON lines file.")
+
+    def handle(self, *args, **options):
+        from listings.fake_chapa import FakeChapaServer
+
+        strategies = [strategy.strip() for strategy in options['strategies'].split(',') if strategy.strip()]
+        unknown = set(strategies) - set(STRATEGIES)
+        if unknown:
+            raise CommandError(f"Unknown strategies: {', '.join(sorted(unknown))}")
+
+        if connection.vendor == 'sqlite':
+            connection.settings_dict.setdefault('OPTIONS', {})['transaction_mode'] = options['sqlite_mode'].upper()
+        setup_test_environment()
+        old_name = self.create_database()
+        errors = Counter()
+        errors_lock = threading.Lock()
+
+        def count_error(sender, request=None, **kwargs):
+            exc = sys.exc_info()[1]
+            with errors_lock:
+                errors[self.classify(exc)] += 1
+
+        got_request_exception.connect(count_error, weak=False)
+        from listings.views import BookingViewSet
+        throttle_classes = BookingViewSet.throttle_classes
+        # Measure contention, not the per-user rate limit on initiate_payment.
+        BookingViewSet.throttle_classes = []
+        try:
+            with FakeChapaServer(latency=options['latency_ms'] / 1000) as gateway, override_settings(
+                CHAPA_BASE_URL=gateway.base_url,
+                CHAPA_SECRET_KEY='CHASECK_TEST-stress',
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            ), self.celery('eager'):
+                # Lost races are expected; don't log every 409 and 500.
+                logging.getLogger('django.request').setLevel(logging.CRITICAL)
+                for strategy in strategies:
+                    errors.clear()
+                    with override_settings(BOOKING_OVERLAP_CONTROL=strategy):
+                        result = self.run_strategy(strategy, options, errors, gateway)
+                    self.print_result(result)
+                    if options['report_file']:
+                        with open(options['report_file'], 'a') as report_file:
+                            report_file.write(json.dumps(result) + '\n')
+        finally:
+            BookingViewSet.throttle_classes = throttle_classes
+            got_request_exception.disconnect(count_error)
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    @staticmethod
+    def classify(exc):
+        message = str(exc).lower()
+        if 'deadlock' in message:
+            return 'deadlock'
+        if 'database is locked' in message or 'lock timeout' in message or 'could not obtain lock' in message:
+            return 'lock_timeout'
+        if 'serializ' in message:
+            return 'serialization_failure'
+        return type(exc).__name__
+
+    def create_users(self, strategy, options):
+        from django.contrib.auth import get_user_model
+        from django.test import Client
+        from listings.models import Listing
+
+        User = get_user_model()
+        host = User.objects.create_user(username=f'stress_host_{strategy}')
+        listings = Listing.objects.bulk_create(
+            Listing(title=f'Stress listing {index}', description='', location='Addis Ababa',
+                    price_per_night=100, owner=host)
+            for index in range(options['listings'])
+        )
+        guests = User.objects.bulk_create(
+            User(username=f'stress_{strategy}_{index}', email=f'stress{index}@example.com')
+            for index in range(options['users'])
+        )
+        clients = []
+        for guest in guests:
+            # Count server errors instead of re-raising them in the worker thread.
+            client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+            client.force_login(guest)
+            clients.append(client)
+        return [listing.pk for listing in listings], clients
+
+    def run_strategy(self, strategy, options, errors, gateway):
+        listing_ids, clients = self.create_users(strategy, options)
+        checkouts_before = gateway.counts['initialize']
+        connections.close_all()
+        users, rounds = options['users'], options['rounds']
+        barrier = threading.Barrier(users)
+        timings = defaultdict(list)
+        statuses = Counter()
+        lock = threading.Lock()
+        first_night = timezone.localdate() + timezone.timedelta(days=30)
+
+        def record(step, seconds, status_code):
+            with lock:
+                timings[step].append(seconds)
+                statuses[f'{step}_{status_code}'] += 1
+
+        def post(client, step, path, data):
+            start = time.perf_counter()
+            response = client.post(path, data, content_type='application/json')
+            record(step, time.perf_counter() - start, response.status_code)
+            return response
+
+        def run_user(index, client):
+            try:
+                # Payment initiation happens from a second thread per user, so a
+                # double-clicked "pay" button races too.
+                with ThreadPoolExecutor(max_workers=2) as clicks:
+                    for round_index in range(rounds):
+                        # Stays of alternate users overlap by one night, so at
+                        # most one booking per round can win.
+                        check_in = first_night + timezone.timedelta(
+                            days=3 * (round_index // len(listing_ids)) + index % 2
+                        )
+                        barrier.wait()
+                        response = post(client, 'create_booking', '/api/bookings/', {
+                            'listing': listing_ids[round_index % len(listing_ids)],
+                            'check_in': check_in.isoformat(),
+                            'check_out': (check_in + timezone.timedelta(days=2)).isoformat(),
+                            'guests': 1,
+                        })
+                        if response.status_code == 201:
+                            path = f"/api/bookings/{response.json()['id']}/initiate_payment/"
+                            for future in [clicks.submit(post, client, 'initiate_payment', path, {}) for _ in range(2)]:
+                                future.result()
+            finally:
+                connections.close_all()
+
+        sampler = self.lock_sampler()
+        deadlocks_before = self.deadlock_count()
+        start = time.perf_counter()
+        with sampler:
+            with ThreadPoolExecutor(max_workers=users) as pool:
+                for future in [pool.submit(run_user, index, client) for index, client in enumerate(clients)]:
+                    future.result()
+        elapsed = time.perf_counter() - start
+        deadlocks = self.deadlock_count()
+        if deadlocks is not None and deadlocks_before is not None:
+            errors['deadlock'] = max(errors['deadlock'], deadlocks - deadlocks_before)
+
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'commit': self.commit(),
+            'database': connection.vendor,
+            'sqlite_mode': options['sqlite_mode'] if connection.vendor == 'sqlite' else None,
+            'strategy': strategy,
+            'users': users,
+            'rounds': rounds,
+            'listings': len(listing_ids),
+            'elapsed_seconds': round(elapsed, 3),
+            'requests_per_second': round(sum(len(samples) for samples in timings.values()) / elapsed, 1),
+            'latency_ms': {
+                step: {
+                    'n': len(samples),
+                    'p50': round(statistics.median(samples) * 1000, 1),
+                    'p95': round(percentile(samples, 0.95) * 1000, 1),
+                    'p99': round(percentile(samples, 0.99) * 1000, 1),
+                    'max': round(max(samples) * 1000, 1),
+                }
+                for step, samples in sorted(timings.items())
+            },
+            'statuses': dict(sorted(statuses.items())),
+            'errors': dict(sorted((key, value) for key, value in errors.items() if value)),
+            'max_lock_waiters': sampler.max_waiters,
+            'double_bookings': self.double_bookings(listing_ids),
+            'duplicate_payments': self.duplicate_payments(listing_ids, gateway.counts['initialize'] - checkouts_before),
+        }
+
+    def lock_sampler(self):
+        """
+        Context manager that polls PostgreSQL for backends waiting on a lock
+        and records the most seen at once. A no-op on other databases, where
+        lock waits show up as latency and lock timeouts instead.
+        """
+        class Sampler:
+            max_waiters = None
+
+            def __enter__(self):
+                self.stop = threading.Event()
+                if connection.vendor == 'postgresql':
+                    self.max_waiters = 0
+                    self.thread = threading.Thread(target=self.poll, daemon=True)
+                    self.thread.start()
+                return self
+
+            def poll(self):
+                try:
+                    while not self.stop.wait(0.005):
+                        with connection.cursor() as cursor:
+                            cursor.execute("SELECT count(*) FROM pg_locks WHERE NOT granted")
+                            self.max_waiters = max(self.max_waiters, cursor.fetchone()[0])
+                finally:
+                    connection.close()
+
+            def __exit__(self, *exc_info):
+                self.stop.set()
+                if connection.vendor == 'postgresql':
+                    self.thread.join()
+
+        return Sampler()
+
+    def deadlock_count(self):
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+            return cursor.fetchone()[0]
+
+    def double_bookings(self, listing_ids):
+        """Pairs of bookings of the same listing, neither cancelled, that share a night."""
+        from django.db.models import Exists, OuterRef
+        from listings.models import Booking
+
+        active = Booking.objects.filter(listing_id__in=listing_ids).exclude(status='cancelled')
+        clash = active.filter(
+            listing_id=OuterRef('listing_id'), pk__gt=OuterRef('pk'),
+            check_in__lt=OuterRef('check_out'), check_out__gt=OuterRef('check_in'),
+        )
+        return active.filter(Exists(clash)).count()
+
+    def duplicate_payments(self, listing_ids, checkouts):
+        """
+        Gateway checkouts started beyond the payments recorded. A second
+        initiation for a booking that got past the claim still reaches the
+        gateway, and only then fails on the one-to-one Payment.booking, so it
+        can't be counted from the payments table.
+        """
+        from listings.models import Payment
+
+        return max(0, checkouts - Payment.objects.filter(booking__listing_id__in=listing_ids).count())
+
+    @staticmethod
+    def commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def print_result(self, result):
+        mode = f" ({result['sqlite_mode']} transactions)" if result['sqlite_mode'] else ''
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"strategy {result['strategy']}: {result['users']} users x {result['rounds']} rounds on "
+            f"{result['listings']} listing(s), {result['database']}{mode}"
+        ))
+        self.stdout.write(
+            f"  wall time: {result['elapsed_seconds']:.2f}s  throughput: {result['requests_per_second']:.1f} requests/s"
+        )
+        self.stdout.write("  latency (ms)          n      p50      p95      p99      max")
+        for step, latency in result['latency_ms'].items():
+            self.stdout.write(
+                f"  {step:18} {latency['n']:5d} {latency['p50']:8.1f} {latency['p95']:8.1f} "
+                f"{latency['p99']:8.1f} {latency['max']:8.1f}"
+            )
+        self.stdout.write("  responses: " + ', '.join(f"{key}={value}" for key, value in result['statuses'].items()))
+        self.stdout.write("  errors: " + (', '.join(f"{key}={value}" for key, value in result['errors'].items()) or 'none'))
+        if result['max_lock_waiters'] is not None:
+            self.stdout.write(f"  most backends waiting on a lock at once: {result['max_lock_waiters']}")
+        style = self.style.ERROR if result['double_bookings'] or result['duplicate_payments'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"  double bookings: {result['double_bookings']}  duplicate payments: {result['duplicate_payments']}"
+        ))
@@ -0,0 +1,60 @@
+import re
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+re_accepts_br = re.compile(r'\bbr\b')
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/msgpack')
+
+
+class APICompressionMiddleware(GZipMiddleware):
+    """
+    Compress API responses at the application layer.
+
+    WhiteNoise only compresses static files, so JSON and MessagePack
+    responses under ``/api/`` are compressed here: with brotli when the
+    client accepts it and the module is installed, otherwise with gzip.
+    Streaming responses (e.g. server-sent events) are left untouched.
+
+    Responses under ``secret_path_prefixes`` (issued tokens) are never
+    compressed. Compressing a secret next to attacker-influenced input leaks
+    it through the compressed length (BREACH). Django's gzip adds random
+    padding as a partial defence, but brotli output can't be padded that
+    way.
+    """
+
+    path_prefix = '/api/'
+    secret_path_prefixes = ('/api/auth/',)
+    brotli_quality = 5
+
+    def process_response(self, request, response):
+        if not request.path.startswith(self.path_prefix) or response.streaming:
+            return response
+        if request.path.startswith(self.secret_path_prefixes):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if content_type not in COMPRESSIBLE_TYPES:
+            return response
+
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is None or not re_accepts_br.search(accept_encoding):
+            return super().process_response(request, response)
+
+        if len(response.content) < 200 or response.has_header('Content-Encoding'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed_content = brotli.compress(response.content, quality=self.brotli_quality)
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
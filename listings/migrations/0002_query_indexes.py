@@ -0,0 +1,73 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def check_existing_rows(apps, schema_editor):
+    """
+    Refuse to add the check constraints over rows that break them, naming
+    the rows to fix, rather than failing halfway with a bare IntegrityError.
+    """
+    Booking = apps.get_model("listings", "Booking")
+    Review = apps.get_model("listings", "Review")
+    problems = []
+    bad_dates = list(Booking.objects.filter(check_out__lte=F("check_in")).values_list("pk", flat=True)[:20])
+    if bad_dates:
+        problems.append(f"bookings that check out before they check in: {bad_dates}")
+    bad_ratings = list(Review.objects.exclude(Q(rating__gte=1, rating__lte=5)).values_list("pk", flat=True)[:20])
+    if bad_ratings:
+        problems.append(f"reviews rated outside 1-5: {bad_ratings}")
+    if problems:
+        raise RuntimeError(
+            "Fix or delete these rows before migrating (at most 20 ids each): " + "; ".join(problems)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_existing_rows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(fields=["user", "-created_at"], name="booking_user_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(fields=["listing", "check_in", "check_out"], name="booking_listing_dates_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(fields=["location", "price_per_night"], name="listing_loc_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(fields=["owner", "-created_at"], name="listing_owner_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(condition=models.Q(("status", "pending")), fields=["created_at"], name="payment_pending_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(fields=["status", "-updated_at"], name="payment_status_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(fields=["listing", "-created_at"], name="review_listing_created_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="booking",
+            constraint=models.CheckConstraint(condition=models.Q(("check_out__gt", models.F("check_in"))), name="booking_check_out_after_check_in"),
+        ),
+        migrations.AddConstraint(
+            model_name="review",
+            constraint=models.CheckConstraint(condition=models.Q(("rating__gte", 1), ("rating__lte", 5)), name="review_rating_range"),
+        ),
+    ]
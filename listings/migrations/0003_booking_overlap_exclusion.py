@@ -0,0 +1,76 @@
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+
+# Postgres-only: reject two bookings of the same listing whose
+# [check_in, check_out) ranges overlap. Other backends rely on the
+# application-level checks and the (listing, check_in, check_out) index.
+CREATE_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    """
+    ALTER TABLE listings_booking
+    ADD CONSTRAINT booking_no_overlap
+    EXCLUDE USING gist (
+        listing_id WITH =,
+        daterange(check_in, check_out, '[)') WITH &&
+    )
+    """,
+]
+
+DROP_SQL = [
+    "ALTER TABLE listings_booking DROP CONSTRAINT IF EXISTS booking_no_overlap",
+]
+
+
+def overlapping_bookings(Booking, limit=20):
+    """(booking id, overlapping booking id, listing id) for up to `limit` overlapping pairs."""
+    def overlapping(booking):
+        return Booking.objects.filter(
+            listing_id=booking.listing_id, pk__gt=booking.pk,
+            check_in__lt=booking.check_out, check_out__gt=booking.check_in,
+        )
+
+    later = Booking.objects.filter(
+        listing_id=OuterRef("listing_id"), pk__gt=OuterRef("pk"),
+        check_in__lt=OuterRef("check_out"), check_out__gt=OuterRef("check_in"),
+    )
+    pairs = []
+    for booking in Booking.objects.filter(Exists(later)).order_by("pk")[:limit]:
+        pairs.append((booking.pk, overlapping(booking).order_by("pk").first().pk, booking.listing_id))
+    return pairs
+
+
+def check_no_overlaps(apps, schema_editor):
+    """
+    The constraint can't be added NOT VALID, so existing double bookings
+    would abort the migration with a bare IntegrityError. Name them instead.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    pairs = overlapping_bookings(apps.get_model("listings", "Booking"))
+    if pairs:
+        listed = ", ".join(f"{first} and {second} (listing {listing})" for first, second, listing in pairs)
+        raise RuntimeError(
+            f"Bookings overlap, so booking_no_overlap can't be added. Move or delete one booking "
+            f"of each pair, then migrate again: {listed}"
+        )
+
+
+def _run_on_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0002_query_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_overlaps, migrations.RunPython.noop),
+        migrations.RunPython(_run_on_postgres(CREATE_SQL), _run_on_postgres(DROP_SQL)),
+    ]
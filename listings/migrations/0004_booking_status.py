@@ -0,0 +1,80 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:59
+
+from django.db import migrations, models
+
+# Cancelled bookings must no longer block their dates, so the Postgres
+# overlap exclusion constraint only applies to active bookings from now on.
+CREATE_SQL = [
+    "ALTER TABLE listings_booking DROP CONSTRAINT IF EXISTS booking_no_overlap",
+    """
+    ALTER TABLE listings_booking
+    ADD CONSTRAINT booking_no_overlap
+    EXCLUDE USING gist (
+        listing_id WITH =,
+        daterange(check_in, check_out, '[)') WITH &&
+    ) WHERE (status <> 'cancelled')
+    """,
+]
+
+DROP_SQL = [
+    "ALTER TABLE listings_booking DROP CONSTRAINT IF EXISTS booking_no_overlap",
+    """
+    ALTER TABLE listings_booking
+    ADD CONSTRAINT booking_no_overlap
+    EXCLUDE USING gist (
+        listing_id WITH =,
+        daterange(check_in, check_out, '[)') WITH &&
+    )
+    """,
+]
+
+
+def _run_on_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+# Existing bookings take their status from their payment; those without one
+# stay 'pending'.
+BOOKING_STATUS_BY_PAYMENT_STATUS = {
+    "completed": "confirmed",
+    "pending": "pending_payment",
+    "failed": "cancelled",
+    "cancelled": "cancelled",
+}
+
+
+def derive_status_from_payments(apps, schema_editor):
+    Booking = apps.get_model("listings", "Booking")
+    for payment_status, booking_status in BOOKING_STATUS_BY_PAYMENT_STATUS.items():
+        Booking.objects.filter(payment__status=payment_status).update(status=booking_status)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0003_booking_overlap_exclusion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="booking",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("pending_payment", "Pending Payment"),
+                    ("confirmed", "Confirmed"),
+                    ("cancelled", "Cancelled"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+        migrations.RunPython(derive_status_from_payments, migrations.RunPython.noop),
+        migrations.RunPython(_run_on_postgres(CREATE_SQL), _run_on_postgres(DROP_SQL)),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0004_booking_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FailedTask",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("task_name", models.CharField(max_length=255)),
+                ("task_id", models.CharField(max_length=255, unique=True)),
+                ("args", models.JSONField(default=list)),
+                ("kwargs", models.JSONField(default=dict)),
+                ("exception", models.TextField()),
+                ("traceback", models.TextField(blank=True)),
+                ("retries", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["task_name", "-created_at"], name="failedtask_name_created_idx")],
+            },
+        ),
+    ]
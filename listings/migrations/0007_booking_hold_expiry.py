@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:36
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def start_existing_holds(apps, schema_editor):
+    # Bookings already waiting for payment get a full hold from now rather
+    # than expiring the moment the sweep first runs. Only real unpaid holds:
+    # 'pending' without a payment, or 'pending_payment' with a pending one,
+    # as 0004 derived them. A paid booking must never expire.
+    from django.conf import settings
+    Booking = apps.get_model('listings', 'Booking')
+    expires_at = timezone.now() + timezone.timedelta(minutes=settings.BOOKING_PAYMENT_HOLD_MINUTES)
+    unpaid = (
+        models.Q(status='pending', payment__isnull=True)
+        | models.Q(status='pending_payment', payment__status='pending')
+    )
+    Booking.objects.filter(unpaid, expires_at__isnull=True).update(expires_at=expires_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        # Holds are started from the statuses 0004 backfilled.
+        ('listings', '0004_booking_status'),
+        ('listings', '0006_listing_calendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'pending_payment'])), fields=['expires_at'], name='booking_hold_expiry_idx'),
+        ),
+        migrations.RunPython(start_existing_holds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0012_payment_refund_due'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='changelogentry',
+            name='action',
+            field=models.CharField(choices=[('upsert', 'Created or updated'), ('delete', 'Deleted'), ('archive', 'Archived')], max_length=10),
+        ),
+    ]
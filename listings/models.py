@@ -1,5 +1,8 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 import uuid
 
 User = get_user_model()
@@ -12,20 +15,123 @@ class Listing(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='listings')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['location', 'price_per_night'], name='listing_loc_price_idx'),
+            models.Index(fields=['owner', '-created_at'], name='listing_owner_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
 class Booking(models.Model):
+    BOOKING_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('pending_payment', 'Pending Payment'),
+        ('confirmed', 'Confirmed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    # Statuses that hold a listing's nights only until expires_at.
+    HOLD_STATUSES = ('pending', 'pending_payment')
+    # The PostgreSQL exclusion constraint keeping active bookings of a
+    # listing apart (migrations 0003 and 0004).
+    OVERLAP_CONSTRAINT = 'booking_no_overlap'
+
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='bookings')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
     check_in = models.DateField()
     check_out = models.DateField()
     guests = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=BOOKING_STATUS_CHOICES, default='pending')
+    expires_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='booking_user_created_idx'),
+            models.Index(fields=['listing', 'check_in', 'check_out'], name='booking_listing_dates_idx'),
+            models.Index(
+                fields=['expires_at'],
+                name='booking_hold_expiry_idx',
+                condition=models.Q(status__in=['pending', 'pending_payment']),
+            ),
+            # Admin status filter, newest first.
+            models.Index(fields=['status', 'id'], name='booking_status_id_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(check_out__gt=models.F('check_in')),
+                name='booking_check_out_after_check_in',
+            ),
+        ]
+
+    @staticmethod
+    def hold_expiry(status, now=None, held_since=None):
+        """
+        When a booking entering `status` should expire, or None if the
+        status isn't a hold. A booking held since `held_since` (its creation)
+        is never held past BOOKING_HOLD_MAX_MINUTES from then, however often
+        the hold restarts. Expiry times are rounded up to the next
+        BOOKING_HOLD_BUCKET_SECONDS slot, like a timer wheel, so holds
+        expire in groups and each sweep only reads the slots that are due.
+        """
+        minutes = {
+            'pending': settings.BOOKING_HOLD_MINUTES,
+            'pending_payment': settings.BOOKING_PAYMENT_HOLD_MINUTES,
+        }.get(status)
+        if minutes is None:
+            return None
+        due = (now or timezone.now()) + timedelta(minutes=minutes)
+        if held_since is not None:
+            due = min(due, held_since + timedelta(minutes=settings.BOOKING_HOLD_MAX_MINUTES))
+        bucket = settings.BOOKING_HOLD_BUCKET_SECONDS
+        return datetime.fromtimestamp(-(-due.timestamp() // bucket) * bucket, tz=dt_timezone.utc)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.expires_at is None:
+            self.expires_at = self.hold_expiry(self.status)
+        super().save(*args, **kwargs)
+
+    @property
+    def total_price(self):
+        nights = (self.check_out - self.check_in).days
+        return self.listing.price_per_night * nights
+
     def __str__(self):
         return f"Booking by {self.user} for {self.listing}"
 
+class ListingCalendar(models.Model):
+    """
+    Occupancy bitmap for a listing: bit i is set when the night of
+    ``origin + i days`` is taken by a booking that isn't cancelled.
+    Maintained by ``listings.availability``.
+    """
+    listing = models.OneToOneField(Listing, on_delete=models.CASCADE, primary_key=True, related_name='calendar')
+    origin = models.DateField()
+    nights = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Calendar for {self.listing} from {self.origin}"
+
+class SimilarListing(models.Model):
+    """
+    One of a listing's precomputed nearest neighbours, best first from rank 0.
+    Rebuilt by ``listings.recommendations``.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='neighbours')
+    similar = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='recommended_in')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'rank'], name='similar_listing_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} similar to {self.listing_id}: {self.similar_id}"
+
 class Review(models.Model):
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews')
@@ -35,6 +141,15 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ('listing', 'user')
+        indexes = [
+            models.Index(fields=['listing', '-created_at'], name='review_listing_created_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(rating__gte=1, rating__lte=5),
+                name='review_rating_range',
+            ),
+        ]
 
     def __str__(self):
         return f"Review by {self.user} for {self.listing}"
@@ -45,6 +160,8 @@ class Payment(models.Model):
         ('completed', 'Completed'),
         ('failed', 'Failed'),
         ('cancelled', 'Cancelled'),
+        # Charged by the gateway after the payment was cancelled; to be refunded.
+        ('refund_due', 'Refund Due'),
     ]
     
     booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='payment')
@@ -54,8 +171,20 @@ class Payment(models.Model):
     currency = models.CharField(max_length=3, default='ETB')
     status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
     payment_method = models.CharField(max_length=50, blank=True, null=True)
+    # Set by staff once the payment has been matched against the gateway's settlement report.
+    reconciled_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                name='payment_pending_created_idx',
+                condition=models.Q(status='pending'),
+            ),
+            models.Index(fields=['status', '-updated_at'], name='payment_status_updated_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.transaction_id:
@@ -63,4 +192,111 @@ class Payment(models.Model):
         super().save(*args, **kwargs)
     
     def __str__(self):
-        return f"Payment {self.transaction_id} for {self.booking}"
\ No newline at end of file
+        return f"Payment {self.transaction_id} for {self.booking}"
+
+class ArchivedBooking(models.Model):
+    """
+    A booking moved out of the live table by ``archive_bookings`` once its
+    stay ended more than BOOKING_ARCHIVE_AFTER_DAYS ago. Keeps the original id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='archived_bookings')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_bookings')
+    check_in = models.DateField()
+    check_out = models.DateField()
+    guests = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=Booking.BOOKING_STATUS_CHOICES)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='archbooking_user_created_idx'),
+            models.Index(fields=['listing', 'check_in'], name='archbooking_listing_dates_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived booking by {self.user} for {self.listing}"
+
+class ArchivedPayment(models.Model):
+    """The payment of an ArchivedBooking, archived with it. Keeps the original id."""
+    id = models.BigIntegerField(primary_key=True)
+    booking = models.OneToOneField(ArchivedBooking, on_delete=models.CASCADE, related_name='payment')
+    transaction_id = models.CharField(max_length=255, unique=True, blank=True)
+    chapa_reference = models.CharField(max_length=255, blank=True, null=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default='ETB')
+    status = models.CharField(max_length=20, choices=Payment.PAYMENT_STATUS_CHOICES)
+    payment_method = models.CharField(max_length=50, blank=True, null=True)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived payment {self.transaction_id} for {self.booking}"
+
+class ChangeLogEntry(models.Model):
+    """
+    One change to a booking, payment or review, in the feed of the user who
+    owns it. The auto-increment id is the sync sequence; see
+    ``listings.changelog``.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ARCHIVE = 'archive'
+    ACTION_CHOICES = [(UPSERT, 'Created or updated'), (DELETE, 'Deleted'), (ARCHIVE, 'Archived')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='change_log')
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='changelog_user_seq_idx'),
+            models.Index(fields=['model', 'object_id', 'id'], name='changelog_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.action} {self.model} {self.object_id}"
+
+class TokenRevocation(models.Model):
+    """
+    A revoked bearer token, or with a blank `token_id` every token issued
+    to `user` up to `revoked_at`. Kept until `expires_at`, when the tokens
+    it covers have expired anyway; see ``listings.authentication``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='token_revocations')
+    token_id = models.CharField(max_length=32, blank=True)
+    revoked_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'token_id'], name='revocation_user_token_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.token_id or 'all tokens'} revoked at {self.revoked_at}"
+
+class FailedTask(models.Model):
+    """Dead-letter record for a background task that failed after all retries."""
+    task_name = models.CharField(max_length=255)
+    task_id = models.CharField(max_length=255, unique=True)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    exception = models.TextField()
+    traceback = models.TextField(blank=True)
+    retries = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['task_name', '-created_at'], name='failedtask_name_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_name} [{self.task_id}] failed: {self.exception}"
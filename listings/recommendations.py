@@ -0,0 +1,171 @@
+"""
+Precomputed "similar listings".
+
+``rebuild`` describes every listing as a feature vector built with NumPy:
+
+    location    hashed one-hot of the normalized location
+    price       quantile band of price_per_night, spilling into adjacent bands
+    rating      band of the average rating, scaled by how many reviews back it
+    co-booking  sparse random projection of the users who booked the listing,
+                so listings booked by the same people point the same way
+
+Each part is normalized and weighted, and neighbours are ranked by cosine
+similarity. The n x n similarity matrix is never built: rows are taken in
+blocks of SIMILAR_LISTINGS_BLOCK_SIZE and compared with one column block at
+a time, keeping a running top-k, so memory stays at a few block_size²
+floats however many listings there are. Each row block's neighbours replace
+its old ones in ``SimilarListing`` in one transaction, which the
+``/api/listings/{id}/similar/`` endpoint reads with one indexed query.
+"""
+
+import itertools
+import zlib
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count
+from .models import Booking, Listing, Review, SimilarListing
+
+LOCATION_BUCKETS = 64
+PRICE_BANDS = 10
+RATING_BANDS = 5
+CO_BOOKING_DIMS = 64
+# Ratings backed by this many reviews count in full.
+CONFIDENT_REVIEWS = 20
+WEIGHTS = {'location': 1.0, 'price': 0.6, 'rating': 0.3, 'co_booking': 0.8}
+
+
+def _unit_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _banded(bands, width, spill=0.5):
+    """One-hot rows for band indexes (-1 for none), with `spill` on the adjacent bands."""
+    matrix = np.zeros((len(bands), width), dtype=np.float32)
+    rows = np.flatnonzero(bands >= 0)
+    matrix[rows, bands[rows]] = 1
+    for offset in (-1, 1):
+        adjacent = bands[rows] + offset
+        inside = (adjacent >= 0) & (adjacent < width)
+        matrix[rows[inside], adjacent[inside]] = spill
+    return matrix
+
+
+def _co_booking(ids, chunk_size=50000):
+    """Each listing's bookers, projected onto CO_BOOKING_DIMS signed hash buckets."""
+    matrix = np.zeros((len(ids), CO_BOOKING_DIMS), dtype=np.float32)
+    pairs = (
+        Booking.objects.exclude(status='cancelled').values_list('listing_id', 'user_id')
+        .distinct().iterator(chunk_size=chunk_size)
+    )
+    while chunk := list(itertools.islice(pairs, chunk_size)):
+        listing_ids, user_ids = np.array(chunk, dtype=np.int64).T
+        rows = np.searchsorted(ids, listing_ids).clip(max=len(ids) - 1)
+        known = ids[rows] == listing_ids
+        hashed = user_ids[known].astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        buckets = (hashed >> np.uint64(40)) % np.uint64(CO_BOOKING_DIMS)
+        signs = np.where((hashed >> np.uint64(32)) & np.uint64(1), 1.0, -1.0).astype(np.float32)
+        np.add.at(matrix, (rows[known], buckets.astype(np.intp)), signs)
+    return matrix
+
+
+def listing_features():
+    """Return (ids, features): listing ids in ascending order and one unit row per listing."""
+    rows = list(Listing.objects.order_by('pk').values_list('pk', 'location', 'price_per_night'))
+    ids = np.array([pk for pk, _, _ in rows], dtype=np.int64)
+    if not rows:
+        return ids, np.zeros((0, 0), dtype=np.float32)
+
+    location = np.zeros((len(rows), LOCATION_BUCKETS), dtype=np.float32)
+    buckets = [zlib.crc32(location_name.strip().lower().encode()) % LOCATION_BUCKETS for _, location_name, _ in rows]
+    location[np.arange(len(rows)), buckets] = 1
+
+    prices = np.array([float(price) for _, _, price in rows])
+    edges = np.quantile(prices, np.linspace(0, 1, PRICE_BANDS + 1)[1:-1])
+    price = _banded(np.searchsorted(edges, prices, side='right'), PRICE_BANDS)
+
+    average = np.full(len(rows), np.nan)
+    reviews = np.zeros(len(rows))
+    for listing_id, avg_rating, review_count in (
+        Review.objects.values('listing_id').annotate(avg_rating=Avg('rating'), review_count=Count('id'))
+        .values_list('listing_id', 'avg_rating', 'review_count')
+    ):
+        row = np.searchsorted(ids, listing_id)
+        if row < len(ids) and ids[row] == listing_id:
+            average[row], reviews[row] = avg_rating, review_count
+    rated = ~np.isnan(average)
+    rating_bands = np.full(len(rows), -1)
+    rating_bands[rated] = np.clip(np.rint(average[rated]).astype(int) - 1, 0, RATING_BANDS - 1)
+    confidence = np.minimum(np.log1p(reviews) / np.log1p(CONFIDENT_REVIEWS), 1)[:, None]
+
+    features = np.hstack([
+        WEIGHTS['location'] * location,
+        WEIGHTS['price'] * _unit_rows(price),
+        WEIGHTS['rating'] * confidence * _unit_rows(_banded(rating_bands, RATING_BANDS)),
+        WEIGHTS['co_booking'] * _unit_rows(_co_booking(ids)),
+    ]).astype(np.float32)
+    return ids, _unit_rows(features)
+
+
+def nearest_neighbours(features, k, block_size):
+    """
+    Yield (start, neighbours, scores) for each block of `block_size` rows
+    from `start`: the row indexes of each row's `k` most similar other rows,
+    best first, and their cosine similarities.
+    """
+    count = len(features)
+    k = min(k, count - 1)
+    if k <= 0:
+        return
+    for start in range(0, count, block_size):
+        rows = features[start:start + block_size]
+        best_scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+        best = np.full((len(rows), k), -1, dtype=np.int64)
+        for column in range(0, count, block_size):
+            scores = rows @ features[column:column + block_size].T
+            width = scores.shape[1]
+            # A listing is not its own neighbour.
+            own = np.arange(len(rows))
+            own_column = start + own - column
+            inside = (own_column >= 0) & (own_column < width)
+            scores[own[inside], own_column[inside]] = -np.inf
+
+            scores = np.hstack([best_scores, scores])
+            candidates = np.hstack([best, np.broadcast_to(np.arange(column, column + width), (len(rows), width))])
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best = np.take_along_axis(candidates, top, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        yield start, np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def rebuild(k=None, block_size=None):
+    """
+    Recompute every listing's top `k` neighbours (SIMILAR_LISTINGS_COUNT by
+    default). Returns the number of listings processed.
+    """
+    k = k or settings.SIMILAR_LISTINGS_COUNT
+    block_size = block_size or settings.SIMILAR_LISTINGS_BLOCK_SIZE
+    ids, features = listing_features()
+    for start, neighbours, scores in nearest_neighbours(features, k, block_size):
+        block_ids = ids[start:start + len(neighbours)]
+        neighbour_ids = ids[neighbours]
+        with transaction.atomic():
+            # Skip listings deleted since the features were read.
+            existing = set(Listing.objects.filter(
+                pk__in=np.union1d(block_ids, neighbour_ids).tolist()
+            ).values_list('pk', flat=True))
+            SimilarListing.objects.filter(listing_id__in=block_ids.tolist()).delete()
+            SimilarListing.objects.bulk_create(
+                (
+                    SimilarListing(listing_id=listing_id, similar_id=similar_id, rank=rank, score=score)
+                    for listing_id, row_ids, row_scores in zip(block_ids.tolist(), neighbour_ids.tolist(), scores.tolist())
+                    if listing_id in existing
+                    for rank, (similar_id, score) in enumerate(
+                        (similar_id, score) for similar_id, score in zip(row_ids, row_scores) if similar_id in existing
+                    )
+                ),
+                batch_size=5000,
+            )
+    return len(ids)
@@ -1,26 +1,47 @@
 from rest_framework import serializers
-from .models import Listing, Booking, Review, Payment
+from .models import Listing, Booking, Review, Payment, ArchivedBooking, ArchivedPayment
 
 class ListingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Listing
         fields = ['id', 'title', 'description', 'location', 'price_per_night', 'owner', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'owner', 'created_at']
 
 class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
-        fields = ['id', 'listing', 'user', 'check_in', 'check_out', 'guests', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'listing', 'user', 'check_in', 'check_out', 'guests', 'status', 'expires_at', 'created_at']
+        read_only_fields = ['id', 'user', 'status', 'expires_at', 'created_at']
+
+    def validate(self, attrs):
+        check_in = attrs.get('check_in', getattr(self.instance, 'check_in', None))
+        check_out = attrs.get('check_out', getattr(self.instance, 'check_out', None))
+        if check_in and check_out and check_out <= check_in:
+            raise serializers.ValidationError({'check_out': 'Must be after check_in.'})
+        return attrs
 
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = ['id', 'listing', 'user', 'rating', 'comment', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'user', 'created_at']
+        # Mirrors the review_rating_range check constraint, so bad ratings are a 400, not an IntegrityError.
+        extra_kwargs = {'rating': {'min_value': 1, 'max_value': 5}}
 
 class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = ['id', 'booking', 'transaction_id', 'chapa_reference', 'amount', 'currency', 'status', 'payment_method', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'transaction_id', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['id', 'transaction_id', 'status', 'created_at', 'updated_at']
+
+class ArchivedBookingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedBooking
+        fields = ['id', 'listing', 'user', 'check_in', 'check_out', 'guests', 'status', 'expires_at', 'created_at', 'archived_at']
+        read_only_fields = fields
+
+class ArchivedPaymentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedPayment
+        fields = ['id', 'booking', 'transaction_id', 'chapa_reference', 'amount', 'currency', 'status', 'payment_method', 'created_at', 'updated_at', 'archived_at']
+        read_only_fields = fields
@@ -0,0 +1,75 @@
+"""
+Model signal receivers: listing calendars and the sync change log follow
+booking/payment/review changes, and credential changes revoke tokens.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .authentication import principals, refresh_revocations, revoke_user_tokens
+from . import changelog
+from .availability import refresh_calendar_on_commit
+from .models import Booking, ChangeLogEntry, Payment, Review
+
+
+@receiver(pre_save, sender=Booking)
+def remember_previous_listing(sender, instance, **kwargs):
+    # A booking moved to another listing frees nights on the old one.
+    if instance.pk and not kwargs.get('raw'):
+        instance._previous_listing_id = (
+            Booking.objects.filter(pk=instance.pk).values_list('listing_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def refresh_listing_calendar(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    # Calendars start today, so deleting (e.g. archiving) a past stay changes nothing.
+    if kwargs['signal'] is post_delete and instance.check_out <= timezone.localdate():
+        return
+    refresh_calendar_on_commit(instance.listing_id)
+    previous = getattr(instance, '_previous_listing_id', None)
+    if previous and previous != instance.listing_id:
+        refresh_calendar_on_commit(previous)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def revoke_tokens_on_credential_change(sender, instance, created, **kwargs):
+    # AbstractBaseUser keeps the raw password in _password until after save.
+    if created or kwargs.get('raw'):
+        return
+    if not instance.is_active or getattr(instance, '_password', None) is not None:
+        revoke_user_tokens(instance)
+    else:
+        # E.g. a reactivated user.
+        refresh_revocations(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def revoke_tokens_on_user_deletion(sender, instance, **kwargs):
+    refresh_revocations(instance.pk)
+    principals.discard(instance.pk)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Review)
+def log_change(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        changelog.record(instance)
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Review)
+def log_deletion(sender, instance, origin=None, **kwargs):
+    # Deleting a user takes their whole feed with them.
+    User = get_user_model()
+    if isinstance(origin, User) or (isinstance(origin, QuerySet) and origin.model is User):
+        return
+    changelog.record(instance, ChangeLogEntry.DELETE)
@@ -0,0 +1,216 @@
+"""
+Status transitions for Booking and Payment.
+
+Every transition is a single conditional ``UPDATE ... WHERE status IN (...)``
+so concurrent workers (the Chapa callback, a client calling
+``verify_payment``, a retry) cannot both apply it. Each helper returns
+``True`` only for the caller whose update won; only that caller should
+perform side effects such as sending emails. Every committed transition
+is published to ``events`` for clients streaming the record's status.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+from . import changelog, events
+from .availability import refresh_calendar_on_commit
+from .models import Booking, Payment
+
+PAYMENT_TRANSITIONS = {
+    'pending': {'completed', 'failed', 'cancelled'},
+    'completed': set(),
+    'failed': set(),
+    # A cancelled payment the guest completed anyway, e.g. after the
+    # booking's hold expired during checkout.
+    'cancelled': {'refund_due'},
+    'refund_due': set(),
+}
+
+BOOKING_TRANSITIONS = {
+    'pending': {'pending_payment', 'confirmed', 'cancelled'},
+    'pending_payment': {'pending', 'confirmed', 'cancelled'},
+    'confirmed': {'cancelled'},
+    'cancelled': set(),
+}
+
+
+class InvalidTransition(ValueError):
+    """Raised when a target status is not reachable from any status."""
+
+
+def _sources(transitions, to_status):
+    sources = [source for source, targets in transitions.items() if to_status in targets]
+    if not sources:
+        raise InvalidTransition(f"No transition leads to '{to_status}'")
+    return sources
+
+
+def payment_event(payment):
+    return {'id': payment.pk, 'status': payment.status, 'booking': payment.booking_id}
+
+
+def booking_event(booking):
+    return {
+        'id': booking.pk, 'status': booking.status,
+        'expires_at': booking.expires_at.isoformat() if booking.expires_at else None,
+    }
+
+
+def transition_payment(payment, to_status, from_statuses=None):
+    """
+    Move `payment` to `to_status` if it is still in one of `from_statuses`
+    (defaults to every status allowed to reach `to_status`).
+
+    Returns True if this call performed the transition. The in-memory
+    instance is updated to match.
+    """
+    from_statuses = from_statuses or _sources(PAYMENT_TRANSITIONS, to_status)
+    now = timezone.now()
+    won = Payment.objects.filter(pk=payment.pk, status__in=from_statuses).update(
+        status=to_status, updated_at=now
+    ) == 1
+    if won:
+        payment.status = to_status
+        payment.updated_at = now
+        changelog.record(payment)
+        events.publish_on_commit(f'payment:{payment.pk}', payment_event(payment))
+    return won
+
+
+def transition_booking(booking, to_status, from_statuses=None):
+    """
+    Move `booking` to `to_status` if it is still in one of `from_statuses`
+    (defaults to every status allowed to reach `to_status`).
+
+    Returns True if this call performed the transition. The in-memory
+    instance is updated to match.
+    """
+    from_statuses = from_statuses or _sources(BOOKING_TRANSITIONS, to_status)
+    # Entering a hold status restarts the hold, up to the booking's maximum
+    # hold; anything else clears it.
+    expires_at = Booking.hold_expiry(to_status, held_since=booking.created_at)
+    won = Booking.objects.filter(pk=booking.pk, status__in=from_statuses).update(
+        status=to_status, expires_at=expires_at
+    ) == 1
+    if won:
+        booking.status = to_status
+        booking.expires_at = expires_at
+        changelog.record(booking)
+        events.publish_on_commit(f'booking:{booking.pk}', booking_event(booking))
+        if to_status == 'cancelled':
+            # Cancelled bookings release their nights.
+            refresh_calendar_on_commit(booking.listing_id)
+    return won
+
+
+def settle_payment(payment, payment_status):
+    """
+    Apply a gateway result to a pending payment and its booking.
+
+    `payment_status` is 'completed' (booking becomes 'confirmed') or
+    'failed'/'cancelled' (booking becomes 'cancelled'). Both updates happen
+    in one transaction; returns True only for the caller that settled the
+    payment.
+    """
+    booking_status = 'confirmed' if payment_status == 'completed' else 'cancelled'
+    with transaction.atomic():
+        if not transition_payment(payment, payment_status, from_statuses=['pending']):
+            return False
+        transition_booking(payment.booking, booking_status)
+    return True
+
+
+def settle_payments(results):
+    """
+    Apply many gateway results at once. `results` maps payment ids to
+    'completed' or 'failed'; their bookings become 'confirmed' or
+    'cancelled' as in settle_payment. Payments no longer pending are
+    skipped. Every change is one UPDATE per status and table, in one
+    transaction.
+
+    Returns {payment_id: status} for the payments this call settled.
+    """
+    settled = {}
+    with transaction.atomic():
+        # Payments before bookings, as everywhere else.
+        pending = dict(
+            Payment.objects.select_for_update().filter(pk__in=list(results), status='pending')
+            .values_list('pk', 'booking_id')
+        )
+        bookings = {
+            pk: (listing_id, user_id) for pk, listing_id, user_id in
+            Booking.objects.select_for_update().filter(pk__in=pending.values()).values_list('pk', 'listing_id', 'user_id')
+        }
+        now = timezone.now()
+        for payment_status, booking_status in (('completed', 'confirmed'), ('failed', 'cancelled')):
+            payment_ids = [pk for pk in pending if results[pk] == payment_status]
+            if not payment_ids:
+                continue
+            Payment.objects.filter(pk__in=payment_ids).update(status=payment_status, updated_at=now)
+            movable = Booking.objects.filter(
+                pk__in=[pending[pk] for pk in payment_ids], status__in=_sources(BOOKING_TRANSITIONS, booking_status)
+            )
+            booking_ids = list(movable.values_list('pk', flat=True))
+            movable.update(status=booking_status, expires_at=None)
+
+            changelog.record_many(Payment, [(pk, bookings[pending[pk]][1]) for pk in payment_ids])
+            changelog.record_many(Booking, [(pk, bookings[pk][1]) for pk in booking_ids])
+            for pk in payment_ids:
+                events.publish_on_commit(f'payment:{pk}', {'id': pk, 'status': payment_status, 'booking': pending[pk]})
+            for pk in booking_ids:
+                events.publish_on_commit(f'booking:{pk}', {'id': pk, 'status': booking_status, 'expires_at': None})
+            if booking_status == 'cancelled':
+                for listing_id in {bookings[pk][0] for pk in booking_ids}:
+                    refresh_calendar_on_commit(listing_id)
+            settled.update(dict.fromkeys(payment_ids, payment_status))
+    return settled
+
+
+def cancel_bookings(bookings, now=None):
+    """
+    Cancel every booking in the queryset `bookings` that can still be
+    cancelled, with its pending payment, in one UPDATE per table. Call inside
+    a transaction. Returns the number of bookings cancelled.
+    """
+    now = now or timezone.now()
+    bookings = bookings.filter(status__in=_sources(BOOKING_TRANSITIONS, 'cancelled'))
+    # Lock payments before bookings, the same order settle_payment updates
+    # them in, so a concurrent settlement can't deadlock with us and a
+    # payment settled first keeps its booking.
+    list(Payment.objects.select_for_update().filter(booking__in=bookings.values('pk')).values_list('pk', flat=True))
+    rows = list(bookings.select_for_update().values_list('pk', 'listing_id', 'user_id'))
+    booking_ids = [pk for pk, _, _ in rows]
+    Booking.objects.filter(pk__in=booking_ids).update(status='cancelled', expires_at=None)
+    payments = list(
+        Payment.objects.filter(booking_id__in=booking_ids, status='pending')
+        .values_list('pk', 'booking__user_id', 'booking_id')
+    )
+    Payment.objects.filter(pk__in=[pk for pk, _, _ in payments]).update(status='cancelled', updated_at=now)
+    changelog.record_many(Booking, [(pk, user_id) for pk, _, user_id in rows])
+    changelog.record_many(Payment, [(pk, user_id) for pk, user_id, _ in payments])
+    for pk in booking_ids:
+        events.publish_on_commit(f'booking:{pk}', {'id': pk, 'status': 'cancelled', 'expires_at': None})
+    for pk, _, booking_id in payments:
+        events.publish_on_commit(f'payment:{pk}', {'id': pk, 'status': 'cancelled', 'booking': booking_id})
+    for listing_id in {listing_id for _, listing_id, _ in rows}:
+        refresh_calendar_on_commit(listing_id)
+    return len(rows)
+
+
+def expire_holds(now=None, batch_size=500):
+    """
+    Cancel pending and pending_payment bookings whose hold has expired,
+    along with their pending payments, `batch_size` bookings per
+    transaction. Only rows in due expiry slots are read, via the partial
+    index on expires_at.
+
+    Returns the number of bookings cancelled.
+    """
+    now = now or timezone.now()
+    due = Booking.objects.filter(status__in=Booking.HOLD_STATUSES, expires_at__lte=now)
+    expired = 0
+    while True:
+        candidates = list(due.order_by('expires_at').values_list('pk', flat=True)[:batch_size])
+        if not candidates:
+            return expired
+        with transaction.atomic():
+            expired += cancel_bookings(due.filter(pk__in=candidates), now)
@@ -1,22 +1,59 @@
-from celery import shared_task
-from django.core.mail import send_mail
+import logging
+from smtplib import SMTPException
+from celery import Task, shared_task
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Payment, Booking
+from .models import Listing, Payment, Booking, FailedTask
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
-@shared_task
+
+class NotificationTask(Task):
+    """
+    Base class for fire-and-forget notification tasks.
+
+    Results are never stored or sent back to the broker. Transient delivery
+    errors are retried with exponential backoff; once retries are exhausted
+    (or on any other error) the failure is recorded as a FailedTask.
+    """
+    ignore_result = True
+    autoretry_for = (SMTPException, OSError)
+    retry_backoff = True
+    retry_backoff_max = 600
+    retry_jitter = True
+    max_retries = 5
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        logger.error("Task %s[%s] failed permanently: %r", self.name, task_id, exc)
+        FailedTask.objects.update_or_create(
+            task_id=task_id,
+            defaults={
+                'task_name': self.name,
+                'args': list(args),
+                'kwargs': dict(kwargs),
+                'exception': repr(exc),
+                'traceback': str(einfo),
+                'retries': self.request.retries,
+            },
+        )
+
+
+@shared_task(base=NotificationTask)
 def send_booking_confirmation_email(booking_id):
     """
     Send booking confirmation email to the user after booking creation.
     """
     try:
-        booking = Booking.objects.get(id=booking_id)
-        user = booking.user
-        
-        subject = f'Booking Confirmation - Booking #{booking.id}'
-        message = f"""
+        booking = Booking.objects.select_related('user', 'listing').get(id=booking_id)
+    except Booking.DoesNotExist:
+        logger.warning("Booking %s not found; skipping confirmation email", booking_id)
+        return
+    user = booking.user
+    
+    subject = f'Booking Confirmation - Booking #{booking.id}'
+    message = f"""
         Dear {user.first_name or user.username},
         
         Your booking has been confirmed!
@@ -34,36 +71,22 @@ def send_booking_confirmation_email(booking_id):
         Best regards,
         ALX Travel Team
         """
-        
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
-        )
-        
-        return f"Booking confirmation email sent successfully to {user.email}"
-        
-    except Booking.DoesNotExist:
-        return f"Booking with ID {booking_id} not found"
-    except Exception as e:
-        return f"Error sending booking confirmation email: {str(e)}"
-
+    
+    send_mail(
+        subject=subject,
+        message=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[user.email],
+        fail_silently=False,
+    )
 
 
-@shared_task
-def send_payment_confirmation_email(payment_id):
-    """
-    Send payment confirmation email to the user after successful payment.
-    """
-    try:
-        payment = Payment.objects.get(id=payment_id)
-        booking = payment.booking
-        user = booking.user
-        
-        subject = f'Payment Confirmation - Booking #{booking.id}'
-        message = f"""
+def _payment_confirmation_message(payment):
+    booking = payment.booking
+    user = booking.user
+    
+    subject = f'Payment Confirmation - Booking #{booking.id}'
+    message = f"""
         Dear {user.first_name or user.username},
         
         Your payment has been successfully processed!
@@ -82,34 +105,15 @@ def send_payment_confirmation_email(payment_id):
         Best regards,
         ALX Travel Team
         """
-        
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
-        )
-        
-        return f"Email sent successfully to {user.email}"
-        
-    except Payment.DoesNotExist:
-        return f"Payment with ID {payment_id} not found"
-    except Exception as e:
-        return f"Error sending email: {str(e)}"
+    return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
 
-@shared_task
-def send_payment_failure_email(payment_id):
-    """
-    Send payment failure notification email to the user.
-    """
-    try:
-        payment = Payment.objects.get(id=payment_id)
-        booking = payment.booking
-        user = booking.user
-        
-        subject = f'Payment Failed - Booking #{booking.id}'
-        message = f"""
+
+def _payment_failure_message(payment):
+    booking = payment.booking
+    user = booking.user
+    
+    subject = f'Payment Failed - Booking #{booking.id}'
+    message = f"""
         Dear {user.first_name or user.username},
         
         Unfortunately, your payment could not be processed.
@@ -124,18 +128,91 @@ def send_payment_failure_email(payment_id):
         Best regards,
         ALX Travel Team
         """
-        
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
-        )
-        
-        return f"Failure notification sent to {user.email}"
-        
+    return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+
+
+@shared_task(base=NotificationTask)
+def send_payment_confirmation_email(payment_id):
+    """
+    Send payment confirmation email to the user after successful payment.
+    """
+    try:
+        payment = Payment.objects.select_related('booking__user', 'booking__listing').get(id=payment_id)
+    except Payment.DoesNotExist:
+        logger.warning("Payment %s not found; skipping confirmation email", payment_id)
+        return
+    _payment_confirmation_message(payment).send(fail_silently=False)
+
+
+@shared_task(base=NotificationTask)
+def send_payment_failure_email(payment_id):
+    """
+    Send payment failure notification email to the user.
+    """
+    try:
+        payment = Payment.objects.select_related('booking__user', 'booking__listing').get(id=payment_id)
     except Payment.DoesNotExist:
-        return f"Payment with ID {payment_id} not found"
-    except Exception as e:
-        return f"Error sending failure email: {str(e)}"
\ No newline at end of file
+        logger.warning("Payment %s not found; skipping failure email", payment_id)
+        return
+    _payment_failure_message(payment).send(fail_silently=False)
+
+
+@shared_task(base=NotificationTask)
+def send_payment_result_emails(completed_ids, failed_ids):
+    """
+    Send the confirmation and failure emails for many settled payments, as
+    after a bulk verification, over one SMTP connection. A message that
+    can't be sent is handed to its single-payment task, which retries it
+    on its own.
+    """
+    builders = dict.fromkeys(completed_ids, _payment_confirmation_message)
+    builders.update(dict.fromkeys(failed_ids, _payment_failure_message))
+    fallbacks = dict.fromkeys(completed_ids, send_payment_confirmation_email)
+    fallbacks.update(dict.fromkeys(failed_ids, send_payment_failure_email))
+    payments = Payment.objects.select_related('booking__user', 'booking__listing').filter(pk__in=builders)
+    with get_connection(fail_silently=False) as connection:
+        for payment in payments:
+            try:
+                connection.send_messages([builders[payment.pk](payment)])
+            except (SMTPException, OSError) as exc:
+                logger.warning("Could not send email for payment %s (%r); retrying it on its own", payment.pk, exc)
+                fallbacks[payment.pk].delay(payment.pk)
+
+
+@shared_task(ignore_result=True)
+def refresh_listing_calendars(batch_size=500):
+    """
+    Rebuild every listing calendar from today, rolling the availability
+    horizon forward. Scheduled nightly by Celery beat.
+    """
+    from .availability import rebuild_calendars
+    listing_ids = list(Listing.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(listing_ids), batch_size):
+        rebuild_calendars(listing_ids[start:start + batch_size])
+    logger.info("Rebuilt %d listing calendars", len(listing_ids))
+
+
+@shared_task(ignore_result=True)
+def expire_booking_holds(batch_size=500):
+    """
+    Cancel bookings whose unpaid hold has run out, freeing their nights.
+    Scheduled by Celery beat every BOOKING_HOLD_BUCKET_SECONDS.
+    """
+    from .state_machine import expire_holds
+    expired = expire_holds(batch_size=batch_size)
+    if expired:
+        logger.info("Expired %d booking holds", expired)
+
+
+@shared_task(ignore_result=True)
+def compact_change_log():
+    """Drop superseded and expired sync change-log entries. Scheduled nightly by Celery beat."""
+    from .changelog import compact
+    logger.info("Compacted %d change log entries", compact())
+
+
+@shared_task(ignore_result=True)
+def rebuild_similar_listings():
+    """Recompute every listing's similar listings. Scheduled nightly by Celery beat."""
+    from .recommendations import rebuild
+    logger.info("Rebuilt similar listings for %d listings", rebuild())
@@ -1,3 +1,1407 @@
-from django.test import TestCase
+import gzip
+import importlib
+import math
+import os
+import tempfile
+import time
+import brotli
+import msgpack
+import numpy as np
+import requests
+from decimal import Decimal
+from smtplib import SMTPException
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+from datetime import date, timedelta
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from alx_travel_app import docs, warmup
+from alx_travel_app.celery import app
+from .authentication import PrincipalCache, issue_token, principals
+from . import events, recommendations, tasks, throttling
+from .availability import is_free
+from .changelog import compact
+from .fake_chapa import FakeChapaServer
+from .management.commands import profile_startup
+from .fast_serializers import ValuesSerializer
+from .models import (
+    Listing, ListingCalendar, Booking, Review, Payment, ArchivedBooking, ArchivedPayment, ChangeLogEntry, FailedTask,
+    SimilarListing,
+)
+from .renderers import ORJSONRenderer
+from .serializers import ListingSerializer, BookingSerializer, ReviewSerializer, PaymentSerializer
+from .state_machine import expire_holds, settle_payment, transition_booking
 
-# Create your tests here.
+User = get_user_model()
+
+
+class FastListSerializationTests(TestCase):
+    """The fast list path must render exactly what the ModelSerializers do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+        cls.listing = Listing.objects.create(
+            title='Café “Loft” with view',
+            description='Ünïcode — and "quotes"\u2028next line',
+            location='Paris',
+            price_per_night=Decimal('99.50'),
+            owner=cls.user,
+        )
+        Listing.objects.create(
+            title='Plain', description='', location='Tokyo', price_per_night=Decimal('1200'), owner=cls.user
+        )
+        cls.booking = Booking.objects.create(
+            listing=cls.listing, user=cls.user, check_in=date(2026, 7, 12), check_out=date(2026, 7, 19), guests=2
+        )
+        Review.objects.create(listing=cls.listing, user=cls.user, rating=5, comment='')
+        Payment.objects.create(booking=cls.booking, amount=Decimal('696.5'), chapa_reference=None)
+
+    def assertSameBytes(self, serializer_class, queryset):
+        fast = ValuesSerializer.for_serializer(serializer_class)
+        self.assertIsNotNone(fast)
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        self.assertEqual(ORJSONRenderer().render(fast.serialize(queryset)), expected)
+        self.assertEqual(ORJSONRenderer().render(fast.serialize(list(queryset))), expected)
+
+    def test_listing_output_is_identical(self):
+        self.assertSameBytes(ListingSerializer, Listing.objects.all())
+
+    def test_booking_output_is_identical(self):
+        self.assertSameBytes(BookingSerializer, Booking.objects.all())
+
+    def test_review_output_is_identical(self):
+        self.assertSameBytes(ReviewSerializer, Review.objects.all())
+
+    def test_payment_output_is_identical(self):
+        self.assertSameBytes(PaymentSerializer, Payment.objects.all())
+
+    def test_list_endpoint_uses_fast_path(self):
+        response = self.client.get('/api/listings/', HTTP_HOST='localhost', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.content,
+            JSONRenderer().render(ListingSerializer(Listing.objects.all(), many=True).data),
+        )
+
+
+class AvailabilitySearchTests(TestCase):
+    """Listing search by dates must agree with the bookings, bitmap or not."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='host', email='host@example.com', password='password123')
+        cls.paris = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('120'), owner=cls.user
+        )
+        cls.paris_cheap = Listing.objects.create(
+            title='Paris room', description='', location='Paris', price_per_night=Decimal('40'), owner=cls.user
+        )
+        Listing.objects.create(
+            title='Tokyo flat', description='', location='Tokyo', price_per_night=Decimal('90'), owner=cls.user
+        )
+
+    def search(self, **params):
+        response = self.client.get('/api/listings/', params, HTTP_HOST='localhost', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return {listing['title'] for listing in response.json()}
+
+    def book(self, listing, check_in, nights):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.create(
+                listing=listing, user=self.user, check_in=check_in,
+                check_out=check_in + timedelta(days=nights), guests=1,
+            )
+
+    def test_location_and_price_filters(self):
+        self.assertEqual(self.search(location='Paris'), {'Paris flat', 'Paris room'})
+        self.assertEqual(self.search(location='Paris', max_price='100'), {'Paris room'})
+        self.assertEqual(self.search(min_price='50'), {'Paris flat', 'Tokyo flat'})
+
+    def test_booked_listing_is_excluded_for_overlapping_stays(self):
+        check_in = date.today() + timedelta(days=10)
+        self.book(self.paris, check_in, 3)
+        self.assertTrue(ListingCalendar.objects.filter(listing=self.paris).exists())
+        stay = {'location': 'Paris', 'check_in': check_in + timedelta(days=2), 'check_out': check_in + timedelta(days=5)}
+        self.assertEqual(self.search(**stay), {'Paris room'})
+        # Checking in on the day the booking checks out is fine.
+        after = {'check_in': check_in + timedelta(days=3), 'check_out': check_in + timedelta(days=4)}
+        self.assertEqual(self.search(location='Paris', **after), {'Paris flat', 'Paris room'})
+
+    def test_cancelling_frees_the_nights(self):
+        check_in = date.today() + timedelta(days=10)
+        booking = self.book(self.paris, check_in, 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_booking(booking, 'cancelled')
+        stay = {'check_in': check_in, 'check_out': check_in + timedelta(days=3)}
+        self.assertEqual(self.search(location='Paris', **stay), {'Paris flat', 'Paris room'})
+
+    def test_stays_beyond_the_horizon_fall_back_to_bookings(self):
+        check_in = date.today() + timedelta(days=settings.LISTING_CALENDAR_DAYS + 30)
+        self.book(self.paris, check_in, 2)
+        stay = {'check_in': check_in, 'check_out': check_in + timedelta(days=2)}
+        self.assertEqual(self.search(location='Paris', **stay), {'Paris room'})
+
+    def test_invalid_dates_are_rejected(self):
+        response = self.client.get(
+            '/api/listings/', {'check_in': '2026-07-19', 'check_out': '2026-07-12'}, HTTP_HOST='localhost'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class HoldExpiryTests(TestCase):
+    """Unpaid bookings stop holding their nights once the hold runs out."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+        cls.listing = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('120'), owner=cls.user
+        )
+
+    def book(self, days_ahead, status='pending'):
+        check_in = date.today() + timedelta(days=days_ahead)
+        return Booking.objects.create(
+            listing=self.listing, user=self.user, check_in=check_in,
+            check_out=check_in + timedelta(days=2), guests=1, status=status,
+        )
+
+    def test_hold_expiry_is_rounded_up_to_a_bucket(self):
+        now = timezone.now()
+        expires_at = Booking.hold_expiry('pending', now)
+        self.assertGreaterEqual(expires_at, now + timedelta(minutes=settings.BOOKING_HOLD_MINUTES))
+        self.assertEqual(expires_at.timestamp() % settings.BOOKING_HOLD_BUCKET_SECONDS, 0)
+        self.assertIsNone(Booking.hold_expiry('confirmed', now))
+        self.assertIsNotNone(self.book(1).expires_at)
+
+    def test_due_holds_are_cancelled_with_their_pending_payments(self):
+        due = self.book(1)
+        awaiting_payment = self.book(5)
+        transition_booking(awaiting_payment, 'pending_payment')
+        payment = Payment.objects.create(booking=awaiting_payment, amount=Decimal('240'))
+        not_due = self.book(10)
+        confirmed = self.book(15, status='confirmed')
+
+        later = timezone.now() + timedelta(minutes=settings.BOOKING_PAYMENT_HOLD_MINUTES + 5)
+        Booking.objects.filter(pk=not_due.pk).update(expires_at=later + timedelta(hours=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_holds(now=later, batch_size=1), 2)
+
+        statuses = dict(Booking.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[due.pk], 'cancelled')
+        self.assertEqual(statuses[awaiting_payment.pk], 'cancelled')
+        self.assertEqual(statuses[not_due.pk], 'pending')
+        self.assertEqual(statuses[confirmed.pk], 'confirmed')
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'cancelled')
+        calendar = ListingCalendar.objects.get(listing=self.listing)
+        self.assertTrue(is_free(calendar.origin, calendar.nights, due.check_in, due.check_out))
+
+
+class ArchiveBookingsTests(TestCase):
+    """Past stays move to the archive tables and stay readable by staff."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+        cls.staff = User.objects.create_user(username='staff', email='staff@example.com', password='password123', is_staff=True)
+        cls.listing = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('120'), owner=cls.staff
+        )
+        long_ago = date.today() - timedelta(days=settings.BOOKING_ARCHIVE_AFTER_DAYS + 10)
+        cls.old = [
+            Booking.objects.create(
+                listing=cls.listing, user=cls.guest, check_in=long_ago + timedelta(days=3 * index),
+                check_out=long_ago + timedelta(days=3 * index + 2), guests=1, status='confirmed',
+            )
+            for index in range(3)
+        ]
+        cls.payment = Payment.objects.create(booking=cls.old[0], amount=Decimal('240'), status='completed')
+        cls.recent = Booking.objects.create(
+            listing=cls.listing, user=cls.guest, check_in=date.today() - timedelta(days=5),
+            check_out=date.today() - timedelta(days=3), guests=1, status='confirmed',
+        )
+
+    def test_batches_move_old_bookings_and_payments(self):
+        call_command('archive_bookings', batch_size=2, stdout=StringIO())
+        self.assertEqual(list(Booking.objects.values_list('pk', flat=True)), [self.recent.pk])
+        self.assertEqual(
+            sorted(ArchivedBooking.objects.values_list('pk', flat=True)), sorted(booking.pk for booking in self.old)
+        )
+        archived_payment = ArchivedPayment.objects.get(pk=self.payment.pk)
+        self.assertEqual(archived_payment.booking_id, self.old[0].pk)
+        self.assertEqual(archived_payment.transaction_id, self.payment.transaction_id)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_refunds_due_are_not_archived(self):
+        Booking.objects.filter(pk=self.old[0].pk).update(status='cancelled')
+        Payment.objects.filter(pk=self.payment.pk).update(status='refund_due')
+        call_command('archive_bookings', stdout=StringIO())
+        self.assertEqual(sorted(Booking.objects.values_list('pk', flat=True)), sorted([self.old[0].pk, self.recent.pk]))
+        self.assertTrue(Payment.objects.filter(pk=self.payment.pk, status='refund_due').exists())
+        self.assertEqual(ArchivedBooking.objects.count(), 2)
+
+    def test_a_row_already_archived_rolls_the_batch_back(self):
+        fields = ('id', 'listing_id', 'user_id', 'check_in', 'check_out', 'guests', 'status', 'created_at')
+        ArchivedBooking.objects.create(**{field: getattr(self.old[1], field) for field in fields})
+        with self.assertRaises(IntegrityError):
+            call_command('archive_bookings', stdout=StringIO())
+        self.assertEqual(Booking.objects.count(), 4)
+        self.assertTrue(Payment.objects.filter(pk=self.payment.pk).exists())
+
+    def test_archiving_logs_rows_as_archived_not_deleted(self):
+        ChangeLogEntry.objects.all().delete()
+        with self.assertNumQueries(14):
+            call_command('archive_bookings', stdout=StringIO())
+        self.assertFalse(ChangeLogEntry.objects.filter(action=ChangeLogEntry.DELETE).exists())
+        self.assertEqual(
+            sorted(ChangeLogEntry.objects.filter(action=ChangeLogEntry.ARCHIVE).values_list('model', 'object_id')),
+            sorted([('booking', booking.pk) for booking in self.old] + [('payment', self.payment.pk)])
+        )
+
+    def test_staff_read_archived_rows_through_the_live_endpoints(self):
+        call_command('archive_bookings', stdout=StringIO())
+        self.client.force_login(self.staff)
+        headers = {'HTTP_HOST': 'localhost', 'HTTP_ACCEPT': 'application/json'}
+        response = self.client.get(f'/api/bookings/{self.old[0].pk}/', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('archived_at', response.json())
+        response = self.client.get('/api/bookings/', {'archived': 'true'}, **headers)
+        self.assertEqual(len(response.json()), 3)
+        response = self.client.get(f'/api/payments/{self.payment.pk}/', **headers)
+        self.assertEqual(response.json()['transaction_id'], self.payment.transaction_id)
+
+        self.client.force_login(self.guest)
+        self.assertEqual(self.client.get(f'/api/bookings/{self.old[0].pk}/', **headers).status_code, 404)
+
+
+class SignedTokenAuthenticationTests(TestCase):
+    """Bearer tokens authenticate without database lookups and can be revoked."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+
+    def setUp(self):
+        principals.clear()
+        cache.clear()
+
+    def obtain_token(self):
+        response = self.client.post(
+            '/api/auth/token/', {'username': 'guest', 'password': 'password123'}, HTTP_HOST='localhost'
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()['token']
+
+    def get_bookings(self, token):
+        return self.client.get(
+            '/api/bookings/', HTTP_HOST='localhost', HTTP_ACCEPT='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+
+    def test_cached_token_needs_no_auth_queries(self):
+        token = self.obtain_token()
+        self.assertEqual(self.get_bookings(token).status_code, 200)
+        # Only the bookings query itself.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_bookings(token).status_code, 200)
+
+    def test_bad_and_expired_tokens_are_rejected(self):
+        token = self.obtain_token()
+        self.assertEqual(self.get_bookings(token[:-1] + ('A' if token[-1] != 'A' else 'B')).status_code, 401)
+        with self.settings(AUTH_TOKEN_TTL_SECONDS=-1):
+            self.assertEqual(self.get_bookings(token).status_code, 401)
+
+    def test_revoking_one_token(self):
+        token, other = self.obtain_token(), self.obtain_token()
+        response = self.client.post(
+            '/api/auth/token/revoke/', HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_bookings(token).status_code, 401)
+        self.assertEqual(self.get_bookings(other).status_code, 200)
+
+    def test_password_change_revokes_every_token(self):
+        token = self.obtain_token()
+        self.assertEqual(self.get_bookings(token).status_code, 200)
+        self.user.set_password('new-password')
+        self.user.save()
+        self.assertEqual(self.get_bookings(token).status_code, 401)
+
+    def revoke_elsewhere(self, token, other_cache):
+        """Revoke `token` from a "process" with its own cache client and principals."""
+        with mock.patch('listings.authentication.principals', PrincipalCache(16, 60)), \
+                mock.patch('listings.authentication.cache', other_cache):
+            self.client.post('/api/auth/token/revoke/', HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_revocations_reach_other_processes_through_a_shared_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+            with override_settings(CACHES={'default': backend}):
+                token, other = self.obtain_token(), self.obtain_token()
+                self.assertEqual(self.get_bookings(token).status_code, 200)
+                self.revoke_elsewhere(token, FileBasedCache(location, {}))
+                self.assertEqual(self.get_bookings(token).status_code, 401)
+                self.assertEqual(self.get_bookings(other).status_code, 200)
+
+    def test_revocations_reach_other_processes_when_the_cached_state_expires(self):
+        token = self.obtain_token()
+        self.assertEqual(self.get_bookings(token).status_code, 200)
+        self.revoke_elsewhere(token, LocMemCache('other-process', {}))
+        self.assertEqual(self.get_bookings(token).status_code, 200)
+        cache.clear()
+        self.assertEqual(self.get_bookings(token).status_code, 401)
+
+    def test_deactivated_and_deleted_users_are_rejected_at_once(self):
+        token = self.obtain_token()
+        self.assertEqual(self.get_bookings(token).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_bookings(token).status_code, 401)
+        self.user.is_active = True
+        self.user.save()
+        token = self.obtain_token()
+        self.assertEqual(self.get_bookings(token).status_code, 200)
+        self.user.delete()
+        self.assertEqual(self.get_bookings(token).status_code, 401)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTests(TestCase):
+    """/api/sync/ returns only what changed for the caller since their cursor."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+        cls.other = User.objects.create_user(username='other', email='other@example.com', password='password123')
+        cls.listing = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('120'), owner=cls.other
+        )
+
+    def setUp(self):
+        self.client.force_login(self.guest)
+
+    def book(self, user, days_ahead):
+        check_in = date.today() + timedelta(days=days_ahead)
+        return Booking.objects.create(
+            listing=self.listing, user=user, check_in=check_in, check_out=check_in + timedelta(days=2), guests=1
+        )
+
+    def sync(self, since=None):
+        params = {'since': since} if since else {}
+        response = self.client.get('/api/sync/', params, HTTP_HOST='localhost', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_and_deletions_since_cursor(self):
+        self.book(self.guest, 1)
+        cursor = self.sync()['cursor']
+        self.assertEqual(self.sync(cursor)['changes']['bookings'], [])
+
+        booking = self.book(self.guest, 5)
+        self.book(self.other, 9)
+        transition_booking(booking, 'pending_payment')
+        payment = Payment.objects.create(booking=booking, amount=Decimal('240'))
+        result = self.sync(cursor)
+        self.assertEqual([row['id'] for row in result['changes']['bookings']], [booking.pk])
+        self.assertEqual(result['changes']['bookings'][0]['status'], 'pending_payment')
+        self.assertEqual([row['id'] for row in result['changes']['payments']], [payment.pk])
+
+        cursor = result['cursor']
+        booking_id = booking.pk
+        booking.delete()
+        result = self.sync(cursor)
+        self.assertEqual(result['deleted']['bookings'], [booking_id])
+        self.assertEqual(result['deleted']['payments'], [payment.pk])
+        self.assertEqual(self.sync(result['cursor'])['deleted']['bookings'], [])
+
+    def test_expired_cursor_requires_reset(self):
+        self.book(self.guest, 1)
+        stale = f"1.{int(time.time()) - settings.SYNC_RETENTION_DAYS * 86400 - 60}"
+        result = self.sync(stale)
+        self.assertTrue(result['reset'])
+        self.assertEqual(result['changes']['bookings'], [])
+
+    def test_compaction_keeps_latest_entry_per_record(self):
+        booking = self.book(self.guest, 1)
+        for status in ('pending_payment', 'pending', 'cancelled'):
+            transition_booking(booking, status)
+        ChangeLogEntry.objects.create(user=self.guest, model='review', object_id=999, action='delete')
+        ChangeLogEntry.objects.filter(object_id=999).update(
+            created_at=timezone.now() - timedelta(days=settings.SYNC_RETENTION_DAYS + 1)
+        )
+        compact(batch_size=2)
+        self.assertEqual(
+            list(ChangeLogEntry.objects.values_list('model', 'object_id')), [('booking', booking.pk)]
+        )
+
+    def test_late_commit_is_logged(self):
+        with self.assertLogs('listings.changelog', 'WARNING') as logs, \
+                self.captureOnCommitCallbacks(execute=True), \
+                mock.patch('listings.changelog.time.monotonic', side_effect=[100.0, 103.0]):
+            self.book(self.guest, 1)
+        self.assertIn('sync clients may have skipped them', logs.output[0])
+
+
+class StatusEventsTests(TestCase):
+    """Payment and booking transitions reach clients streaming their status."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+        listing = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('120'), owner=cls.user
+        )
+        check_in = date.today() + timedelta(days=1)
+        cls.booking = Booking.objects.create(
+            listing=listing, user=cls.user, check_in=check_in, check_out=check_in + timedelta(days=2),
+            guests=1, status='pending_payment',
+        )
+        cls.payment = Payment.objects.create(booking=cls.booking, amount=Decimal('240'), transaction_id='tx-events')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def stream(self, path):
+        response = self.client.get(path, HTTP_HOST='localhost', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return iter(response.streaming_content)
+
+    def test_settlement_is_published_after_commit(self):
+        subscription = events.subscribe(f'payment:{self.payment.pk}')
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                settle_payment(self.payment, 'completed')
+            self.assertEqual(
+                subscription.get(timeout=1), {'id': self.payment.pk, 'status': 'completed', 'booking': self.booking.pk}
+            )
+        finally:
+            subscription.close()
+
+    def test_stream_sends_snapshot_then_transitions_until_final(self):
+        chunks = self.stream(f'/api/payments/{self.payment.pk}/events/')
+        self.assertTrue(next(chunks).startswith(b'retry:'))
+        self.assertIn(b'"status": "pending"', next(chunks))
+        events.publish(f'payment:{self.payment.pk}', {'id': self.payment.pk, 'status': 'failed'})
+        self.assertEqual(next(chunks), b'event: status\ndata: {"id": %d, "status": "failed"}\n\n' % self.payment.pk)
+        self.assertEqual(list(chunks), [])
+
+    def test_stream_of_settled_booking_closes_after_snapshot(self):
+        Booking.objects.filter(pk=self.booking.pk).update(status='confirmed')
+        chunks = list(self.stream(f'/api/bookings/{self.booking.pk}/events/'))
+        self.assertEqual(len(chunks), 2)
+        self.assertIn(b'"status": "confirmed"', chunks[1])
+
+    @override_settings(SSE_MAX_SYNC_STREAMS=1)
+    def test_sync_streams_are_capped_per_process(self):
+        headers = {'HTTP_HOST': 'localhost', 'HTTP_ACCEPT': 'text/event-stream'}
+        path = f'/api/payments/{self.payment.pk}/events/'
+        first = self.client.get(path, **headers)
+        self.assertEqual(first.status_code, 200)
+        refused = self.client.get(path, **headers)
+        self.assertEqual(refused.status_code, 503)
+        self.assertEqual(refused['Retry-After'], '3')
+        # Closing the response frees its slot, even though it was never read.
+        first.close()
+        self.assertEqual(events.sync_streams.open, 0)
+        second = self.client.get(path, **headers)
+        self.assertEqual(second.status_code, 200)
+        second.close()
+
+    def test_gateway_callback_settles_payment(self):
+        self.client.logout()
+        # Send the confirmation email inline rather than through the broker.
+        app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+        self.addCleanup(app.conf.update, CELERY_TASK_ALWAYS_EAGER=False)
+        with FakeChapaServer() as gateway, override_settings(CHAPA_BASE_URL=gateway.base_url):
+            gateway.transactions['tx-events'] = 'success'
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.get(
+                    '/api/payments/callback/', {'trx_ref': 'tx-events', 'status': 'success'},
+                    HTTP_HOST='localhost', HTTP_ACCEPT='application/json',
+                )
+        self.assertEqual(response.json(), {'payment_status': 'completed'})
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'confirmed')
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class AdminTests(TestCase):
+    """Admin changelists and bulk actions stay cheap on large tables."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser(username='staff', email='staff@example.com', password='password123')
+        cls.listing = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('120'), owner=cls.staff
+        )
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def book(self, count, status='pending'):
+        today = date.today()
+        return Booking.objects.bulk_create(
+            Booking(
+                listing=self.listing, user=self.staff, guests=1, status=status,
+                check_in=today + timedelta(days=3 * i + 1), check_out=today + timedelta(days=3 * i + 2),
+            )
+            for i in range(count)
+        )
+
+    def changelist_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.book(3)
+        for model in ('booking', 'payment', 'review', 'listing'):
+            self.client.get(f'/admin/listings/{model}/', HTTP_HOST='localhost')
+        few = self.changelist_queries('/admin/listings/booking/?status__exact=pending')
+        self.book(30)
+        self.assertEqual(self.changelist_queries('/admin/listings/booking/?status__exact=pending'), few)
+        self.assertEqual(self.client.get('/admin/listings/booking/?q=abc', HTTP_HOST='localhost').status_code, 200)
+
+    def test_bulk_cancel_goes_through_the_state_machine(self):
+        pending, confirmed = self.book(2)
+        Booking.objects.filter(pk=confirmed.pk).update(status='confirmed')
+        payment = Payment.objects.create(booking=pending, amount=Decimal('120'))
+        cancelled = self.book(1, status='cancelled')[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/admin/listings/booking/', {
+                'action': 'cancel_selected', '_selected_action': [pending.pk, confirmed.pk, cancelled.pk],
+            }, HTTP_HOST='localhost')
+        self.assertEqual(set(Booking.objects.values_list('status', flat=True)), {'cancelled'})
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'cancelled')
+        self.assertEqual(ChangeLogEntry.objects.filter(model='booking', object_id=cancelled.pk).count(), 0)
+
+    def test_mark_reconciled_only_touches_completed_payments(self):
+        completed, pending = self.book(2)
+        completed_payment = Payment.objects.create(booking=completed, amount=Decimal('120'), status='completed')
+        pending_payment = Payment.objects.create(booking=pending, amount=Decimal('120'))
+        self.client.post('/admin/listings/payment/', {
+            'action': 'mark_reconciled', '_selected_action': [completed_payment.pk, pending_payment.pk],
+        }, HTTP_HOST='localhost')
+        completed_payment.refresh_from_db()
+        pending_payment.refresh_from_db()
+        self.assertIsNotNone(completed_payment.reconciled_at)
+        self.assertIsNone(pending_payment.reconciled_at)
+
+
+class SimilarListingsTests(TestCase):
+    """Similar listings are precomputed in blocks and served with one query."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+        owner = User.objects.create_user(username='owner', email='owner@example.com', password='password123')
+        cls.listings = [
+            Listing.objects.create(
+                title=title, description='', location=location, price_per_night=Decimal(price), owner=owner
+            )
+            for title, location, price in [
+                ('Marais flat', 'Paris', '120'), ('Bastille flat', 'Paris', '125'), ('Paris palace', 'Paris', '900'),
+                ('Shibuya flat', 'Tokyo', '130'), ('Lyon studio', 'Lyon', '80'),
+            ]
+        ]
+        today = date.today()
+        for days_ahead, listing in enumerate(cls.listings[:2]):
+            Booking.objects.create(
+                listing=listing, user=cls.guest, guests=1,
+                check_in=today + timedelta(days=10 * days_ahead + 1), check_out=today + timedelta(days=10 * days_ahead + 3),
+            )
+
+    def test_blocked_search_matches_brute_force(self):
+        features = recommendations._unit_rows(np.random.default_rng(1).random((50, 8), dtype=np.float32))
+        similarity = features @ features.T
+        np.fill_diagonal(similarity, -np.inf)
+        expected = np.argsort(-similarity, axis=1, kind='stable')[:, :4]
+        found = np.vstack([neighbours for _, neighbours, _ in recommendations.nearest_neighbours(features, 4, 7)])
+        np.testing.assert_array_equal(found, expected)
+
+    def test_similar_endpoint_serves_precomputed_neighbours(self):
+        recommendations.rebuild(k=3, block_size=2)
+        marais = self.listings[0]
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                f'/api/listings/{marais.pk}/similar/', HTTP_HOST='localhost', HTTP_ACCEPT='application/json'
+            )
+        titles = [row['title'] for row in response.json()]
+        self.assertEqual(len(titles), 3)
+        self.assertEqual(titles[0], 'Bastille flat')
+        self.assertNotIn('Marais flat', titles)
+        self.assertEqual(SimilarListing.objects.count(), 3 * len(self.listings))
+
+        missing = self.client.get('/api/listings/999999/similar/', HTTP_HOST='localhost', HTTP_ACCEPT='application/json')
+        self.assertEqual(missing.status_code, 404)
+
+
+class OwnerDashboardTests(TestCase):
+    """The owner dashboard costs the same number of queries for any number of listings."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', email='owner@example.com', password='password123')
+        cls.guest = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+
+    def add_listing(self, bookings=2):
+        listing = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('100'), owner=self.owner
+        )
+        today = date.today()
+        for i in range(bookings):
+            booking = Booking.objects.create(
+                listing=listing, user=self.guest, guests=1, status='confirmed',
+                check_in=today + timedelta(days=3 * i + 1), check_out=today + timedelta(days=3 * i + 3),
+            )
+            Payment.objects.create(booking=booking, amount=Decimal('200'), status='completed')
+        Booking.objects.create(
+            listing=listing, user=self.guest, guests=1, status='cancelled',
+            check_in=today + timedelta(days=40), check_out=today + timedelta(days=42),
+        )
+        Review.objects.create(listing=listing, user=self.guest, rating=4)
+        return listing
+
+    def dashboard(self):
+        response = self.client.get('/api/owners/me/dashboard/', HTTP_HOST='localhost', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_aggregates_per_listing_and_totals(self):
+        listing = self.add_listing(bookings=2)
+        data = self.dashboard()
+        row = data['listings'][0]
+        self.assertEqual(row['id'], listing.pk)
+        self.assertEqual(row['upcoming_count'], 2)
+        self.assertEqual(len(row['upcoming_bookings']), 2)
+        self.assertEqual(row['revenue'], '400.00')
+        self.assertEqual((row['review_count'], row['average_rating']), (1, 4.0))
+        self.assertEqual(data['totals'], {'listings': 1, 'upcoming_bookings': 2, 'revenue': '400.00', 'reviews': 1})
+
+    def test_query_count_is_constant(self):
+        self.add_listing()
+        with CaptureQueriesContext(connection) as one:
+            self.dashboard()
+        cache.clear()
+        for _ in range(5):
+            self.add_listing(bookings=8)
+        with CaptureQueriesContext(connection) as many:
+            data = self.dashboard()
+        self.assertEqual(len(many), len(one))
+        self.assertEqual(len(data['listings']), 6)
+        self.assertEqual(len(data['listings'][-1]['upcoming_bookings']), 5)
+        with self.assertNumQueries(len(one) - 2):
+            self.dashboard()
+
+    def test_other_owners_need_staff(self):
+        response = self.client.get(
+            f'/api/owners/{self.guest.pk}/dashboard/', HTTP_HOST='localhost', HTTP_ACCEPT='application/json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkVerifyPaymentsTests(TestCase):
+    """Staff verify a backlog of payments in one request with concurrent gateway calls."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='password123', is_staff=True
+        )
+        cls.guest = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+        listing = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('120'), owner=cls.staff
+        )
+        today = date.today()
+        cls.payments = []
+        for i in range(12):
+            booking = Booking.objects.create(
+                listing=listing, user=cls.guest, guests=1, status='pending_payment',
+                check_in=today + timedelta(days=3 * i + 1), check_out=today + timedelta(days=3 * i + 3),
+            )
+            cls.payments.append(Payment.objects.create(booking=booking, amount=Decimal('240'), transaction_id=f'tx-{i}'))
+
+    def setUp(self):
+        app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+        self.addCleanup(app.conf.update, CELERY_TASK_ALWAYS_EAGER=False)
+        self.client.force_login(self.staff)
+
+    def verify(self, tx_refs):
+        return self.client.post(
+            '/api/payments/verify_bulk/', {'tx_refs': tx_refs}, content_type='application/json',
+            HTTP_HOST='localhost', HTTP_ACCEPT='application/json',
+        )
+
+    @override_settings(PAYMENT_BULK_VERIFY_CONCURRENCY=4)
+    def test_outcomes_transitions_and_grouped_emails(self):
+        Payment.objects.filter(pk=self.payments[11].pk).update(status='completed')
+        with FakeChapaServer(latency=0.1) as gateway, override_settings(CHAPA_BASE_URL=gateway.base_url):
+            for i in range(10):
+                gateway.transactions[f'tx-{i}'] = 'failed' if i % 5 == 0 else 'success'
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.verify([f'tx-{i}' for i in range(12)] + ['tx-missing'])
+        data = response.json()
+        outcomes = {row['tx_ref']: row['outcome'] for row in data['results']}
+        self.assertEqual(outcomes['tx-0'], 'settled')
+        self.assertEqual(outcomes['tx-10'], 'error')
+        self.assertEqual(outcomes['tx-11'], 'already_processed')
+        self.assertEqual(outcomes['tx-missing'], 'not_found')
+        self.assertEqual(data['counts'], {'settled': 10, 'error': 1, 'already_processed': 1, 'not_found': 1})
+        # One gateway call per payment still pending, up to
+        # PAYMENT_BULK_VERIFY_CONCURRENCY of them at a time.
+        self.assertEqual(gateway.counts['verify'], 11)
+        self.assertGreater(gateway.max_in_flight, 1)
+        self.assertLessEqual(gateway.max_in_flight, 4)
+
+        statuses = dict(Booking.objects.values_list('payment__transaction_id', 'status'))
+        self.assertEqual(statuses['tx-0'], 'cancelled')
+        self.assertEqual(statuses['tx-1'], 'confirmed')
+        self.assertEqual(statuses['tx-10'], 'pending_payment')
+        self.assertEqual(Payment.objects.filter(status='completed').count(), 9)
+        self.assertEqual(len(mail.outbox), 10)
+        self.assertEqual(sum('Payment Failed' in message.subject for message in mail.outbox), 2)
+
+    def test_staff_only_and_validated(self):
+        self.assertEqual(self.verify([]).status_code, 400)
+        self.client.force_login(self.guest)
+        self.assertEqual(self.verify(['tx-0']).status_code, 403)
+
+
+class NotificationTaskTests(TestCase):
+    """Notification emails retry transient errors, then land in FailedTask once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        guest = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+        listing = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('120'), owner=guest
+        )
+        today = date.today()
+        cls.booking = Booking.objects.create(
+            listing=listing, user=guest, guests=1, check_in=today + timedelta(days=1), check_out=today + timedelta(days=3),
+        )
+
+    def send(self, error):
+        with mock.patch('listings.tasks.send_mail', side_effect=error) as send_mail:
+            result = tasks.send_booking_confirmation_email.apply(args=(self.booking.id,), task_id='notify-1')
+        self.assertTrue(result.failed())
+        return send_mail.call_count
+
+    def test_transient_errors_are_retried_then_dead_lettered_once(self):
+        for error in (OSError('connection refused'), SMTPException('try later')):
+            with self.subTest(error=error):
+                FailedTask.objects.all().delete()
+                self.assertEqual(self.send(error), tasks.NotificationTask.max_retries + 1)
+                failed = FailedTask.objects.get()
+                self.assertEqual(failed.task_id, 'notify-1')
+                self.assertEqual(failed.task_name, tasks.send_booking_confirmation_email.name)
+                self.assertEqual(failed.args, [self.booking.id])
+                self.assertEqual(failed.exception, repr(error))
+                self.assertEqual(failed.retries, tasks.NotificationTask.max_retries)
+
+    def test_other_errors_are_dead_lettered_at_once(self):
+        self.assertEqual(self.send(ValueError('bad template')), 1)
+        failed = FailedTask.objects.get()
+        self.assertEqual((failed.exception, failed.retries), ("ValueError('bad template')", 0))
+
+    def test_results_are_ignored(self):
+        for task in (
+            tasks.send_booking_confirmation_email, tasks.send_payment_confirmation_email,
+            tasks.send_payment_failure_email, tasks.send_payment_result_emails,
+        ):
+            self.assertTrue(task.ignore_result, task.name)
+
+
+class BookingOverlapTests(TestCase):
+    """A listing can't be booked twice for the same night, whichever overlap control is configured."""
+
+    @classmethod
+    def setUpTestData(cls):
+        host = User.objects.create_user(username='host', email='host@example.com', password='password123')
+        cls.guest = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+        cls.listing = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('120'), owner=host
+        )
+        cls.check_in = date.today() + timedelta(days=10)
+        Booking.objects.create(
+            listing=cls.listing, user=host, guests=1, status='confirmed',
+            check_in=cls.check_in, check_out=cls.check_in + timedelta(days=3),
+        )
+
+    def setUp(self):
+        app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+        self.addCleanup(app.conf.update, CELERY_TASK_ALWAYS_EAGER=False)
+        self.client.force_login(self.guest)
+
+    def book(self, first_night, nights):
+        return self.client.post('/api/bookings/', {
+            'listing': self.listing.pk,
+            'check_in': (self.check_in + timedelta(days=first_night)).isoformat(),
+            'check_out': (self.check_in + timedelta(days=first_night + nights)).isoformat(),
+            'guests': 1,
+        }, content_type='application/json', HTTP_HOST='localhost', HTTP_ACCEPT='application/json')
+
+    def test_overlapping_stays_conflict(self):
+        for strategy in ('lock', 'check'):
+            with self.subTest(strategy=strategy), override_settings(BOOKING_OVERLAP_CONTROL=strategy):
+                response = self.book(2, 2)
+                self.assertEqual(response.status_code, 409)
+                self.assertEqual(response.json()['detail'], 'The listing is already booked for some of these nights.')
+        self.assertEqual(Booking.objects.filter(user=self.guest).count(), 0)
+
+    def test_adjacent_and_cancelled_stays_are_free(self):
+        self.assertEqual(self.book(3, 2).status_code, 201)
+        Booking.objects.filter(user__username='host').update(status='cancelled')
+        self.assertEqual(self.book(0, 3).status_code, 201)
+
+    def test_check_out_after_check_in(self):
+        self.assertEqual(self.book(20, 0).status_code, 400)
+        self.assertEqual(self.book(20, -1).status_code, 400)
+
+    def test_overlap_is_recognised_by_constraint_name(self):
+        def violation(constraint):
+            cause = Exception('conflicting key value violates exclusion constraint')
+            cause.diag = SimpleNamespace(constraint_name=constraint)
+            exc = IntegrityError(str(cause))
+            exc.__cause__ = cause
+            return exc
+
+        with mock.patch.object(BookingSerializer, 'save', side_effect=violation(Booking.OVERLAP_CONSTRAINT)):
+            self.assertEqual(self.book(20, 2).status_code, 409)
+        with mock.patch.object(BookingSerializer, 'save', side_effect=violation('some_other_constraint')), \
+                self.assertRaises(IntegrityError):
+            self.book(20, 2)
+
+    def test_failed_lock_wait_is_retryable(self):
+        with mock.patch('listings.views.stay_taken', side_effect=OperationalError('database is locked')):
+            response = self.book(20, 2)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        with mock.patch('listings.views.stay_taken', side_effect=OperationalError('disk I/O error')), \
+                self.assertRaises(OperationalError):
+            self.book(20, 2)
+
+
+class ConstraintValidationTests(TestCase):
+    """Rows the database constraints would reject are a 400, and migrations name existing offenders."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+        cls.listing = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('120'), owner=cls.user
+        )
+
+    def test_out_of_range_rating_is_rejected(self):
+        self.client.force_login(self.user)
+        for rating in (0, 6):
+            response = self.client.post(
+                '/api/reviews/', {'listing': self.listing.pk, 'rating': rating, 'comment': ''},
+                content_type='application/json', HTTP_HOST='localhost', HTTP_ACCEPT='application/json',
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('rating', response.json())
+        self.assertFalse(Review.objects.exists())
+
+    def test_explain_hot_queries_runs(self):
+        check_in = date.today() + timedelta(days=3)
+        Booking.objects.create(
+            listing=self.listing, user=self.user, guests=1, check_in=check_in, check_out=check_in + timedelta(days=2)
+        )
+        out = StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        self.assertIn('ListingViewSet.list', out.getvalue())
+        self.assertIn('Booking overlap check', out.getvalue())
+
+    def test_overlap_migration_names_overlapping_bookings(self):
+        from django.apps import apps
+        migration = importlib.import_module('listings.migrations.0003_booking_overlap_exclusion')
+        check_in = date(2026, 7, 12)
+
+        def book(first_night, nights):
+            return Booking.objects.create(
+                listing=self.listing, user=self.user, guests=1,
+                check_in=check_in + timedelta(days=first_night),
+                check_out=check_in + timedelta(days=first_night + nights),
+            )
+
+        book(0, 3)
+        adjacent, overlapping = book(3, 2), book(4, 2)
+        self.assertEqual(
+            migration.overlapping_bookings(apps.get_model('listings', 'Booking')),
+            [(adjacent.pk, overlapping.pk, self.listing.pk)],
+        )
+
+
+class LegacyDataMigrationTests(TestCase):
+    """Data migrations give bookings created before booking statuses existed the right status."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+        cls.listing = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('120'), owner=cls.user
+        )
+
+    def legacy_booking(self, days_ahead, payment_status=None):
+        """A booking as 0004 left it before its backfill: 'pending', with no hold."""
+        check_in = date.today() + timedelta(days=days_ahead)
+        booking = Booking.objects.create(
+            listing=self.listing, user=self.user, guests=1, check_in=check_in, check_out=check_in + timedelta(days=2)
+        )
+        Booking.objects.filter(pk=booking.pk).update(status='pending', expires_at=None)
+        if payment_status:
+            Payment.objects.create(booking=booking, amount=Decimal('240'), status=payment_status)
+        return booking
+
+    def migrate(self, name, function):
+        from django.apps import apps
+        getattr(importlib.import_module(f'listings.migrations.{name}'), function)(apps, None)
+
+    def statuses(self):
+        return dict(Booking.objects.values_list('pk', 'status'))
+
+    def test_status_is_derived_from_the_payment(self):
+        unpaid = self.legacy_booking(1)
+        paid = self.legacy_booking(5, 'completed')
+        paying = self.legacy_booking(9, 'pending')
+        declined = self.legacy_booking(13, 'failed')
+        self.migrate('0004_booking_status', 'derive_status_from_payments')
+        self.assertEqual(self.statuses(), {
+            unpaid.pk: 'pending', paid.pk: 'confirmed', paying.pk: 'pending_payment', declined.pk: 'cancelled',
+        })
+
+    def test_paid_legacy_booking_never_gets_a_hold(self):
+        unpaid = self.legacy_booking(1)
+        paid = self.legacy_booking(5, 'completed')
+        paying = self.legacy_booking(9, 'pending')
+        self.migrate('0004_booking_status', 'derive_status_from_payments')
+        self.migrate('0007_booking_hold_expiry', 'start_existing_holds')
+        holds = dict(Booking.objects.values_list('pk', 'expires_at'))
+        self.assertIsNone(holds[paid.pk])
+        self.assertIsNotNone(holds[unpaid.pk])
+        self.assertIsNotNone(holds[paying.pk])
+
+        expire_holds(now=timezone.now() + timedelta(minutes=settings.BOOKING_PAYMENT_HOLD_MINUTES + 5))
+        self.assertEqual(self.statuses(), {unpaid.pk: 'cancelled', paid.pk: 'confirmed', paying.pk: 'cancelled'})
+        self.assertEqual(Payment.objects.get(booking=paid).status, 'completed')
+
+
+@override_settings(
+    DATABASE_ROUTERS=['alx_travel_app.db_router.PrimaryReplicaRouter'],
+    MIDDLEWARE=['alx_travel_app.db_router.ReplicaRoutingMiddleware', *settings.MIDDLEWARE],
+)
+class ReplicaRoutingTests(TestCase):
+    """Safe requests read a lagging replica, except from clients that just wrote."""
+
+    replica = 'replica_lagging'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # A second SQLite file with the schema but none of the primary's rows,
+        # added after TestCase has set up its per-alias query guards.
+        cls.replica_file = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False)
+        connections.settings[cls.replica] = {**connections['default'].settings_dict, 'NAME': cls.replica_file.name}
+        cls.databases = {*cls.databases, cls.replica}
+        with connections[cls.replica].schema_editor() as editor:
+            editor.create_model(User)
+            editor.create_model(Listing)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[cls.replica].close()
+        del connections[cls.replica]
+        del connections.settings[cls.replica]
+        os.unlink(cls.replica_file.name)
+        cls.databases = cls.databases - {cls.replica}
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='host', email='host@example.com', password='password123')
+
+    def titles(self, client, **headers):
+        response = client.get('/api/listings/', HTTP_HOST='localhost', HTTP_ACCEPT='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        return [listing['title'] for listing in response.json()]
+
+    def create_listing(self, client, title, **headers):
+        response = client.post('/api/listings/', {
+            'title': title, 'description': 'Flat', 'location': 'Paris', 'price_per_night': '120',
+        }, content_type='application/json', HTTP_HOST='localhost', HTTP_ACCEPT='application/json', **headers)
+        self.assertEqual(response.status_code, 201)
+
+    def test_reads_go_to_the_replica(self):
+        Listing.objects.create(title='Paris flat', description='', location='Paris', price_per_night=1, owner=self.user)
+        self.assertEqual(self.titles(Client()), [])
+
+    def test_cookie_client_reads_its_write(self):
+        self.client.force_login(self.user)
+        self.create_listing(self.client, 'Paris flat')
+        self.assertEqual(self.titles(self.client), ['Paris flat'])
+        self.assertEqual(self.titles(Client()), [])
+
+    def test_bearer_client_reads_its_write(self):
+        token, _ = issue_token(self.user)
+        bearer = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+        self.create_listing(Client(), 'Paris flat', **bearer)
+        # A fresh client, as bearer clients don't keep the pin cookie.
+        self.assertEqual(self.titles(Client(), **bearer), ['Paris flat'])
+        self.assertEqual(self.titles(Client()), [])
+
+
+class PaymentRaceTests(TestCase):
+    """
+    Overlapping payment requests for one booking. The second request is
+    issued while the first is waiting on the gateway, as a concurrent
+    request would be.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user(username='guest', email='guest@example.com', password='password123')
+        listing = Listing.objects.create(
+            title='Paris flat', description='', location='Paris', price_per_night=Decimal('120'), owner=cls.guest
+        )
+        check_in = date.today() + timedelta(days=10)
+        cls.booking = Booking.objects.create(
+            listing=listing, user=cls.guest, guests=1, check_in=check_in, check_out=check_in + timedelta(days=2)
+        )
+
+    def setUp(self):
+        app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+        self.addCleanup(app.conf.update, CELERY_TASK_ALWAYS_EAGER=False)
+        self.client.force_login(self.guest)
+        # Initiation is throttled to a few per minute; start every test with full buckets.
+        patcher = mock.patch.object(throttling, '_store', throttling.LocalBucketStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.gateway = FakeChapaServer().start()
+        self.addCleanup(self.gateway.stop)
+        overrides = override_settings(CHAPA_BASE_URL=self.gateway.base_url)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def post(self, path, data=None):
+        return self.client.post(
+            path, data or {}, content_type='application/json', HTTP_HOST='localhost', HTTP_ACCEPT='application/json'
+        )
+
+    def initiate(self):
+        return self.post(f'/api/bookings/{self.booking.pk}/initiate_payment/')
+
+    def verify(self, tx_ref):
+        return self.post('/api/payments/verify_payment/', {'tx_ref': tx_ref})
+
+    def overlap(self, target, real, request):
+        """
+        Patch `target` so the first call makes `request` before calling
+        `real`. Returns the list the overlapping response is added to.
+        """
+        responses = []
+
+        def overlapped(*args, **kwargs):
+            if not hasattr(overlapped, 'started'):
+                overlapped.started = True
+                responses.append(request())
+            return real(*args, **kwargs)
+
+        patcher = mock.patch(target, overlapped)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return responses
+
+    def test_double_initiation_reaches_the_gateway_once(self):
+        overlapping = self.overlap('listings.views.requests.post', requests.post, self.initiate)
+        self.assertEqual(self.initiate().status_code, 201)
+        self.assertEqual(overlapping[0].status_code, 409)
+        self.assertEqual(self.gateway.counts['initialize'], 1)
+        self.assertEqual(Payment.objects.filter(booking=self.booking).count(), 1)
+
+    def test_concurrent_verification_sends_one_email(self):
+        tx_ref = self.initiate().json()['transaction_reference']
+        from . import views
+        overlapping = self.overlap('listings.views.chapa_verify', views.chapa_verify, lambda: self.verify(tx_ref))
+        response = self.verify(tx_ref)
+        for result in (response, overlapping[0]):
+            self.assertEqual(result.status_code, 200)
+            self.assertEqual(result.json()['payment_status'], 'completed')
+        self.assertEqual(self.gateway.counts['verify'], 2)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'confirmed')
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_any_initiation_failure_releases_the_claim(self):
+        with mock.patch.object(self.gateway, 'initialize', lambda payload: (200, {'status': 'success', 'data': {}})):
+            self.assertEqual(self.initiate().status_code, 500)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'pending')
+
+        stale = Payment.objects.create(booking=self.booking, amount=Decimal('240'), transaction_id='old', status='failed')
+        self.assertEqual(self.initiate().status_code, 500)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'pending')
+
+        stale.delete()
+        self.assertEqual(self.initiate().status_code, 201)
+
+    def test_status_cannot_be_written_through_the_api(self):
+        tx_ref = self.initiate().json()['transaction_reference']
+        payment = Payment.objects.get(transaction_id=tx_ref)
+        response = self.client.patch(
+            f'/api/payments/{payment.pk}/', {'status': 'completed'},
+            content_type='application/json', HTTP_HOST='localhost', HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.json()['status'], 'pending')
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+    def test_payment_completed_after_its_hold_expired_is_flagged_for_refund(self):
+        tx_ref = self.initiate().json()['transaction_reference']
+        later = timezone.now() + timedelta(minutes=settings.BOOKING_PAYMENT_HOLD_MINUTES + 5)
+        self.assertEqual(expire_holds(now=later), 1)
+
+        # The guest finished checkout anyway; Chapa reports the charge.
+        response = self.verify(tx_ref)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['payment_status'], 'refund_due')
+        self.assertEqual(response.json()['booking_status'], 'cancelled')
+        callback = self.client.get(f'/api/payments/callback/?trx_ref={tx_ref}', HTTP_ACCEPT='application/json')
+        self.assertEqual(callback.json()['payment_status'], 'refund_due')
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'cancelled')
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_declined_payment_of_an_expired_hold_stays_cancelled(self):
+        tx_ref = self.initiate().json()['transaction_reference']
+        self.gateway.transactions[tx_ref] = 'failed'
+        expire_holds(now=timezone.now() + timedelta(minutes=settings.BOOKING_PAYMENT_HOLD_MINUTES + 5))
+        response = self.client.get(f'/api/payments/callback/?trx_ref={tx_ref}', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['payment_status'], 'cancelled')
+        self.assertEqual(self.verify(tx_ref).json()['payment_status'], 'cancelled')
+        self.assertEqual(Payment.objects.get(transaction_id=tx_ref).status, 'cancelled')
+
+    def test_retried_initiation_cannot_hold_past_the_maximum(self):
+        created_at = timezone.now() - timedelta(minutes=settings.BOOKING_HOLD_MAX_MINUTES + 5)
+        Booking.objects.filter(pk=self.booking.pk).update(created_at=created_at)
+        with mock.patch.object(self.gateway, 'initialize', lambda payload: (500, {'message': 'unavailable'})):
+            self.assertEqual(self.initiate().status_code, 400)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'pending')
+        self.assertLessEqual(self.booking.expires_at, timezone.now())
+
+        # The retry is refused before reaching the gateway.
+        self.assertEqual(self.initiate().status_code, 409)
+        self.assertEqual(self.gateway.counts['initialize'], 1)
+
+
+class ResponseFormatTests(TestCase):
+    """Content negotiation between JSON and MessagePack, and API response compression."""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(username='host', email='host@example.com', password='password123')
+        for i in range(5):
+            Listing.objects.create(
+                title=f'Flat {i}', description='Bright flat near the river', location='Paris',
+                price_per_night=Decimal('120.50'), owner=owner,
+            )
+
+    def get(self, path='/api/listings/', **headers):
+        return self.client.get(path, HTTP_HOST='localhost', **headers)
+
+    def test_msgpack_is_negotiated(self):
+        expected = self.get(HTTP_ACCEPT='application/json').json()
+        for response in (self.get(HTTP_ACCEPT='application/msgpack'), self.get('/api/listings/?format=msgpack')):
+            self.assertEqual(response['Content-Type'], 'application/msgpack')
+            self.assertEqual(msgpack.unpackb(response.content), expected)
+        self.assertEqual(self.get(HTTP_ACCEPT='application/xml').status_code, 406)
+
+    def test_responses_are_compressed_for_the_client(self):
+        expected = self.get(HTTP_ACCEPT='application/json').content
+        response = self.get(HTTP_ACCEPT='application/json', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), expected)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response = self.get(HTTP_ACCEPT='application/json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), expected)
+
+    def test_token_responses_are_not_compressed(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .middleware import APICompressionMiddleware
+
+        body = b'{"token": "' + b'x' * 500 + b'"}'
+        middleware = APICompressionMiddleware(lambda request: HttpResponse(body, content_type='application/json'))
+        for encoding in ('br', 'gzip'):
+            for path, compressed in (('/api/auth/token/', False), ('/api/listings/', True)):
+                request = RequestFactory().post(path, HTTP_ACCEPT_ENCODING=encoding)
+                response = middleware(request)
+                self.assertEqual(response.has_header('Content-Encoding'), compressed, (encoding, path))
+
+
+class OpenAPISchemaTests(TestCase):
+    """/openapi.json serves the prebuilt document with an ETag and a gzip variant."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.content = b'{"swagger": "2.0", "paths": {}}'
+        path = os.path.join(directory.name, 'openapi.json')
+        with open(path, 'wb') as schema_file:
+            schema_file.write(self.content)
+        self.enterContext(override_settings(OPENAPI_SCHEMA_FILE=path))
+        # The schema is loaded once per process; load this one.
+        self.enterContext(mock.patch.object(docs, '_schema', None))
+
+    def get(self, **headers):
+        return self.client.get('/openapi.json', HTTP_HOST='localhost', **headers)
+
+    def test_served_with_an_etag_and_revalidated(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.content)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        etag = response['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_gzip_only_when_accepted(self):
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.content)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        for encoding in ('identity', 'deflate'):
+            response = self.get(HTTP_ACCEPT_ENCODING=encoding)
+            self.assertFalse(response.has_header('Content-Encoding'), encoding)
+            self.assertEqual(response.content, self.content)
+
+
+class StartupTests(TestCase):
+    """Worker warm-up and the startup profiler's import-time parsing."""
+
+    def test_warm_up_survives_a_failing_step(self):
+        def broken():
+            raise RuntimeError('no schema')
+
+        steps = [('broken', broken), ('url resolver', warmup.warm_url_resolver)]
+        with mock.patch.object(warmup, 'WARMERS', steps), self.assertLogs('alx_travel_app.warmup') as logs:
+            timings = warmup.warm_up()
+        self.assertEqual(list(timings), ['url resolver'])
+        failure = next(record for record in logs.records if record.levelname == 'ERROR')
+        self.assertEqual(failure.getMessage(), "Warm-up step 'broken' failed")
+        self.assertIsNotNone(failure.exc_info)
+
+    def test_import_times_are_aggregated_by_top_level_package(self):
+        stderr = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:        80 |         80 |   _io",
+            "import time:       300 |       1200 | django",
+            "import time:       150 |        400 |   django.utils",
+            "import time:       100 |        500 | django.db",
+            "import time:        90 |       3000 | rest_framework",
+            "import time:        40 |         40 | json",
+            "Traceback: not an import line",
+        ])
+        imports_us = profile_startup.parse_importtime(stderr)
+        self.assertEqual(imports_us, {'django': 1700, 'rest_framework': 3000, 'json': 40})
+        self.assertEqual(
+            profile_startup.top_packages(imports_us, 2), [('rest_framework', 3000), ('django', 1700)]
+        )
+
+
+# Failed logins still hash the password; keep that cheap.
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ThrottlingTests(TestCase):
+    """GCRA buckets, rate scopes, Retry-After, metrics, and failing open when the store is down."""
+
+    def setUp(self):
+        patcher = mock.patch.object(throttling, '_store', throttling.LocalBucketStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        throttling.metrics.reset()
+        self.addCleanup(throttling.metrics.reset)
+
+    def test_gcra_matches_a_token_bucket(self):
+        store = throttling.LocalBucketStore()
+        # 5/min: a burst of 5, then one more every 12 seconds.
+        interval, burst = 12.0, 60.0
+        self.assertEqual([store.consume('k', 0, interval, burst) for _ in range(5)], [0.0] * 5)
+        self.assertEqual(store.consume('k', 0, interval, burst), 12.0)
+        self.assertEqual(store.consume('k', 5, interval, burst), 7.0)
+        self.assertEqual(store.consume('k', 12, interval, burst), 0.0)
+        self.assertEqual(store.consume('k', 12, interval, burst), 12.0)
+        # A full minute idle refills the whole burst, and no more.
+        self.assertEqual([store.consume('k', 200, interval, burst) for _ in range(6)][-2:], [0.0, 12.0])
+        self.assertEqual(store.consume('other', 0, interval, burst), 0.0)
+
+    def test_scope_lookup(self):
+        throttle = throttling.TokenBucketThrottle()
+        rates = {'booking.create': '1/s', 'booking': '2/s', 'default': '3/s'}
+
+        def view(basename, action, **attrs):
+            return mock.Mock(spec=['basename', 'action', *attrs], basename=basename, action=action, **attrs)
+
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            self.assertEqual(throttle.get_scope_and_rate(view('booking', 'create')), ('booking.create', '1/s'))
+            self.assertEqual(throttle.get_scope_and_rate(view('booking', 'list')), ('booking', '2/s'))
+            self.assertEqual(throttle.get_scope_and_rate(view('listing', 'list')), ('default', '3/s'))
+            self.assertEqual(
+                throttle.get_scope_and_rate(view('listing', 'list', throttle_rates={'list': '4/s'})),
+                ('listing.list', '4/s'),
+            )
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}):
+            self.assertEqual(throttle.get_scope_and_rate(view('listing', 'list')), (None, None))
+        self.assertEqual(throttle.parse_rate('30/min'), (30, 60))
+        self.assertEqual(throttle.parse_rate('1000/day'), (1000, 86400))
+
+    def request_token(self):
+        return self.client.post(
+            '/api/auth/token/', {'username': 'nobody', 'password': 'wrong'},
+            content_type='application/json', HTTP_HOST='localhost', HTTP_ACCEPT='application/json',
+        )
+
+    @mock.patch.object(throttling.TokenBucketThrottle, 'timer', lambda self: 1000.0)
+    def test_retry_after_and_metrics(self):
+        rate = settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['auth-token.create']
+        limit, duration = throttling.TokenBucketThrottle().parse_rate(rate)
+        statuses = [self.request_token().status_code for _ in range(limit)]
+        self.assertNotIn(429, statuses)
+        response = self.request_token()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(math.ceil(duration / limit)))
+        self.assertEqual(throttling.metrics.snapshot(), {
+            ('auth-token.create', 'allowed'): limit, ('auth-token.create', 'throttled'): 1,
+        })
+
+    def test_store_errors_fail_open(self):
+        failing = mock.Mock(consume=mock.Mock(side_effect=ConnectionError('store down')))
+        with mock.patch.object(throttling, '_store', failing), self.assertLogs('listings.throttling', 'WARNING'):
+            for _ in range(20):
+                self.assertEqual(self.request_token().status_code, 400)
+        self.assertEqual(throttling.metrics.snapshot(), {('auth-token.create', 'failed_open'): 20})
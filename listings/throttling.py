@@ -0,0 +1,199 @@
+"""
+Token-bucket throttling for the listings API.
+
+Rates are DRF-style strings (``'5/min'``) looked up per ViewSet action in
+``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`` using the scope
+``'<basename>.<action>'``, then ``'<basename>'``, then ``'default'``. A ViewSet
+can also override rates with a ``throttle_rates`` dict keyed by action.
+
+Each bucket is stored as a single "theoretical arrival time" (GCRA), which
+behaves exactly like a token bucket of ``num_requests`` tokens refilled at
+``num_requests / duration`` per second, so a check is one O(1) read-modify-
+write. With a Redis cache backend that step runs as a Lua script and is
+atomic across processes; with any other backend buckets live in process
+memory behind a lock, so each process grants the full rate and a client can
+get the configured rates times the number of workers. ``manage.py check
+--deploy`` warns about that.
+
+If the bucket store fails (e.g. Redis is down) requests are let through
+and counted as ``failed_open`` in ``metrics``, rather than failing the API.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+try:
+    from redis.exceptions import RedisError
+except ImportError:  # pragma: no cover - redis is optional
+    RedisError = OSError
+
+# What a failing bucket store raises; connection and timeout errors included.
+STORE_ERRORS = (RedisError, OSError)
+
+logger = logging.getLogger(__name__)
+
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local wait = new_tat - burst - now
+if wait > 0 then return tostring(wait) end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(burst * 1000))
+return '0'
+"""
+
+
+class ThrottleMetrics:
+    """
+    In-process counters of requests per (scope, outcome), where outcome is
+    'allowed', 'throttled' or 'failed_open' (let through because the bucket
+    store failed).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, scope, outcome):
+        with self._lock:
+            self._counts[(scope, outcome)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+metrics = ThrottleMetrics()
+
+
+class LocalBucketStore:
+    """Process-local GCRA buckets, used when no Redis cache is configured."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tats = {}
+
+    def consume(self, key, now, interval, burst):
+        with self._lock:
+            tat = max(self._tats.get(key, now), now)
+            new_tat = tat + interval
+            wait = new_tat - burst - now
+            if wait > 0:
+                return wait
+            self._tats[key] = new_tat
+            # Drop buckets that have fully refilled so memory stays bounded.
+            if len(self._tats) > 10000:
+                self._tats = {k: v for k, v in self._tats.items() if v > now}
+            return 0.0
+
+
+class RedisBucketStore:
+    """GCRA buckets in Redis, updated atomically by a Lua script."""
+
+    def __init__(self, client):
+        self._script = client.register_script(GCRA_SCRIPT)
+
+    def consume(self, key, now, interval, burst):
+        return float(self._script(keys=[key], args=[now, interval, burst]))
+
+
+def _redis_client(backend):
+    """Return a raw redis client for Django's or django-redis' cache backend, if any."""
+    if hasattr(backend, '_cache') and hasattr(backend._cache, 'get_client'):
+        return backend._cache.get_client(None, write=True)
+    client = getattr(backend, 'client', None)
+    if client is not None and hasattr(client, 'get_client'):
+        return client.get_client(write=True)
+    return None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bucket_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                client = None
+                try:
+                    client = _redis_client(cache)
+                except Exception:
+                    logger.warning("Could not get a Redis client for throttling; using local buckets")
+                if client is not None:
+                    _store = RedisBucketStore(client)
+                else:
+                    logger.warning(
+                        "Throttle buckets are per process; set CACHE_URL to a Redis cache to share them "
+                        "between workers"
+                    )
+                    _store = LocalBucketStore()
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Per-user (or per-IP for anonymous clients) token bucket per ViewSet action."""
+
+    cache_format = 'throttle_bucket:%(scope)s:%(ident)s'
+    timer = time.time
+
+    def get_scope_and_rate(self, view):
+        basename = getattr(view, 'basename', None) or view.__class__.__name__
+        action = getattr(view, 'action', None) or view.request.method.lower()
+        view_rates = getattr(view, 'throttle_rates', {})
+        if action in view_rates:
+            return f'{basename}.{action}', view_rates[action]
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        for scope in (f'{basename}.{action}', basename, 'default'):
+            if scope in rates:
+                return scope, rates[scope]
+        return None, None
+
+    def parse_rate(self, rate):
+        num, period = rate.split('/')
+        duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+        return int(num), duration
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope, rate = self.get_scope_and_rate(view)
+        if rate is None:
+            return True
+
+        num_requests, duration = self.parse_rate(rate)
+        interval = duration / num_requests
+        burst = interval * num_requests
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        key = self.cache_format % {'scope': scope, 'ident': ident}
+
+        try:
+            wait = get_bucket_store().consume(key, self.timer(), interval, burst)
+        except STORE_ERRORS:
+            logger.warning("Throttle store unavailable; letting %s through on %s", ident, scope, exc_info=True)
+            metrics.record(scope, 'failed_open')
+            return True
+        allowed = wait <= 0
+        metrics.record(scope, 'allowed' if allowed else 'throttled')
+        if not allowed:
+            self.wait_seconds = wait
+            logger.info("Throttled %s on %s for %.1fs", ident, scope, wait)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
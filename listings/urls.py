@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ListingViewSet, BookingViewSet, ReviewViewSet, PaymentViewSet
+from .views import ListingViewSet, BookingViewSet, ReviewViewSet, PaymentViewSet, AuthTokenViewSet, SyncViewSet, OwnerViewSet
 
 # Create a router and register our viewsets with it
 router = DefaultRouter()
@@ -8,6 +8,9 @@ router.register(r'listings', ListingViewSet, basename='listing')
 router.register(r'bookings', BookingViewSet, basename='booking')
 router.register(r'payments', PaymentViewSet, basename='payment')
 router.register(r'reviews', ReviewViewSet, basename='review')
+router.register(r'auth/token', AuthTokenViewSet, basename='auth-token')
+router.register(r'sync', SyncViewSet, basename='sync')
+router.register(r'owners', OwnerViewSet, basename='owner')
 
 # The API URLs are now determined automatically by the router
 urlpatterns = [
@@ -1,26 +1,223 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
-from django.contrib.auth import get_user_model
+from django.contrib.auth import authenticate, get_user_model
 from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
 from django.core.mail import send_mail
+import logging
+import math
 import requests
+import time
 import uuid
-from .models import Listing, Booking, Review, Payment
-from .serializers import ListingSerializer, BookingSerializer, ReviewSerializer, PaymentSerializer
-from .tasks import send_payment_confirmation_email, send_booking_confirmation_email
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from .authentication import SignedTokenAuthentication, issue_token, revoke_token, revoke_user_tokens
+from . import changelog
+from .availability import filter_available, stay_taken
+from .dashboard import cached_owner_dashboard
+from .fast_serializers import ValuesSerializer
+from .models import Listing, Booking, Review, Payment, ArchivedBooking, ArchivedPayment
+from .events import TooManyStreams, event_stream
+from .renderers import EventStreamRenderer, api_renderer_classes
+from .serializers import (
+    ListingSerializer, BookingSerializer, ReviewSerializer, PaymentSerializer,
+    ArchivedBookingSerializer, ArchivedPaymentSerializer,
+)
+from .state_machine import (
+    booking_event, payment_event, settle_payment, settle_payments, transition_booking, transition_payment,
+)
+from .tasks import (
+    send_payment_confirmation_email, send_payment_failure_email, send_payment_result_emails,
+    send_booking_confirmation_email,
+)
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
-class ListingViewSet(viewsets.ModelViewSet):
+def chapa_verify(tx_ref, http=requests):
+    """
+    Ask Chapa for the result of `tx_ref`, through `http` (the requests
+    module or a Session). Returns (payment_status, error): 'completed',
+    'failed' or 'pending', and the gateway's error details if it didn't
+    answer with 200.
+    """
+    response = http.get(
+        f'{settings.CHAPA_BASE_URL}/transaction/verify/{tx_ref}',
+        headers={
+            'Authorization': f'Bearer {settings.CHAPA_SECRET_KEY}',
+            'Content-Type': 'application/json'
+        },
+        timeout=settings.CHAPA_TIMEOUT
+    )
+    if response.status_code != 200:
+        return None, response.json() if response.content else 'No response from payment gateway'
+
+    chapa_response = response.json()
+    if chapa_response['status'] == 'success' and chapa_response['data']['status'] == 'success':
+        return 'completed', None
+    if chapa_response['data']['status'] == 'failed':
+        return 'failed', None
+    return 'pending', None
+
+
+def settle_with_gateway(payment):
+    """
+    Verify a pending or cancelled `payment` with Chapa and apply the result.
+    A pending payment is settled; only the caller that settles it sends the
+    email. A cancelled one (e.g. its booking's hold expired during checkout)
+    that the gateway reports paid becomes 'refund_due', so the charge is
+    recorded for a refund. Returns the same (payment_status, error) as
+    chapa_verify.
+    """
+    payment_status, error = chapa_verify(payment.transaction_id)
+    if payment.status == 'cancelled':
+        if payment_status == 'completed' and transition_payment(payment, 'refund_due', from_statuses=['cancelled']):
+            logger.warning("Payment %s was completed after it was cancelled; refund due", payment.pk)
+        return payment_status, error
+    if payment_status == 'completed':
+        if settle_payment(payment, 'completed'):
+            send_payment_confirmation_email.delay(payment.id)
+    elif payment_status == 'failed':
+        if settle_payment(payment, 'failed'):
+            send_payment_failure_email.delay(payment.id)
+    return payment_status, error
+
+
+class BookingConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The listing is already booked for some of these nights.'
+    default_code = 'booking_conflict'
+
+
+class BookingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The listing is busy with other bookings; please retry.'
+    default_code = 'booking_busy'
+    # Sent as Retry-After.
+    wait = 1
+
+
+# SQLSTATEs of PostgreSQL lock failures: lock_not_available,
+# deadlock_detected and serialization_failure.
+LOCK_FAILURE_SQLSTATES = {'55P03', '40P01', '40001'}
+
+
+def _driver_error(exc):
+    """The database driver's exception behind a Django database error."""
+    return exc.__cause__ or exc
+
+
+def constraint_name(exc):
+    """The constraint an IntegrityError violated, if the driver reports it."""
+    diag = getattr(_driver_error(exc), 'diag', None)
+    return getattr(diag, 'constraint_name', None)
+
+
+def is_lock_failure(exc):
+    """True if an OperationalError means a lock wait failed, not a broken database."""
+    driver_error = _driver_error(exc)
+    sqlstate = getattr(driver_error, 'sqlstate', None) or getattr(driver_error, 'pgcode', None)
+    return sqlstate in LOCK_FAILURE_SQLSTATES or 'database is locked' in str(exc)
+
+
+class FastListMixin:
+    """
+    Serve list responses through ValuesSerializer, skipping per-instance
+    ModelSerializer work. Falls back to the regular serializer when it can't
+    be compiled.
+    """
+
+    def serialize_list(self, queryset, serializer_class=None):
+        serializer_class = serializer_class or self.get_serializer_class()
+        fast = ValuesSerializer.for_serializer(serializer_class)
+        if fast is None:
+            return serializer_class(queryset, many=True, context=self.get_serializer_context()).data
+        return fast.serialize(queryset)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_list(page))
+        return Response(self.serialize_list(queryset))
+
+class ArchiveReadMixin:
+    """
+    Let staff read archived rows through the live endpoints: `?archived=true`
+    lists or retrieves from the archive, and retrieving an id that is no
+    longer live falls back to it. Writes only ever see live rows.
+    `get_queryset` must return `archive_queryset` while `reading_archive`.
+    """
+    archive_queryset = None
+    archive_serializer_class = None
+    reading_archive = False
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.reading_archive = (
+            self.action in ('list', 'retrieve')
+            and request.user.is_staff
+            and request.query_params.get('archived') in ('1', 'true')
+        )
+
+    def get_serializer_class(self):
+        if self.reading_archive:
+            return self.archive_serializer_class
+        return super().get_serializer_class()
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            if self.reading_archive or not request.user.is_staff:
+                raise
+            self.reading_archive = True
+            return super().retrieve(request, *args, **kwargs)
+
+class ListingViewSet(FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing listings.
     Provides CRUD operations for Listing model.
     """
     queryset = Listing.objects.all()
     serializer_class = ListingSerializer
+    renderer_classes = api_renderer_classes()
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
+    def get_queryset(self):
+        """
+        Listings, optionally narrowed for search by `location`, `min_price`,
+        `max_price` and availability for a `check_in`..`check_out` stay.
+        """
+        queryset = Listing.objects.all()
+        if self.action != 'list':
+            return queryset
+        params = self.request.query_params
+        try:
+            if params.get('location'):
+                queryset = queryset.filter(location=params['location'])
+            if params.get('min_price'):
+                queryset = queryset.filter(price_per_night__gte=Decimal(params['min_price']))
+            if params.get('max_price'):
+                queryset = queryset.filter(price_per_night__lte=Decimal(params['max_price']))
+            check_in, check_out = params.get('check_in'), params.get('check_out')
+            if check_in or check_out:
+                check_in, check_out = date.fromisoformat(check_in or ''), date.fromisoformat(check_out or '')
+        except (InvalidOperation, ValueError):
+            raise ValidationError({'error': 'Invalid search parameters; use decimal prices and YYYY-MM-DD dates'})
+        if check_in or check_out:
+            if check_out <= check_in:
+                raise ValidationError({'error': 'check_out must be after check_in'})
+            queryset = filter_available(queryset, check_in, check_out)
+        return queryset
+    
     def perform_create(self, serializer):
         """Set the owner to the current user when creating a listing."""
         serializer.save(owner=self.request.user)
@@ -30,34 +227,132 @@ class ListingViewSet(viewsets.ModelViewSet):
         """Get all bookings for a specific listing."""
         listing = self.get_object()
         bookings = listing.bookings.all()
-        serializer = BookingSerializer(bookings, many=True)
-        return Response(serializer.data)
+        return Response(self.serialize_list(bookings, BookingSerializer))
     
     @action(detail=True, methods=['get'])
     def reviews(self, request, pk=None):
         """Get all reviews for a specific listing."""
         listing = self.get_object()
         reviews = listing.reviews.all()
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        return Response(self.serialize_list(reviews, ReviewSerializer))
+    
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Listings most similar to this one, best first, as precomputed by the nightly recommendations job."""
+        try:
+            listing_id = int(pk)
+        except ValueError:
+            raise Http404
+        similar = Listing.objects.filter(recommended_in__listing_id=listing_id).order_by('recommended_in__rank')
+        data = self.serialize_list(similar)
+        if not data and not Listing.objects.filter(pk=listing_id).exists():
+            raise Http404
+        return Response(data)
 
-class BookingViewSet(viewsets.ModelViewSet):
+class StatusEventsMixin:
+    """
+    `GET <detail>/events/` streams the object's status as server-sent events:
+    the current status, then each transition until a status in
+    `final_statuses` is reached. Events are published on
+    `<event_topic>:<pk>`; `status_event` builds the snapshot event from an
+    instance and is set on the class, e.g. `staticmethod(booking_event)`.
+
+    Serve it from the uvicorn Gunicorn profile so an open stream doesn't hold
+    a worker thread. Under WSGI each process serves at most
+    SSE_MAX_SYNC_STREAMS streams and answers further ones with 503.
+    """
+    event_topic = None
+    status_event = None
+    final_statuses = ()
+
+    @action(detail=True, methods=['get'], renderer_classes=[*api_renderer_classes(), EventStreamRenderer])
+    def events(self, request, pk=None):
+        obj = self.get_object()
+        model = type(obj)
+
+        def snapshot():
+            return self.status_event(model.objects.get(pk=obj.pk))
+
+        try:
+            stream = event_stream(
+                f'{self.event_topic}:{obj.pk}',
+                snapshot,
+                lambda event: event.get('status') in self.final_statuses,
+                # Only ASGI requests carry a scope.
+                asynchronous=getattr(request, 'scope', None) is not None,
+            )
+        except TooManyStreams:
+            return Response(
+                {'error': 'Too many open status streams; poll the resource or retry later'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(math.ceil(settings.SSE_RETRY_MILLISECONDS / 1000))},
+            )
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class BookingViewSet(StatusEventsMixin, ArchiveReadMixin, FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing bookings.
     Provides CRUD operations for Booking model.
     """
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
+    archive_queryset = ArchivedBooking.objects.all()
+    archive_serializer_class = ArchivedBookingSerializer
+    renderer_classes = api_renderer_classes()
     permission_classes = [permissions.IsAuthenticated]
+    event_topic = 'booking'
+    status_event = staticmethod(booking_event)
+    final_statuses = ('confirmed', 'cancelled')
     
     def perform_create(self, serializer):
-        """Set the user to the current user when creating a booking and send confirmation email."""
-        booking = serializer.save(user=self.request.user)
+        """
+        Create the booking for the current user, unless another booking
+        already holds one of its nights, and send the confirmation email.
+
+        On PostgreSQL, BOOKING_OVERLAP_CONTROL 'lock' serializes bookings of
+        the same listing on the listing row, so the check always sees the
+        bookings created before it. With 'check' they are not, and concurrent
+        overlapping bookings are only caught by the exclusion constraint.
+        SQLite has no row locks and ignores select_for_update. There, every
+        write transaction starts IMMEDIATE (see settings), which serializes
+        all writers on the database lock, whatever the setting.
+
+        A lock wait that fails (lock timeout, deadlock, or SQLite's "database
+        is locked") answers 503 with Retry-After instead of a server error.
+        """
+        data = serializer.validated_data
+        try:
+            with transaction.atomic():
+                if settings.BOOKING_OVERLAP_CONTROL == 'lock':
+                    list(Listing.objects.select_for_update().filter(pk=data['listing'].pk).values_list('pk'))
+                if stay_taken(data['listing'].pk, data['check_in'], data['check_out']):
+                    raise BookingConflict()
+                booking = serializer.save(user=self.request.user)
+        except IntegrityError as exc:
+            # Drivers without diagnostics only name the constraint in the message.
+            name = constraint_name(exc)
+            overlap = name == Booking.OVERLAP_CONSTRAINT if name else Booking.OVERLAP_CONSTRAINT in str(exc)
+            if not overlap:
+                raise
+            raise BookingConflict()
+        except OperationalError as exc:
+            if not is_lock_failure(exc):
+                raise
+            raise BookingBusy()
         # Trigger asynchronous email task
         send_booking_confirmation_email.delay(booking.id)
     
     def get_queryset(self):
         """Filter bookings to show only user's own bookings unless user is staff."""
+        if getattr(self, 'swagger_fake_view', False):
+            return Booking.objects.none()
+        if self.reading_archive:
+            return self.archive_queryset.all()
         if self.request.user.is_staff:
             return Booking.objects.all()
         return Booking.objects.filter(user=self.request.user)
@@ -82,6 +377,21 @@ class BookingViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
+            # The booking's hold has run out, or hit BOOKING_HOLD_MAX_MINUTES;
+            # the expiry sweep is about to cancel it.
+            if booking.expires_at is not None and booking.expires_at <= timezone.now():
+                return Response(
+                    {'error': 'The hold on this booking has expired; please book again'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            
+            # Claim the booking so concurrent requests don't each hit the gateway
+            if not transition_booking(booking, 'pending_payment', from_statuses=['pending']):
+                return Response(
+                    {'error': 'Payment for this booking is already in progress'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            
             # Generate unique transaction reference
             tx_ref = f"booking_{booking.id}_{uuid.uuid4().hex[:8]}"
             
@@ -94,11 +404,11 @@ class BookingViewSet(viewsets.ModelViewSet):
                 'last_name': request.user.last_name or 'User',
                 'phone_number': getattr(request.user, 'phone', '0911000000'),
                 'tx_ref': tx_ref,
-                'callback_url': f"{request.build_absolute_uri('/api/payments/verify/')}",
+                'callback_url': request.build_absolute_uri(reverse('payment-callback')),
                 'return_url': f"{request.build_absolute_uri('/api/bookings/')}",
                 'customization': {
                     'title': f'Payment for Booking #{booking.id}',
-                    'description': f'Payment for {booking.listing.name}'
+                    'description': f'Payment for {booking.listing.title}'
                 }
             }
             
@@ -108,52 +418,62 @@ class BookingViewSet(viewsets.ModelViewSet):
                 'Content-Type': 'application/json'
             }
             
-            response = requests.post(
-                'https://api.chapa.co/v1/transaction/initialize',
-                json=payment_data,
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                chapa_response = response.json()
-                
-                # Create Payment record
-                payment = Payment.objects.create(
-                    booking=booking,
-                    amount=booking.total_price,
-                    transaction_id=tx_ref,
-                    payment_method='chapa',
-                    status='pending'
+            payment = None
+            try:
+                response = requests.post(
+                    f'{settings.CHAPA_BASE_URL}/transaction/initialize',
+                    json=payment_data,
+                    headers=headers,
+                    timeout=settings.CHAPA_TIMEOUT
                 )
-                
-                # Update booking status
-                booking.status = 'pending_payment'
-                booking.save()
-                
-                return Response({
-                    'message': 'Payment initiated successfully',
-                    'payment_id': payment.id,
-                    'checkout_url': chapa_response['data']['checkout_url'],
-                    'transaction_reference': tx_ref
-                }, status=status.HTTP_201_CREATED)
-            
-            else:
-                return Response({
-                    'error': 'Failed to initiate payment',
-                    'details': response.json() if response.content else 'No response from payment gateway'
-                }, status=status.HTTP_400_BAD_REQUEST)
-                
+                if response.status_code != 200:
+                    return Response({
+                        'error': 'Failed to initiate payment',
+                        'details': response.json() if response.content else 'No response from payment gateway'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+
+                checkout_url = response.json()['data']['checkout_url']
+                with transaction.atomic():
+                    payment = Payment.objects.create(
+                        booking=booking,
+                        amount=booking.total_price,
+                        transaction_id=tx_ref,
+                        payment_method='chapa',
+                        status='pending'
+                    )
+            finally:
+                # Whatever went wrong, release the claim so the user can retry
+                if payment is None:
+                    transition_booking(booking, 'pending', from_statuses=['pending_payment'])
+
+            return Response({
+                'message': 'Payment initiated successfully',
+                'payment_id': payment.id,
+                'checkout_url': checkout_url,
+                'transaction_reference': tx_ref
+            }, status=status.HTTP_201_CREATED)
+
         except Exception as e:
             return Response({
                 'error': 'An error occurred while initiating payment',
                 'details': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(StatusEventsMixin, ArchiveReadMixin, FastListMixin, viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
+    archive_queryset = ArchivedPayment.objects.all()
+    archive_serializer_class = ArchivedPaymentSerializer
+    renderer_classes = api_renderer_classes()
     permission_classes = [permissions.IsAuthenticated]
+    event_topic = 'payment'
+    status_event = staticmethod(payment_event)
+    final_statuses = ('completed', 'failed', 'cancelled', 'refund_due')
     
     def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Payment.objects.none()
+        if self.reading_archive:
+            return self.archive_queryset.all()
         if self.request.user.is_staff:
             return Payment.objects.all()
         return Payment.objects.filter(booking__user=self.request.user)
@@ -171,7 +491,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
             
             # Find payment record
             try:
-                payment = Payment.objects.get(transaction_id=tx_ref)
+                payment = Payment.objects.select_related('booking__user').get(transaction_id=tx_ref)
             except Payment.DoesNotExist:
                 return Response(
                     {'error': 'Payment record not found'},
@@ -185,78 +505,49 @@ class PaymentViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            # Verify with Chapa API
-            headers = {
-                'Authorization': f'Bearer {settings.CHAPA_SECRET_KEY}',
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.get(
-                f'https://api.chapa.co/v1/transaction/verify/{tx_ref}',
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                chapa_response = response.json()
-                
-                if chapa_response['status'] == 'success' and chapa_response['data']['status'] == 'success':
-                    # Payment successful
-                    payment.status = 'completed'
-                    payment.save()
-                    
-                    # Update booking status
-                    booking = payment.booking
-                    booking.status = 'confirmed'
-                    booking.save()
-                    
-                    # Send confirmation email asynchronously
-                    send_payment_confirmation_email.delay(
-                        payment.id,
-                        booking.user.email,
-                        booking.user.first_name or 'Customer'
-                    )
-                    
+            # A cancelled payment may still have gone through at the gateway
+            if payment.status == 'cancelled':
+                try:
+                    settle_with_gateway(payment)
+                except (requests.RequestException, ValueError, KeyError):
+                    logger.warning("Could not check cancelled payment %s with Chapa", payment.pk, exc_info=True)
+                if payment.status == 'refund_due':
                     return Response({
-                        'message': 'Payment verified successfully',
-                        'payment_status': 'completed',
-                        'booking_status': 'confirmed'
-                    }, status=status.HTTP_200_OK)
-                
-                elif chapa_response['data']['status'] == 'failed':
-                    # Payment failed
-                    payment.status = 'failed'
-                    payment.save()
-                    
-                    # Update booking status
-                    booking = payment.booking
-                    booking.status = 'cancelled'
-                    booking.save()
-                    
-                    # Send failure email asynchronously
-                    send_payment_failure_email.delay(
-                        payment.id,
-                        booking.user.email,
-                        booking.user.first_name or 'Customer'
-                    )
-                    
-                    return Response({
-                        'message': 'Payment verification completed',
-                        'payment_status': 'failed',
-                        'booking_status': 'cancelled'
-                    }, status=status.HTTP_200_OK)
-                
-                else:
-                    # Payment still pending
-                    return Response({
-                        'message': 'Payment is still pending',
-                        'payment_status': 'pending'
+                        'message': 'Payment received after the booking was cancelled; it will be refunded',
+                        'payment_status': 'refund_due',
+                        'booking_status': payment.booking.status
                     }, status=status.HTTP_200_OK)
+
+            # Already settled (e.g. by the gateway callback): no need to ask Chapa again
+            if payment.status != 'pending':
+                return Response({
+                    'message': 'Payment already processed',
+                    'payment_status': payment.status,
+                    'booking_status': payment.booking.status
+                }, status=status.HTTP_200_OK)
             
-            else:
+            payment_status, error = settle_with_gateway(payment)
+            if error is not None:
                 return Response({
                     'error': 'Failed to verify payment with Chapa',
-                    'details': response.json() if response.content else 'No response from payment gateway'
+                    'details': error
                 }, status=status.HTTP_400_BAD_REQUEST)
+            if payment_status == 'completed':
+                return Response({
+                    'message': 'Payment verified successfully',
+                    'payment_status': 'completed',
+                    'booking_status': 'confirmed'
+                }, status=status.HTTP_200_OK)
+            if payment_status == 'failed':
+                return Response({
+                    'message': 'Payment verification completed',
+                    'payment_status': 'failed',
+                    'booking_status': 'cancelled'
+                }, status=status.HTTP_200_OK)
+            return Response({
+                'message': 'Payment is still pending',
+                'payment_status': 'pending'
+            }, status=status.HTTP_200_OK)
                 
         except Exception as e:
             return Response({
@@ -264,14 +555,127 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 'details': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def verify_bulk(self, request):
+        """
+        Verify many payments with Chapa at once (staff only). Takes
+        `{"tx_refs": [...]}` (at most PAYMENT_BULK_VERIFY_MAX), queries the
+        gateway PAYMENT_BULK_VERIFY_CONCURRENCY references at a time, applies
+        the results in bulk and sends their emails from one task. Returns an
+        outcome per reference and the elapsed time.
+        """
+        start = time.perf_counter()
+        tx_refs = request.data.get('tx_refs')
+        if (
+            not isinstance(tx_refs, list) or not tx_refs or len(tx_refs) > settings.PAYMENT_BULK_VERIFY_MAX
+            or not all(isinstance(tx_ref, str) and tx_ref for tx_ref in tx_refs)
+        ):
+            return Response(
+                {'error': f'tx_refs must be a list of 1 to {settings.PAYMENT_BULK_VERIFY_MAX} transaction references'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        tx_refs = list(dict.fromkeys(tx_refs))
+        payments = {
+            tx_ref: (pk, payment_status) for pk, tx_ref, payment_status in
+            Payment.objects.filter(transaction_id__in=tx_refs).values_list('pk', 'transaction_id', 'status')
+        }
+        results = {}
+        pending = []
+        # Cancelled payments are checked too: the guest may have paid anyway.
+        cancelled = []
+        for tx_ref in tx_refs:
+            if tx_ref not in payments:
+                results[tx_ref] = {'outcome': 'not_found'}
+            elif payments[tx_ref][1] == 'pending':
+                pending.append(tx_ref)
+            elif payments[tx_ref][1] == 'cancelled':
+                cancelled.append(tx_ref)
+            else:
+                results[tx_ref] = {'outcome': 'already_processed', 'payment_status': payments[tx_ref][1]}
+
+        if pending or cancelled:
+            checking = pending + cancelled
+            concurrency = min(settings.PAYMENT_BULK_VERIFY_CONCURRENCY, len(checking))
+            with requests.Session() as session, ThreadPoolExecutor(max_workers=concurrency) as pool:
+                session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+                session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+                answers = dict(zip(checking, pool.map(lambda tx_ref: self._verify_one(tx_ref, session), checking)))
+            for tx_ref in cancelled:
+                payment_status, error = answers.pop(tx_ref)
+                results[tx_ref] = {'outcome': 'already_processed', 'payment_status': 'cancelled'}
+                if error is None and payment_status == 'completed':
+                    payment = Payment.objects.select_related('booking').get(pk=payments[tx_ref][0])
+                    if transition_payment(payment, 'refund_due', from_statuses=['cancelled']):
+                        logger.warning("Payment %s was completed after it was cancelled; refund due", payment.pk)
+                        results[tx_ref] = {'outcome': 'refund_due', 'payment_status': 'refund_due'}
+            settled = settle_payments({
+                payments[tx_ref][0]: payment_status for tx_ref, (payment_status, _) in answers.items()
+                if payment_status in ('completed', 'failed')
+            })
+            for tx_ref, (payment_status, error) in answers.items():
+                if error is not None:
+                    results[tx_ref] = {'outcome': 'error', 'error': error}
+                elif payment_status == 'pending':
+                    results[tx_ref] = {'outcome': 'pending', 'payment_status': 'pending'}
+                elif payments[tx_ref][0] in settled:
+                    results[tx_ref] = {'outcome': 'settled', 'payment_status': payment_status}
+                else:
+                    # Settled concurrently, e.g. by the gateway callback.
+                    results[tx_ref] = {'outcome': 'already_processed', 'payment_status': payment_status}
+            completed = [pk for pk, payment_status in settled.items() if payment_status == 'completed']
+            failed = [pk for pk, payment_status in settled.items() if payment_status == 'failed']
+            if settled:
+                transaction.on_commit(lambda: send_payment_result_emails.delay(completed, failed))
+
+        return Response({
+            'results': [{'tx_ref': tx_ref, **results[tx_ref]} for tx_ref in tx_refs],
+            'counts': dict(Counter(result['outcome'] for result in results.values())),
+            'elapsed_seconds': round(time.perf_counter() - start, 3),
+        }, status=status.HTTP_200_OK)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+    @staticmethod
+    def _verify_one(tx_ref, session):
+        try:
+            return chapa_verify(tx_ref, session)
+        except requests.RequestException:
+            return None, 'Payment gateway unavailable'
+        except (ValueError, KeyError, TypeError):
+            return None, 'Unexpected response from payment gateway'
+
+    @action(detail=False, methods=['get', 'post'], permission_classes=[permissions.AllowAny],
+            authentication_classes=[])
+    def callback(self, request):
+        """
+        Chapa's callback_url. The request is unauthenticated, so it only
+        names the transaction; its outcome always comes from the gateway.
+        """
+        tx_ref = request.query_params.get('trx_ref') or request.query_params.get('tx_ref') \
+            or request.data.get('trx_ref') or request.data.get('tx_ref')
+        payment = Payment.objects.select_related('booking').filter(transaction_id=tx_ref).first() if tx_ref else None
+        if payment is None:
+            return Response({'error': 'Payment record not found'}, status=status.HTTP_404_NOT_FOUND)
+        if payment.status not in ('pending', 'cancelled'):
+            return Response({'payment_status': payment.status}, status=status.HTTP_200_OK)
+        try:
+            payment_status, error = settle_with_gateway(payment)
+        except requests.RequestException:
+            payment_status, error = None, 'Payment gateway unavailable'
+        if error is not None:
+            # Chapa retries the callback; verify_payment remains available to the client.
+            return Response({'error': error}, status=status.HTTP_502_BAD_GATEWAY)
+        if payment.status in ('cancelled', 'refund_due'):
+            return Response({'payment_status': payment.status}, status=status.HTTP_200_OK)
+        return Response({'payment_status': payment_status}, status=status.HTTP_200_OK)
+
+
+class ReviewViewSet(FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing reviews.
     Provides CRUD operations for Review model.
     """
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    renderer_classes = api_renderer_classes()
     permission_classes = [permissions.IsAuthenticated]
     
     def perform_create(self, serializer):
@@ -280,6 +684,122 @@ class ReviewViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filter reviews to show only user's own reviews unless user is staff."""
+        if getattr(self, 'swagger_fake_view', False):
+            return Review.objects.none()
         if self.request.user.is_staff:
             return Review.objects.all()
         return Review.objects.filter(user=self.request.user)
+
+
+
+class AuthTokenViewSet(viewsets.ViewSet):
+    """
+    Issue and revoke signed bearer tokens.
+
+    POST /api/auth/token/ with `username` and `password` (or while logged in)
+    returns a short-lived token; POST /api/auth/token/revoke/ with that token
+    revokes it, or every token of the user with `{"all": true}`.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def create(self, request):
+        user = request.user if request.user.is_authenticated else authenticate(
+            request, username=request.data.get('username'), password=request.data.get('password')
+        )
+        if user is None or not user.is_active:
+            return Response({'error': 'Invalid credentials'}, status=status.HTTP_400_BAD_REQUEST)
+        token, expires_in = issue_token(user)
+        return Response({'token': token, 'token_type': 'Bearer', 'expires_in': expires_in}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], authentication_classes=[SignedTokenAuthentication],
+            permission_classes=[permissions.IsAuthenticated])
+    def revoke(self, request):
+        if request.data.get('all'):
+            revoke_user_tokens(request.user)
+        else:
+            revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Delta sync for clients: GET /api/sync/?since=<cursor> returns the
+    caller's bookings, payments and reviews changed, deleted or archived
+    since the cursor, and the cursor to send next time. Archived records
+    remain readable by staff but have left the caller's lists. Omit `since`
+    to start; when
+    `reset` is true the cursor is too old and the client must re-fetch the
+    full lists before continuing from the returned cursor.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    sources = {
+        'booking': ('bookings', lambda user: Booking.objects.filter(user=user), BookingSerializer),
+        'payment': ('payments', lambda user: Payment.objects.filter(booking__user=user), PaymentSerializer),
+        'review': ('reviews', lambda user: Review.objects.filter(user=user), ReviewSerializer),
+    }
+
+    def list(self, request):
+        try:
+            since, issued_at = changelog.parse_cursor(request.query_params.get('since'))
+        except ValueError:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        if since == 0 or changelog.cursor_expired(issued_at):
+            return Response({
+                'cursor': changelog.make_cursor(changelog.latest_sequence(request.user)),
+                'reset': since != 0,
+                'has_more': False,
+                'changes': {key: [] for key, _, _ in self.sources.values()},
+                'deleted': {key: [] for key, _, _ in self.sources.values()},
+                'archived': {key: [] for key, _, _ in self.sources.values()},
+            })
+
+        entries, has_more = changelog.changes_since(request.user, since, settings.SYNC_PAGE_SIZE)
+        latest = {}
+        for sequence, model, object_id, action in entries:
+            latest[(model, object_id)] = action
+        changes, deleted, archived = {}, {}, {}
+        for model, (key, queryset, serializer_class) in self.sources.items():
+            upserted = [object_id for (name, object_id), action in latest.items() if name == model and action == 'upsert']
+            rows = ValuesSerializer.for_serializer(serializer_class).serialize(
+                queryset(request.user).filter(pk__in=upserted).order_by('pk')
+            ) if upserted else []
+            changes[key] = rows
+            # Records deleted after being changed are reported as deleted.
+            found = {row['id'] for row in rows}
+            deleted[key] = sorted(
+                object_id for (name, object_id), action in latest.items()
+                if name == model and (action == 'delete' or (action == 'upsert' and object_id not in found))
+            )
+            archived[key] = sorted(
+                object_id for (name, object_id), action in latest.items() if name == model and action == 'archive'
+            )
+        return Response({
+            'cursor': changelog.make_cursor(entries[-1][0] if entries else since),
+            'reset': False,
+            'has_more': has_more,
+            'changes': changes,
+            'deleted': deleted,
+            'archived': archived,
+        })
+
+
+class OwnerViewSet(viewsets.ViewSet):
+    """
+    GET /api/owners/me/dashboard/ returns, for every listing the caller
+    owns, its upcoming bookings, revenue from completed payments and
+    rating aggregates, plus totals. Staff may pass an owner id instead of
+    `me`. Cached per owner for OWNER_DASHBOARD_CACHE_SECONDS.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = api_renderer_classes()
+
+    @action(detail=True, methods=['get'])
+    def dashboard(self, request, pk=None):
+        if pk == 'me':
+            owner_id = request.user.pk
+        elif request.user.is_staff and pk.isdigit():
+            owner_id = int(pk)
+        else:
+            raise Http404
+        return Response(cached_owner_dashboard(owner_id))
@@ -9,6 +9,7 @@ This script demonstrates the payment workflow:
 4. Verify payment status
 
 Note: This requires the Django server to be running and proper Chapa API credentials.
+For a self-contained run with a fake gateway, use `python manage.py load_test_payments`.
 """
 
 import requests